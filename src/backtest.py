@@ -0,0 +1,246 @@
+# src/backtest.py
+"""
+Vectorized multi-asset backtester for indicator signals.
+
+Signals and closes for many tickers are aligned into dates x tickers NumPy panels and
+the whole portfolio is simulated with array operations (no per-bar Python loop):
+
+  1. positions: a ticker is held for `hold_bars` bars after each signal (or for as long
+     as the signal stays on when `hold_bars` is None), starting `entry_lag` bars after
+     the signal so a signal never trades on the bar that produced it
+  2. weights: "equal" splits the capital across the positions held on each bar,
+     "fixed" gives every position `position_size` of the capital (capped at 100% gross)
+  3. returns: yesterday's weights times today's asset returns, minus `cost_bps` on the
+     traded turnover
+
+Panels are the union of every ticker's dates. A ticker is only tradable between its first
+and last close; a date missing inside that span (another calendar, a missing bar) holds
+the last close and signal, so the position is kept through the gap and the next bar
+earns the whole move since the last close instead of a sell and a re-buy.
+
+Usage:
+  python src/backtest.py --indicator djia_weakness --hold 20 --cost-bps 5
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from indicator_store import DEFAULT_ROOT, IndicatorStore
+
+
+def build_panel(frames, column):
+    """Align one column of several {ticker: DataFrame} frames into a dates x tickers panel"""
+    series = {
+        ticker: df.set_index("Date")[column][lambda s: ~s.index.duplicated(keep="last")]
+        for ticker, df in frames.items()
+    }
+    return pd.DataFrame(series).sort_index()
+
+
+def load_indicator_results(results, key, interval="1d"):
+    """
+    Read the Close and Signal columns of one indicator from an IndicatorStore.
+
+    Returns {ticker: DataFrame with 'Date', 'Close', 'Signal'}.
+    """
+    frames = {}
+    for ticker in results.tickers(interval):
+        if key not in results.indicators(ticker, interval):
+            continue
+        df = results.read(ticker, [key], interval, columns=["Close", "Signal"])
+        frames[ticker] = df.rename(
+            columns={f"{key}_Close": "Close", f"{key}_Signal": "Signal"}
+        )
+    return frames
+
+
+def _rolling_any(signals, window):
+    """True where any of the last `window` rows (including the current one) is True"""
+    counts = np.cumsum(signals, axis=0, dtype=np.int64)
+    shifted = np.zeros_like(counts)
+    shifted[window:] = counts[:-window]
+    return (counts - shifted) > 0
+
+
+def _shift(values, periods, fill):
+    out = np.full_like(values, fill)
+    if periods < len(values):
+        out[periods:] = values[: len(values) - periods]
+    return out
+
+
+class Backtester:
+    """Turn boolean signal panels into positions, equity curves and metrics"""
+
+    def __init__(
+        self,
+        sizing="equal",
+        position_size=0.1,
+        cost_bps=0.0,
+        hold_bars=None,
+        entry_lag=1,
+        periods_per_year=252,
+    ):
+        if sizing not in ("equal", "fixed"):
+            raise ValueError("sizing must be 'equal' or 'fixed'")
+        if hold_bars is not None and hold_bars < 1:
+            raise ValueError("hold_bars must be at least 1 bar")
+        self.sizing = sizing
+        self.position_size = position_size
+        self.cost_bps = cost_bps
+        self.hold_bars = hold_bars
+        self.entry_lag = entry_lag
+        self.periods_per_year = periods_per_year
+
+    def positions(self, signals):
+        """Boolean dates x tickers array of held positions"""
+        held = signals if self.hold_bars is None else _rolling_any(signals, self.hold_bars)
+        return _shift(held, self.entry_lag, False)
+
+    def weights(self, positions):
+        """Portfolio weight of every position on every bar"""
+        held = positions.astype(np.float64)
+        if self.sizing == "equal":
+            count = held.sum(axis=1, keepdims=True)
+            return np.divide(held, count, out=np.zeros_like(held), where=count > 0)
+
+        weights = held * self.position_size
+        gross = weights.sum(axis=1, keepdims=True)
+        scale = np.where(gross > 1, 1 / np.maximum(gross, 1e-12), 1.0)
+        return weights * scale
+
+    def run(self, close, signals):
+        """
+        Backtest aligned panels.
+
+        Parameters:
+          close (DataFrame): dates x tickers closing prices
+          signals (DataFrame): dates x tickers signals, same shape as `close`
+
+        Returns a dict with the 'equity', 'returns' and 'weights' DataFrames, per-ticker
+        'trades' and the summary 'metrics'.
+        """
+        # Can't hold what can't be priced: only between a ticker's first and last close.
+        priced = close.notna()
+        listed = priced.cummax() & priced[::-1].cummax()[::-1]
+        prices = close.ffill().where(listed).to_numpy(dtype=np.float64)
+        signals = signals.reindex(index=close.index, columns=close.columns)
+        signals = signals.astype(np.float64).ffill().where(listed)
+        raw_signals = np.nan_to_num(signals.to_numpy(dtype=np.float64)) > 0
+
+        listed = listed.to_numpy()
+        positions = self.positions(raw_signals) & listed
+        weights = self.weights(positions)
+
+        asset_returns = np.zeros_like(prices)
+        asset_returns[1:] = prices[1:] / prices[:-1] - 1
+        asset_returns = np.nan_to_num(asset_returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+        previous_weights = _shift(weights, 1, 0.0)
+        turnover = np.abs(weights - previous_weights).sum(axis=1)
+        returns = (previous_weights * asset_returns).sum(axis=1)
+        returns -= turnover * self.cost_bps / 10_000
+        equity = np.cumprod(1 + returns)
+
+        trades = self._trades(positions, asset_returns, close.columns)
+        index = close.index
+        return {
+            "equity": pd.Series(equity, index=index, name="Equity"),
+            "returns": pd.Series(returns, index=index, name="Return"),
+            "weights": pd.DataFrame(weights, index=index, columns=close.columns),
+            "trades": trades,
+            "metrics": self.metrics(
+                index, returns, equity, trades, positions.any(axis=1), turnover
+            ),
+        }
+
+    def _trades(self, positions, asset_returns, tickers):
+        """Return of every completed or open holding period, labelled by ticker"""
+        entries = positions & ~_shift(positions, 1, False)
+        trade_ids = np.cumsum(entries.ravel(order="F")).reshape(positions.shape, order="F")
+
+        # A position held on bar t earns the return of bar t + 1.
+        earned = np.log1p(_shift(asset_returns[::-1], 1, 0.0)[::-1])
+        held = positions.ravel(order="F")
+        ids = trade_ids.ravel(order="F")[held]
+        log_returns = np.bincount(ids, weights=earned.ravel(order="F")[held])
+        columns = np.repeat(np.arange(positions.shape[1]), positions.shape[0])[held]
+
+        first = np.unique(ids, return_index=True)[1]
+        return pd.DataFrame(
+            {
+                "ticker": np.asarray(tickers)[columns[first]],
+                "return": np.expm1(log_returns[ids[first]]),
+            }
+        )
+
+    def metrics(self, index, returns, equity, trades, invested, turnover):
+        """CAGR, max drawdown, annualised Sharpe, per-trade hit rate and exposure"""
+        if isinstance(index, pd.DatetimeIndex) and len(index) > 1:
+            years = (index[-1] - index[0]).days / 365.25
+        else:
+            years = len(returns) / self.periods_per_year
+        final = equity[-1] if len(equity) else 1.0
+        cagr = final ** (1 / years) - 1 if years > 0 and final > 0 else float("nan")
+
+        peaks = np.maximum.accumulate(equity) if len(equity) else equity
+        drawdown = (equity / peaks - 1).min() if len(equity) else 0.0
+
+        std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+        sharpe = returns.mean() / std * np.sqrt(self.periods_per_year) if std > 0 else 0.0
+
+        return {
+            "cagr": float(cagr),
+            "max_drawdown": float(drawdown),
+            "sharpe": float(sharpe),
+            "hit_rate": float((trades["return"] > 0).mean()) if len(trades) else 0.0,
+            "trades": int(len(trades)),
+            "exposure": float(invested.mean()) if len(invested) else 0.0,
+            "turnover": float(turnover.sum()),
+        }
+
+
+def backtest_frames(frames, backtester=None):
+    """Backtest {ticker: DataFrame with 'Date', 'Close', 'Signal'} frames"""
+    backtester = backtester or Backtester()
+    close = build_panel(frames, "Close")
+    signals = build_panel(frames, "Signal")  # Missing dates stay NaN (see Backtester.run)
+    return backtester.run(close, signals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest indicator signals")
+    parser.add_argument("--indicator", required=True, help="indicator key, e.g. djia_weakness")
+    parser.add_argument("--output-dir", default=DEFAULT_ROOT)
+    parser.add_argument("--sizing", choices=["equal", "fixed"], default="equal")
+    parser.add_argument("--position-size", type=float, default=0.1)
+    parser.add_argument("--cost-bps", type=float, default=0.0)
+    parser.add_argument("--hold", type=int, help="bars to hold after a signal")
+    parser.add_argument("--entry-lag", type=int, default=1)
+    parser.add_argument("--equity", help="write the equity curve to this CSV file")
+    args = parser.parse_args()
+    if args.hold is not None and args.hold < 1:
+        parser.error("--hold must be at least 1 bar")
+
+    frames = load_indicator_results(IndicatorStore(args.output_dir), args.indicator)
+    if not frames:
+        print(f"❌ No {args.indicator} results found in {Path(args.output_dir).resolve()}")
+        return
+
+    backtester = Backtester(
+        sizing=args.sizing,
+        position_size=args.position_size,
+        cost_bps=args.cost_bps,
+        hold_bars=args.hold,
+        entry_lag=args.entry_lag,
+    )
+    result = backtest_frames(frames, backtester)
+    print(json.dumps({"tickers": len(frames), **result["metrics"]}, indent=2))
+    if args.equity:
+        result["equity"].to_csv(args.equity, index_label="Date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+# src/batch_download.py
+"""
+Non-interactive, concurrent downloader for a whole ticker universe.
+
+Tickers are grouped into batched provider calls which run on a bounded thread pool.
+The provider is wrapped in a `RateLimitedProvider`: every single `download` or
+`download_many` request first takes a token from a shared token bucket (so the request
+rate stays under the provider's limits, however many ranges an update fetches), and
+requests failing with a transient error (network failures, HTTP 429/5xx) are retried
+with exponential backoff. Cleaning and writing happen on a second pool while downloads
+continue.
+
+Usage:
+  python src/batch_download.py AAPL MSFT --start 2020-01-01 --interval 1d
+  python src/batch_download.py --file tickers.txt --workers 8 --rate 2 --update
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from get_stock_data import (
+    DEFAULT_CHUNK_ROWS,
+    VALID_INTERVALS,
+    clean_data,
+    derive_data,
+    mark_downloaded,
+    update_data,
+)
+from instrumentation import add_arguments, profiling, span
+from providers import get_provider
+from storage import get_store
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` calls per second with bursts of `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_transient(error):
+    """Whether a provider error may go away on retry: network failures, HTTP 429/5xx"""
+    if isinstance(error, (OSError, TimeoutError)):  # requests' ConnectionError is an OSError
+        return True
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return "RateLimit" in type(error).__name__  # e.g. yfinance's YFRateLimitError
+
+
+def with_retries(func, retries=3, base_delay=1.0, bucket=None):
+    """
+    Call `func`, retrying transient errors (see `is_transient`) with exponential backoff
+    and jitter; other errors are raised at once. With a `bucket`, every attempt first
+    takes a token.
+    """
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            time.sleep(base_delay * 2**attempt * (1 + random.random()))
+
+
+class RateLimitedProvider:
+    """A provider whose every request takes a token from `bucket` and is retried"""
+
+    def __init__(self, provider, bucket, retries=3, base_delay=1.0):
+        self.provider = provider
+        self.bucket = bucket
+        self.retries = retries
+        self.base_delay = base_delay
+        self.name = provider.name
+
+    def _call(self, func):
+        return with_retries(func, self.retries, self.base_delay, self.bucket)
+
+    def download(self, ticker, start, end, interval):
+        return self._call(lambda: self.provider.download(ticker, start, end, interval))
+
+    def download_many(self, tickers, start, end, interval):
+        return self._call(lambda: self.provider.download_many(tickers, start, end, interval))
+
+
+class ThroughputReport:
+    """Thread-safe counters for a batch download run"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.tickers = 0
+        self.records = 0
+        self.bytes = 0
+        self.failures = {}
+
+    def success(self, ticker, records, nbytes):
+        with self.lock:
+            self.tickers += 1
+            self.records += records
+            self.bytes += nbytes
+
+    def failure(self, ticker, error):
+        with self.lock:
+            self.failures[ticker] = str(error)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "tickers": self.tickers,
+            "records": self.records,
+            "bytes": self.bytes,
+            "failures": len(self.failures),
+            "failed_tickers": self.failures,
+            "seconds": round(elapsed, 3),
+            "tickers_per_second": round(self.tickers / elapsed, 3) if elapsed else 0.0,
+            "bytes_per_second": round(self.bytes / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def batched(items, size):
+    """Split a list into consecutive chunks of at most `size` items"""
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _save(ticker, raw, interval, store, report, compact=False):
+    """Clean one ticker's raw frame and write it to the store"""
+    try:
+        with span("clean_data", ticker=ticker, interval=interval):
+            data = clean_data(raw, compact=compact, chunk_size=DEFAULT_CHUNK_ROWS)
+        if data is None:
+            raise ValueError("no usable rows after cleaning")
+        path = store.write(ticker, interval, data)
+        mark_downloaded(ticker, interval, store)
+        report.success(ticker, len(data), path.stat().st_size)
+    except Exception as e:
+        report.failure(ticker, e)
+
+
+def _stored_bytes(store, ticker, interval):
+    if store.name == "csv":
+        return sum(f.stat().st_size for f in store.files(ticker, interval))
+    return store.path(ticker, interval).stat().st_size
+
+
+def _update(ticker, start_date, end_date, interval, store, provider, report, compact):
+    """
+    Fetch only the missing bars of one ticker (see `update_data`); `provider` rate limits
+    and retries each of its requests
+    """
+    try:
+        data, added = update_data(
+            ticker, start_date, end_date, interval, store, provider, compact
+        )
+        if data is None:
+            raise ValueError("no data returned")
+        report.success(ticker, added, _stored_bytes(store, ticker, interval))
+    except Exception as e:
+        report.failure(ticker, e)
+
+
+def _derive(tickers, start_date, end_date, interval, store, report):
+    """Derive the tickers stored at a finer interval; returns those left to download"""
+    pending = []
+    for ticker in tickers:
+        try:
+            data, _ = derive_data(ticker, start_date, end_date, interval, store)
+        except Exception as e:
+            report.failure(ticker, e)
+            continue
+        if data is None:
+            pending.append(ticker)
+        else:
+            report.success(ticker, len(data), _stored_bytes(store, ticker, interval))
+    return pending
+
+
+def download_universe(
+    tickers,
+    start_date,
+    end_date,
+    interval="1d",
+    store=None,
+    provider=None,
+    batch_size=20,
+    workers=4,
+    rate=2.0,
+    retries=3,
+    update=False,
+    compact=False,
+):
+    """
+    Download every ticker for [start_date, end_date] and write it to the store.
+
+    Parameters:
+      batch_size (int): tickers per provider call (ignored in update mode, where each
+                        ticker needs its own missing ranges)
+      workers (int): size of the download pool and of the clean/write pool
+      rate (float): provider requests per second allowed by the token bucket
+      retries (int): retries per provider request on transient errors, with
+                     exponential backoff
+      update (bool): fetch only the bars missing from the store
+      compact (bool): clean into compact dtypes (see `clean_data`)
+
+    Tickers whose interval can be resampled from stored finer bars covering the range are
+    derived locally instead of downloaded (see `derive_data`).
+
+    Returns the run summary (see `ThroughputReport.summary`).
+    """
+    store = store or get_store()
+    bucket = TokenBucket(rate, capacity=max(1, workers))
+    provider = RateLimitedProvider(provider or get_provider(), bucket, retries)
+    report = ThroughputReport()
+
+    tickers = _derive(tickers, start_date, end_date, interval, store, report)
+
+    if update:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for ticker in tickers:
+                pool.submit(
+                    _update,
+                    ticker,
+                    start_date,
+                    end_date,
+                    interval,
+                    store,
+                    provider,
+                    report,
+                    compact,
+                )
+        return report.summary()
+
+    def fetch(batch):
+        with span("download", interval=interval, tickers=len(batch)):
+            return provider.download_many(batch, start_date, end_date, interval)
+
+    with (
+        ThreadPoolExecutor(max_workers=workers) as download_pool,
+        ThreadPoolExecutor(max_workers=workers) as write_pool,
+    ):
+        futures = {download_pool.submit(fetch, b): b for b in batched(tickers, batch_size)}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                frames = future.result()
+            except Exception as e:
+                for ticker in batch:
+                    report.failure(ticker, e)
+                continue
+            for ticker in batch:
+                if ticker in frames:
+                    write_pool.submit(
+                        _save, ticker, frames[ticker], interval, store, report, compact
+                    )
+                else:
+                    report.failure(ticker, "no data returned")
+
+    return report.summary()
+
+
+def read_tickers(args):
+    """Collect tickers from the command line and from an optional file (one per line)"""
+    tickers = [t.upper() for t in args.tickers]
+    if args.file:
+        with open(args.file) as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip().upper()
+                if line:
+                    tickers.append(line)
+    return list(dict.fromkeys(tickers))
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def build_parser(prog=None):
+    today = datetime.today().date()
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Download stock data for many tickers"
+    )
+    parser.add_argument("tickers", nargs="*", help="ticker symbols (e.g. AAPL MSFT)")
+    parser.add_argument("--file", help="file with one ticker per line")
+    parser.add_argument("--start", type=parse_date, default=today - timedelta(days=5 * 365))
+    parser.add_argument("--end", type=parse_date, default=today)
+    parser.add_argument("--interval", default="1d", choices=VALID_INTERVALS)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="provider calls per second")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--update", action="store_true", help="fetch only missing bars")
+    parser.add_argument(
+        "--compact", action="store_true", help="float32 prices and downcast volumes"
+    )
+    parser.add_argument("--report", help="write the throughput report to this JSON file")
+    return add_arguments(parser)
+
+
+def run(args, parser):
+    """Download the tickers selected by parsed command line arguments"""
+    tickers = read_tickers(args)
+    if not tickers:
+        parser.error("no tickers given")
+    if args.end <= args.start:
+        parser.error("end date must be after start date")
+
+    print(
+        f"Downloading {len(tickers)} tickers from {args.start} to {args.end} "
+        f"({args.interval} interval)..."
+    )
+    with profiling(args, "batch_download"):
+        summary = download_universe(
+            tickers,
+            args.start,
+            args.end,
+            args.interval,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            rate=args.rate,
+            retries=args.retries,
+            update=args.update,
+            compact=args.compact,
+        )
+
+    print(
+        f"\nSaved {summary['tickers']}/{len(tickers)} tickers ({summary['records']} records) "
+        f"in {summary['seconds']}s"
+    )
+    print(
+        f"Throughput: {summary['tickers_per_second']} tickers/s, "
+        f"{summary['bytes_per_second']} bytes/s, {summary['failures']} failures"
+    )
+    for ticker, error in summary["failed_tickers"].items():
+        print(f"  {ticker}: {error}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if summary["failures"] == 0 else 1
+
+
+def main(argv=None):
+    parser = build_parser()
+    return run(parser.parse_args(argv), parser)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,574 @@
+# src/benchmark.py
+"""
+Offline benchmark suite for the data pipeline.
+
+Every stage runs on deterministic synthetic bars (see synthetic.py) at several sizes:
+
+  - clean_data: cleaning a provider-style frame (clean_data:compact: into compact dtypes,
+    in bounded-memory chunks)
+  - store_write:<backend> / store_read:<backend>: writing and reading a series through
+    each available storage backend
+  - indicator:<key>: `calculate` for every entry in INDICATORS
+  - simulate: replaying the bars through the paper-trading simulator with RSI entries
+    and stop-loss / take-profit exits (see simulator.py)
+
+Each stage is timed as the best of `--repeat` runs and the results are appended to a
+JSON history file. `compare` checks the latest run against the previous one (or the
+median of the last `--window` runs) and exits with status 1 when a stage got slower
+than the configured threshold.
+
+`kernels` checks the technical-indicator kernels (indicators/kernels.py) against plain
+Python reference loops, hand-computed values and Wilder's published RSI example: 1-D
+series, 2-D panels column by column, warm starts from a split series and the streaming
+`update` of every indicator built on them. It then reports each kernel's throughput in
+bars per second and exits with status 1 when a check fails.
+
+`chunked` stores a long synthetic intraday series in every available backend, runs
+every indicator both in memory and streamed in blocks of rows (`--chunk-size` of
+get_indicator_data.py) at several block sizes, and reports the peak traced memory of
+each run. That the block-by-block output is byte-identical is checked by
+tests/test_chunked.py.
+
+`startup` checks the CLI startup budget: `nocturne list` over a small synthetic store
+must finish within `--budget-ms` (best of `--repeat` fresh interpreters) without
+importing any of the heavy libraries, otherwise it exits with status 1 (the imports are
+also checked by tests/test_startup.py).
+
+Usage:
+  python src/benchmark.py run --sizes 10000 100000 1000000
+  python src/benchmark.py compare --threshold 0.2 --stage-threshold clean_data=0.5
+  python src/benchmark.py kernels --size 100000
+  python src/benchmark.py chunked --size 200000 --chunk-sizes 997 50000
+  python src/benchmark.py startup --budget-ms 150
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from get_stock_data import DEFAULT_CHUNK_ROWS, clean_data
+from indicators import ATR, INDICATORS, RSI, kernels
+from storage import BACKENDS
+from synthetic import generate_ohlcv
+
+DEFAULT_HISTORY = "data-files/benchmarks/history.json"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+STARTUP_BUDGET_MS = 150
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "yfinance", "questionary", "pyarrow"]
+SRC = Path(__file__).resolve().parent
+# Indicators built on the vectorized kernels, which also stream bar by bar
+KERNEL_INDICATORS = ("ema", "macd", "rsi", "bollinger_bands", "atr")
+
+
+def best_time(func, repeat):
+    """Best wall-clock time of `repeat` calls, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def available_backends():
+    backends = []
+    for name, cls in BACKENDS.items():
+        try:
+            cls(tempfile.gettempdir())
+        except ImportError:
+            continue
+        backends.append(name)
+    return backends
+
+
+def stages(size, interval, seed, workdir):
+    """Yield (stage name, zero-argument callable) pairs for one input size"""
+    raw = generate_ohlcv(size, interval, seed=seed, raw=True)
+    bars = generate_ohlcv(size, interval, seed=seed)
+
+    yield "clean_data", lambda: clean_data(raw.copy())
+    yield "clean_data:compact", lambda: clean_data(
+        raw.copy(), compact=True, chunk_size=DEFAULT_CHUNK_ROWS
+    )
+
+    for backend in available_backends():
+        store = BACKENDS[backend](Path(workdir) / backend)
+        yield f"store_write:{backend}", lambda s=store: s.write(
+            "SYN", interval, bars, replace=True
+        )
+        yield f"store_read:{backend}", lambda s=store: s.read("SYN", interval)
+
+    for key, indicator in INDICATORS.items():
+        yield f"indicator:{key}", lambda cls=indicator["class"]: cls().calculate(bars.copy())
+
+    close = bars["Close"].to_numpy()
+    yield "kernel:ema", lambda: kernels.ema(close, 20)
+    yield "kernel:rolling_mean_std", lambda: kernels.rolling_mean_std(close, 20)
+    yield "kernel:true_range", lambda: kernels.true_range(bars["High"], bars["Low"], close)
+
+    from simulator import SignalStrategy, Simulator, indicator_signals
+
+    frames = {"SYN": bars}
+    strategy = SignalStrategy(
+        indicator_signals(frames, "rsi"), stop_loss=0.02, take_profit=0.04
+    )
+    yield "simulate", lambda: Simulator(frames).run(strategy)
+
+
+def run(sizes, interval="1d", repeat=3, seed=0, only=None):
+    """Run every stage at every size; returns {"stage@size": seconds}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            for name, func in stages(size, interval, seed, workdir):
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                seconds = best_time(func, repeat)
+                results[f"{name}@{size}"] = round(seconds, 6)
+                print(f"{name:<36} {size:>11,} rows  {seconds * 1000:>10.2f} ms")
+    return results
+
+
+def load_history(path):
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_run(path, results, interval, repeat):
+    history = load_history(path)
+    history.append(
+        {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "interval": interval,
+            "repeat": repeat,
+            "results": results,
+        }
+    )
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+    return history
+
+
+def compare(history, threshold=0.2, stage_thresholds=None, window=1):
+    """
+    Compare the latest run with a baseline built from the `window` runs before it.
+
+    A stage regresses when latest / baseline - 1 exceeds its threshold (the stage name
+    without the size is looked up in `stage_thresholds`, falling back to `threshold`).
+    Returns a list of (stage, baseline, latest, change, limit, regressed) tuples.
+    """
+    if len(history) < 2:
+        return []
+    latest = history[-1]["results"]
+    previous = history[-1 - window : -1]
+    stage_thresholds = stage_thresholds or {}
+
+    rows = []
+    for stage, seconds in sorted(latest.items()):
+        samples = [run["results"][stage] for run in previous if stage in run["results"]]
+        if not samples:
+            continue
+        baseline = statistics.median(samples)
+        change = seconds / baseline - 1 if baseline > 0 else 0.0
+        limit = stage_thresholds.get(stage.split("@")[0], threshold)
+        rows.append((stage, baseline, seconds, change, limit, change > limit))
+    return rows
+
+
+def parse_stage_thresholds(values):
+    thresholds = {}
+    for value in values or []:
+        stage, _, limit = value.rpartition("=")
+        if not stage:
+            raise argparse.ArgumentTypeError(f"Expected STAGE=RATIO, got {value!r}")
+        thresholds[stage] = float(limit)
+    return thresholds
+
+
+def startup(budget_ms=STARTUP_BUDGET_MS, repeat=5, tickers=20):
+    """
+    Time `nocturne list` in fresh interpreters over a synthetic CSV store.
+
+    Returns (best milliseconds, heavy modules imported by the command).
+    """
+    # Report which heavy modules the command pulled in, after it ran.
+    probe = (
+        "import json, sys, nocturne; nocturne.main(['list']); "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    env = {**os.environ, "NOCTURNE_STORE": "csv", "PYTHONPATH": str(SRC)}
+    env.pop("NOCTURNE_PROFILE", None)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = BACKENDS["csv"](Path(workdir) / "data-files/raw")
+        for i in range(tickers):
+            store.write(f"SYN{i:04d}", "1d", generate_ohlcv(50, seed=i))
+
+        def call():
+            subprocess.run(
+                [sys.executable, str(SRC / "nocturne.py"), "list"],
+                cwd=workdir,
+                env=env,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+
+        best = best_time(call, repeat) * 1000
+        probed = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=workdir,
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    return best, json.loads(probed.stdout.strip().splitlines()[-1])
+
+
+# Wilder's RSI worked example (14 bars, as tabulated by StockCharts) with the RSI of every
+# bar from the 15th, at full precision (the published table rounds the first averages)
+WILDER_CLOSES = [
+    44.34, 44.09, 44.15, 43.61, 44.33, 44.83, 45.10, 45.42, 45.84, 46.08, 45.89,
+    46.03, 45.61, 46.28, 46.28, 46.00, 46.03, 46.41, 46.22, 45.64, 46.21, 46.25,
+    45.71, 46.45, 45.78, 45.35, 44.03, 44.18, 44.22, 44.57, 43.42, 42.66, 43.13,
+]  # fmt: skip
+WILDER_RSI = [
+    70.46, 66.25, 66.48, 69.35, 66.29, 57.92, 62.88, 63.21, 56.01, 62.34,
+    54.67, 50.39, 40.02, 41.49, 41.90, 45.50, 37.32, 33.09, 37.79,
+]  # fmt: skip
+
+
+def _reference_ewma(values, alpha):
+    out, mean = [], math.nan
+    for value in values:
+        if not math.isnan(value):
+            mean = value if math.isnan(mean) else (1 - alpha) * mean + alpha * value
+        out.append(mean)
+    return np.array(out)
+
+
+def _reference_true_range(high, low, close):
+    out = []
+    for i in range(len(close)):
+        ranges = [high[i] - low[i]]
+        if i:
+            ranges += [abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1])]
+        out.append(max(ranges))
+    return np.array(out)
+
+
+def _reference_bollinger(close, length):
+    means, stds = [], []
+    for i in range(len(close)):
+        window = close[i - length + 1 : i + 1] if i + 1 >= length else None
+        means.append(math.nan if window is None else sum(window) / length)
+        stds.append(
+            math.nan
+            if window is None
+            else math.sqrt(sum((v - means[-1]) ** 2 for v in window) / length)
+        )
+    return np.array(means), np.array(stds)
+
+
+def check_kernels(size=2_000, seed=0):
+    """
+    Compare the kernels and the indicators built on them with reference implementations.
+
+    Returns [(check name, passed)].
+    """
+    import pandas as pd
+
+    bars = generate_ohlcv(size, seed=seed)
+    high, low, close = (bars[c].to_numpy() for c in ("High", "Low", "Close"))
+    panel = np.column_stack([generate_ohlcv(size, seed=seed + i)["Close"] for i in range(4)])
+    split = size // 3
+    checks = []
+
+    def check(name, actual, expected):
+        checks.append((name, bool(np.allclose(actual, expected, equal_nan=True))))
+
+    # Hand-computed values
+    check("ema:values", kernels.ema([1.0, 2.0, 3.0], 3)[0], [1.0, 1.5, 2.25])
+    check("rsi:rising", kernels.rsi_from_averages(np.array([1.0]), np.array([0.0])), [100.0])
+    check(
+        "true_range:gap",
+        kernels.true_range([12.0, 15.0], [10.0, 14.0], [11.0, 14.5]),
+        [2.0, 4.0],
+    )
+    check(
+        "wilder:values",
+        kernels.wilder([2.0, 4.0, np.nan, 3.0, 5.0], 3)[0],
+        [np.nan, np.nan, np.nan, 3.0, 11 / 3],
+    )
+    rsi = RSI().calculate(pd.DataFrame({"Close": WILDER_CLOSES}))["RSI"].to_numpy()
+    checks.append(("rsi:wilder_example:warm_up", bool(np.isnan(rsi[:14]).all())))
+    check("rsi:wilder_example", np.round(rsi[14:], 2), WILDER_RSI)
+    # True ranges 2, 4, 2, 3, 1: NaN until three exist, then their mean, then Wilder's
+    atr = ATR(length=3).calculate(
+        pd.DataFrame(
+            {
+                "High": [12.0, 15.0, 15.0, 14.0, 13.0],
+                "Low": [10.0, 14.0, 13.0, 11.0, 12.0],
+                "Close": [11.0, 14.5, 14.0, 12.0, 12.5],
+            }
+        )
+    )
+    check("atr:values", atr["ATR"], [np.nan, np.nan, 8 / 3, 25 / 9, 59 / 27])
+    check(
+        "rolling_mean_std:values",
+        kernels.rolling_mean_std([1.0, 2.0, 3.0, 4.0], 2)[:2],
+        [[np.nan, 1.5, 2.5, 3.5], [np.nan, 0.5, 0.5, 0.5]],
+    )
+
+    # Reference loops, 1-D
+    check("ema:reference", kernels.ema(close, 20)[0], _reference_ewma(close, 2 / 21))
+    check(
+        "true_range:reference",
+        kernels.true_range(high, low, close),
+        _reference_true_range(high, low, close),
+    )
+    check(
+        "rolling_mean_std:reference",
+        kernels.rolling_mean_std(close, 20)[:2],
+        _reference_bollinger(close, 20),
+    )
+
+    # 2-D panels give the same values as each column on its own
+    check(
+        "ema:panel",
+        kernels.ema(panel, 20)[0],
+        np.column_stack([kernels.ema(panel[:, i], 20)[0] for i in range(panel.shape[1])]),
+    )
+    check(
+        "wilder:panel",
+        kernels.wilder(panel, 14)[0],
+        np.column_stack([kernels.wilder(panel[:, i], 14)[0] for i in range(panel.shape[1])]),
+    )
+    check(
+        "rolling_mean_std:panel",
+        kernels.rolling_mean_std(panel, 20)[1],
+        np.column_stack(
+            [kernels.rolling_mean_std(panel[:, i], 20)[1] for i in range(panel.shape[1])]
+        ),
+    )
+
+    # Warm starts from the state of the first part
+    head, state = kernels.ema(panel[:split], 20)
+    check(
+        "ema:warm_start",
+        np.vstack([head, kernels.ema(panel[split:], 20, state)[0]]),
+        kernels.ema(panel, 20)[0],
+    )
+    for rows in (5, split):  # Inside the seeding window, and after it
+        head, state = kernels.wilder(panel[:rows], 14)
+        check(
+            f"wilder:warm_start:{rows}",
+            np.vstack([head, kernels.wilder(panel[rows:], 14, state)[0]]),
+            kernels.wilder(panel, 14)[0],
+        )
+    mean, std, history = kernels.rolling_mean_std(panel[:split], 20)
+    tail = kernels.rolling_mean_std(panel[split:], 20, history)
+    check(
+        "rolling_mean_std:warm_start",
+        np.vstack([std, tail[1]]),
+        kernels.rolling_mean_std(panel, 20)[1],
+    )
+    check(
+        "true_range:warm_start",
+        kernels.true_range(high[split:], low[split:], close[split:], close[split - 1]),
+        kernels.true_range(high, low, close)[split:],
+    )
+
+    # Streaming updates after a warm-up match the batch signals
+    for key in KERNEL_INDICATORS:
+        indicator = INDICATORS[key]
+        expected = indicator["class"]().calculate(bars.copy())["Signal"].to_numpy()[split:]
+        streaming = indicator["class"]().warm_up(bars.iloc[:split])
+        signals = [streaming.update(bar) for bar in bars.iloc[split:].to_dict("records")]
+        checks.append((f"{key}:streaming", bool(np.array_equal(signals, expected))))
+
+    # One pipeline over every indicator gives each one's `calculate` output, read-only
+    from indicators.pipeline import Pipeline
+
+    original = bars.copy()
+    frames = Pipeline(list(INDICATORS)).frames(bars)
+    for key, indicator in INDICATORS.items():
+        expected = indicator["class"]().calculate(bars.copy()).reset_index(drop=True)
+        checks.append((f"{key}:pipeline", frames[key].equals(expected)))
+    checks.append(("pipeline:input_unchanged", bars.equals(original)))
+    return checks
+
+
+def chunked_peaks(size=50_000, chunk_sizes=(997, 20_000), interval="1m", seed=0):
+    """Peak traced memory of every indicator run in memory and streamed in blocks
+
+    Returns {run name: peak traced bytes}.
+    """
+    import tracemalloc
+
+    from get_indicator_data import process_ticker
+    from indicator_store import IndicatorStore
+
+    bars = generate_ohlcv(size, interval, seed=seed)
+    keys = list(INDICATORS)
+    peaks = {}
+
+    def traced(func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for backend in available_backends():
+            store = BACKENDS[backend](Path(workdir) / backend)
+            store.write("SYN", interval, bars)
+            for chunk_rows in (None, *chunk_sizes):
+                label = f"{backend}:{chunk_rows or 'in_memory'}"
+                results = IndicatorStore(Path(workdir) / "results" / label)
+                peaks[label] = traced(
+                    lambda c=chunk_rows, r=results: process_ticker(
+                        "SYN", keys, store, r, interval=interval, chunk_rows=c
+                    )
+                )
+    return peaks
+
+
+def kernel_throughput(size=1_000_000, tickers=100, repeat=3, seed=0):
+    """Bars per second of every kernel on a 1-D series and on a dates x tickers panel"""
+    bars = generate_ohlcv(size, seed=seed)
+    high, low, close = (bars[c].to_numpy() for c in ("High", "Low", "Close"))
+    panel = np.tile(close[: size // tickers, None], (1, tickers))
+    cases = {
+        "ema": (lambda x: kernels.ema(x, 20)),
+        "wilder": (lambda x: kernels.wilder(x, 14)),
+        "rolling_mean_std": (lambda x: kernels.rolling_mean_std(x, 20)),
+        "delta": kernels.delta,
+        "returns": kernels.returns,
+    }
+    results = {}
+    for name, func in cases.items():
+        results[name] = size / best_time(lambda f=func: f(close), repeat)
+        results[f"{name}:panel"] = panel.size / best_time(lambda f=func: f(panel), repeat)
+    results["true_range"] = size / best_time(
+        lambda: kernels.true_range(high, low, close), repeat
+    )
+
+    # Every kernel-based indicator on the same bars, with and without shared series
+    from get_indicator_data import apply_indicators
+
+    keys = list(KERNEL_INDICATORS)
+    separate = best_time(lambda: [apply_indicators(bars, [k]) for k in keys], repeat)
+    shared = best_time(lambda: apply_indicators(bars, keys), repeat)
+    results["indicators:separate"] = size / separate
+    results["indicators:shared"] = size / shared
+    return results
+
+
+def print_checks(checks):
+    """Print [(check name, passed)]; returns whether every check passed"""
+    for name, passed in checks:
+        print(f"{'✅' if passed else '❌'} {name}")
+    print()
+    return all(passed for _, passed in checks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline offline")
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the benchmarks and record the results")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument("--interval", default="1d")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--only", nargs="+", help="stage name prefixes to run")
+
+    compare_parser = sub.add_parser("compare", help="fail when a stage slowed down")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+    compare_parser.add_argument(
+        "--stage-threshold", nargs="+", metavar="STAGE=RATIO", help="per-stage thresholds"
+    )
+    compare_parser.add_argument("--window", type=int, default=1, help="baseline runs")
+
+    kernels_parser = sub.add_parser("kernels", help="check the indicator kernels")
+    kernels_parser.add_argument("--size", type=int, default=1_000_000, help="bars to time")
+    kernels_parser.add_argument("--repeat", type=int, default=3)
+
+    chunked_parser = sub.add_parser("chunked", help="memory of indicators streamed in blocks")
+    chunked_parser.add_argument("--size", type=int, default=50_000, help="bars to store")
+    chunked_parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[997, 20_000])
+
+    startup_parser = sub.add_parser("startup", help="fail when `nocturne list` starts slowly")
+    startup_parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == "startup":
+        best, heavy = startup(args.budget_ms, args.repeat)
+        ok = best <= args.budget_ms and not heavy
+        print(
+            f"{'✅' if ok else '❌'} nocturne list: {best:.1f} ms "
+            f"(budget {args.budget_ms:.0f} ms), heavy imports: {', '.join(heavy) or 'none'}"
+        )
+        return 0 if ok else 1
+
+    if args.command == "kernels":
+        passed = print_checks(check_kernels())
+        for name, rate in kernel_throughput(args.size, repeat=args.repeat).items():
+            print(f"{name:<28} {rate / 1e6:>10.1f} M bars/s")
+        return 0 if passed else 1
+
+    if args.command == "chunked":
+        for name, peak in chunked_peaks(args.size, args.chunk_sizes).items():
+            print(f"{name:<28} peak {peak / 2**20:>10.1f} MB")
+        return 0
+
+    if args.command == "run":
+        results = run(args.sizes, args.interval, args.repeat, args.seed, args.only)
+        save_run(args.history, results, args.interval, args.repeat)
+        print(f"\nSaved {len(results)} results to {args.history}")
+        return 0
+
+    rows = compare(
+        load_history(args.history),
+        args.threshold,
+        parse_stage_thresholds(args.stage_threshold),
+        args.window,
+    )
+    if not rows:
+        print("Not enough benchmark history to compare.")
+        return 0
+
+    regressions = 0
+    for stage, baseline, latest, change, limit, regressed in rows:
+        marker = "❌" if regressed else "✅"
+        print(
+            f"{marker} {stage:<44} {baseline * 1000:>10.2f} ms -> {latest * 1000:>10.2f} ms "
+            f"({change:+.1%}, limit {limit:+.0%})"
+        )
+        regressions += regressed
+    print(f"\n{regressions} regression(s) out of {len(rows)} stages")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# src/catalog.py
+"""
+SQLite manifest of the files held by a data store.
+
+Every store write records one row per file: ticker, interval, backend, the actual first
+and last bar (ISO timestamps, plus UTC epoch nanoseconds for ordering), row count,
+size, SHA-256 checksum and the path relative to the store root. Lookups by
+(backend, ticker, interval) are indexed, so listing series, finding a series' files or
+its date range never scans or parses the data directory.
+
+The manifest lives next to the data (ROOT/catalog.sqlite) and is rebuilt from the files
+on disk when it is missing (see the stores' `rebuild_catalog`).
+
+The `derived` table marks series that were resampled locally from a finer interval
+(see resample.py), with the state of the source series they were built from.
+"""
+import hashlib
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+CATALOG_NAME = "catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    first_bar TEXT NOT NULL,
+    last_bar TEXT NOT NULL,
+    first_utc INTEGER NOT NULL,
+    last_utc INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    checksum TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_series ON files (backend, ticker, interval, first_utc);
+CREATE TABLE IF NOT EXISTS derived (
+    backend TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    source_interval TEXT NOT NULL,
+    source_first_utc INTEGER NOT NULL,
+    source_last_utc INTEGER NOT NULL,
+    source_rows INTEGER NOT NULL,
+    PRIMARY KEY (backend, ticker, interval)
+);
+"""
+
+
+def file_checksum(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Catalog:
+    """Indexed manifest of the files of one store root"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.root = self.path.parent
+
+    def _relative(self, path):
+        return str(Path(path).resolve().relative_to(self.root.resolve()))
+
+    def exists(self):
+        return self.path.exists()
+
+    def _connect(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        # One short-lived connection per operation keeps the catalog usable from
+        # threads and worker processes; WAL lets readers run during a write.
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _query(self, sql, params=()):
+        if not self.exists():
+            return []
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def record(self, backend, ticker, interval, path, first, last, rows):
+        """
+        Add or refresh the entry of a file that was just written.
+
+        `first` and `last` are (ISO timestamp, UTC epoch nanoseconds) pairs.
+        """
+        path = Path(path)
+        entry = (
+            self._relative(path),
+            backend,
+            ticker,
+            interval,
+            first[0],
+            last[0],
+            first[1],
+            last[1],
+            rows,
+            path.stat().st_size,
+            file_checksum(path),
+        )
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", entry
+            )
+
+    def remove(self, *paths):
+        relative = [(self._relative(p),) for p in paths]
+        if relative and self.exists():
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("DELETE FROM files WHERE path = ?", relative)
+
+    def clear(self, backend):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM files WHERE backend = ?", (backend,))
+
+    def entries(self, backend, ticker=None, interval=None):
+        """Entries of a backend (optionally one ticker/interval), oldest first"""
+        sql, params = "SELECT * FROM files WHERE backend = ?", [backend]
+        if ticker is not None:
+            sql, params = sql + " AND ticker = ?", [*params, ticker]
+        if interval is not None:
+            sql, params = sql + " AND interval = ?", [*params, interval]
+        rows = self._query(sql + " ORDER BY ticker, interval, first_utc", params)
+        return [dict(row) for row in rows]
+
+    def files(self, backend, ticker, interval):
+        """Absolute paths of a series' files, oldest range first"""
+        return [self.root / e["path"] for e in self.entries(backend, ticker, interval)]
+
+    def series(self, backend):
+        rows = self._query(
+            "SELECT DISTINCT ticker, interval FROM files WHERE backend = ? "
+            "ORDER BY ticker, interval",
+            (backend,),
+        )
+        return [(row["ticker"], row["interval"]) for row in rows]
+
+    def bounds(self, backend, ticker, interval):
+        """ISO timestamps of the first and last bar of a series, or None"""
+        rows = self._query(
+            "SELECT "
+            "(SELECT first_bar FROM files WHERE backend = ?1 AND ticker = ?2 "
+            "AND interval = ?3 ORDER BY first_utc LIMIT 1), "
+            "(SELECT last_bar FROM files WHERE backend = ?1 AND ticker = ?2 "
+            "AND interval = ?3 ORDER BY last_utc DESC LIMIT 1)",
+            (backend, ticker, interval),
+        )
+        if not rows or rows[0][0] is None:
+            return None
+        return rows[0][0], rows[0][1]
+
+    def overlapping(self, backend):
+        """(ticker, interval) series stored in more than one file"""
+        rows = self._query(
+            "SELECT ticker, interval FROM files WHERE backend = ? "
+            "GROUP BY ticker, interval HAVING COUNT(*) > 1 ORDER BY ticker, interval",
+            (backend,),
+        )
+        return [(row["ticker"], row["interval"]) for row in rows]
+
+    def state(self, backend, ticker, interval):
+        """(first_utc, last_utc, rows) over every file of a series, or None"""
+        rows = self._query(
+            "SELECT MIN(first_utc), MAX(last_utc), SUM(rows) FROM files "
+            "WHERE backend = ? AND ticker = ? AND interval = ?",
+            (backend, ticker, interval),
+        )
+        if not rows or rows[0][0] is None:
+            return None
+        return tuple(rows[0])
+
+    def states(self, backend, interval):
+        """{ticker: (first_utc, last_utc, rows)} for every series of an interval"""
+        rows = self._query(
+            "SELECT ticker, MIN(first_utc), MAX(last_utc), SUM(rows) FROM files "
+            "WHERE backend = ? AND interval = ? GROUP BY ticker",
+            (backend, interval),
+        )
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def record_derived(self, backend, ticker, interval, source_interval, source_state):
+        """Mark a series as resampled from `source_interval` in state (first, last, rows)"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO derived VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (backend, ticker, interval, source_interval, *source_state),
+            )
+
+    def drop_derived(self, backend, ticker, interval):
+        """Forget that a series was derived, e.g. once it has been downloaded"""
+        if self.exists():
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "DELETE FROM derived WHERE backend = ? AND ticker = ? AND interval = ?",
+                    (backend, ticker, interval),
+                )
+
+    def derived(self, backend, ticker):
+        """{interval: derived entry} for the derived series of a ticker"""
+        rows = self._query(
+            "SELECT * FROM derived WHERE backend = ? AND ticker = ?", (backend, ticker)
+        )
+        return {row["interval"]: dict(row) for row in rows}
+
+    def derived_tickers(self, backend, interval):
+        """Tickers whose `interval` series is derived"""
+        rows = self._query(
+            "SELECT ticker FROM derived WHERE backend = ? AND interval = ? ORDER BY ticker",
+            (backend, interval),
+        )
+        return [row["ticker"] for row in rows]
+
+    def verify(self, backend):
+        """Paths whose file is missing or no longer matches the recorded checksum"""
+        stale = []
+        for entry in self.entries(backend):
+            path = self.root / entry["path"]
+            if not path.exists() or (
+                path.stat().st_size != entry["bytes"]
+                or file_checksum(path) != entry["checksum"]
+            ):
+                stale.append(path)
+        return stale
@@ -1,27 +1,137 @@
 #!/usr/bin/env python3
-import glob
-import os
+"""
+Graph stored closing prices.
 
-import matplotlib.pyplot as plt
+Interactive by default: pick stocks and a date range, and the chart opens in a window.
+With --batch, charts for a list of tickers are rendered headless (Agg) to PNG or SVG
+files by worker processes, optionally with the `Signal` markers of stored indicators.
+
+Either way the series is downsampled to the chart's pixel width before plotting
+(min/max buckets by default, or LTTB), so minute bars with hundreds of thousands of
+rows draw as fast as a daily series while keeping every peak and trough.
+
+Usage:
+  python src/create_graph.py
+  python src/create_graph.py --batch --tickers AAPL MSFT --interval 1m --format svg
+  python src/create_graph.py --batch --signals djia_weakness weekly_average_buy
+"""
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
-import questionary
+from indicator_store import IndicatorStore
+from instrumentation import add_arguments, profiling, span
+from storage import get_store
+
+DEFAULT_OUTPUT_DIR = "data-files/charts"
+DOWNSAMPLERS = ("minmax", "lttb")
+
+# Below this many plotted points every bar still gets its own marker.
+MARKER_LIMIT = 200
+
+
+def min_max_indices(y, buckets):
+    """
+    Indices of the minimum and maximum of `y` in each of `buckets` equal-width buckets,
+    plus the first and last point, in order. Every peak and trough visible at that
+    resolution is kept.
+    """
+    n = len(y)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    size = -(-n // buckets)
+    rows = -(-n // size)
+    values = np.asarray(y, dtype=np.float64)
+
+    padded = np.full(rows * size, np.inf)
+    padded[:n] = values
+    lows = padded.reshape(rows, size).argmin(axis=1)
+    padded[n:] = -np.inf
+    highs = padded.reshape(rows, size).argmax(axis=1)
+
+    offsets = np.arange(rows) * size
+    return np.unique(np.concatenate([[0, n - 1], offsets + lows, offsets + highs]))
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the `threshold` points kept by Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x[0]  # Keep epoch nanoseconds well inside float64 precision
+    y = np.asarray(y, dtype=np.float64)
 
+    # threshold - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
 
-def parse_filename(file_path):
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        # Twice the triangle area between the last kept point, each candidate and the
+        # average of the next bucket
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(df, width_px, method="minmax"):
+    """Rows of `df` to plot for a chart `width_px` pixels wide"""
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampler {method!r}. Valid options: {DOWNSAMPLERS}")
+    with span("downsample", method=method, points=len(df)):
+        if method == "lttb":
+            x = df["Date"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+            indices = lttb_indices(x, df["Close"].to_numpy(), 2 * width_px)
+        else:
+            indices = min_max_indices(df["Close"].to_numpy(), width_px)
+    return df.iloc[indices]
+
+
+def signal_points(df, signals, width_px):
     """
-    Parse a filename of the format:
-      STOCK_YYYY-MM-DD_YYYY-MM-DD_interval.csv
-    Returns (stock, start_date, end_date, interval) if successful.
+    Dates and closes of the signalled bars, at most one marker per pixel column.
+
+    `signals` is a frame with 'Date' and one boolean column per indicator.
     """
-    filename = os.path.basename(file_path)
-    parts = filename.split("_")
-    if len(parts) < 4:
-        return None
-    stock = parts[0]
-    start_date = parts[1]
-    end_date = parts[2]
-    interval = parts[3].replace(".csv", "")
-    return stock, start_date, end_date, interval
+    merged = df[["Date", "Close"]].merge(signals, on="Date", how="left")
+    offsets = (merged["Date"] - merged["Date"].iloc[0]).to_numpy().astype("timedelta64[ns]")
+    offsets = offsets.astype(np.int64)
+    pixel = (offsets / max(offsets[-1], 1) * (width_px - 1)).astype(np.int64)
+
+    points = {}
+    for column in signals.columns.drop("Date"):
+        hits = np.flatnonzero(merged[column].eq(True).to_numpy())
+        _, first = np.unique(pixel[hits], return_index=True)
+        rows = merged.iloc[hits[first]]
+        points[column] = (rows["Date"], rows["Close"])
+    return points
+
+
+def plot_close(ax, df, title, width_px, method="minmax", signals=None):
+    """Draw a downsampled close line (and optional signal markers) on an Axes"""
+    plotted = downsample(df, width_px, method)
+    marker = "o" if len(plotted) <= MARKER_LIMIT else None
+    ax.plot(plotted["Date"], plotted["Close"], marker=marker, linestyle="-", linewidth=0.8)
+    if signals is not None and not signals.empty:
+        for label, (dates, closes) in signal_points(df, signals, width_px).items():
+            ax.scatter(dates, closes, marker="^", s=24, label=label, zorder=3)
+        ax.legend(loc="best")
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Close Price")
+    ax.grid(True)
+    ax.tick_params(axis="x", labelrotation=45)
+    return plotted
 
 
 def list_available_stocks(stock_files):
@@ -29,16 +139,15 @@ def list_available_stocks(stock_files):
     print("Available stocks and their data:")
     for stock, files in stock_files.items():
         for file_info in files:
-            file_path, start_date, end_date, interval = file_info
+            interval, start_date, end_date = file_info
             print(
-                f"Stock: {stock} | File: {os.path.basename(file_path)} | "
-                f"Timeframe: {start_date} to {end_date} | Interval: {interval}"
+                f"Stock: {stock} | Timeframe: {start_date} to {end_date} | Interval: {interval}"
             )
 
 
-def process_stock(stock, file_info):
+def process_stock(stock, file_info, store):
     """Handles prompting for date range, data filtering, and plotting for a given stock."""
-    file_path, available_start, available_end, available_interval = file_info
+    available_interval, available_start, available_end = file_info
 
     print(f"\nFor stock {stock}:")
     print(f"Available Timeframe: {available_start} to {available_end}")
@@ -55,13 +164,6 @@ def process_stock(stock, file_info):
         custom_start = available_start
         custom_end = available_end
 
-    # Read CSV data, parsing the 'Date' column.
-    try:
-        df = pd.read_csv(file_path, parse_dates=["Date"])
-    except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
-        return
-
     # Convert custom dates to datetime.
     try:
         custom_start_dt = pd.to_datetime(custom_start)
@@ -70,38 +172,123 @@ def process_stock(stock, file_info):
         print("Invalid date format. Please use YYYY-MM-DD.")
         return
 
-    # Filter the DataFrame to the specified date range.
-    df_filtered = df[(df["Date"] >= custom_start_dt) & (df["Date"] <= custom_end_dt)]
+    # Load only the requested date range and the Close column.
+    try:
+        df_filtered = store.read(
+            stock, available_interval, custom_start_dt, custom_end_dt, columns=["Close"]
+        )
+    except Exception as e:
+        print(f"Error reading data for {stock}: {e}")
+        return
+
     if df_filtered.empty:
         print("No data available in the specified date range.")
         return
 
-    # Plot the Close prices over time.
-    plt.figure(figsize=(10, 5))
-    plt.plot(df_filtered["Date"], df_filtered["Close"], marker="o", linestyle="-")
-    plt.title(f"{stock} Closing Prices")
-    plt.xlabel("Date")
-    plt.ylabel("Close Price")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    # Plot the Close prices over time, downsampled to the window's pixel width.
+    import matplotlib.pyplot as plt
+
+    with span("plot", ticker=stock, interval=available_interval, points=len(df_filtered)):
+        fig = plt.figure(figsize=(10, 5))
+        width_px = int(fig.get_figwidth() * fig.dpi)
+        plot_close(fig.gca(), df_filtered, f"{stock} Closing Prices", width_px)
+        fig.tight_layout()
     plt.show()
 
 
-def main():
-    csv_dir = "data-files/raw"
-    csv_files = glob.glob(os.path.join(csv_dir, "*.csv"))
-    if not csv_files:
-        print("No CSV files found in", csv_dir)
+def load_signals(results, ticker, keys, interval):
+    """The `Signal` column of each stored indicator, aligned on 'Date'"""
+    signals = results.read(ticker, keys, interval, columns=["Signal"])
+    return signals.rename(columns={f"{k}_Signal": k for k in keys})
+
+
+def render_chart(
+    ticker,
+    store,
+    output_dir=DEFAULT_OUTPUT_DIR,
+    interval="1d",
+    fmt="png",
+    size=(1200, 600),
+    dpi=100,
+    method="minmax",
+    signal_keys=None,
+    results=None,
+    start=None,
+    end=None,
+):
+    """
+    Render one ticker's chart to OUTPUT_DIR/TICKER_INTERVAL.<fmt> without a display.
+
+    Uses a bare Figure (Agg for PNG, the SVG backend for SVG), so it is safe to run in
+    worker processes. Returns (ticker, path or None, error or None).
+    """
+    from matplotlib.figure import Figure
+
+    try:
+        with span("render", ticker=ticker, interval=interval):
+            df = store.read(ticker, interval, start, end, columns=["Close"])
+            if df.empty:
+                raise ValueError("no data in the requested range")
+            signals = None
+            if signal_keys:
+                signals = load_signals(
+                    results or IndicatorStore(), ticker, signal_keys, interval
+                )
+
+            width_px, height_px = size
+            fig = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi)
+            with span("plot", points=len(df)):
+                plot_close(
+                    fig.add_subplot(),
+                    df,
+                    f"{ticker} Closing Prices ({interval})",
+                    width_px,
+                    method,
+                    signals,
+                )
+                fig.tight_layout()
+
+            path = Path(output_dir) / f"{ticker}_{interval}.{fmt}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with span("save", format=fmt):
+                fig.savefig(path, format=fmt)
+        return ticker, str(path), None
+    except Exception as e:
+        return ticker, None, f"{type(e).__name__}: {e}"
+
+
+def render_batch(tickers, store, workers=None, **options):
+    """
+    Render charts for many tickers on a process pool (see `render_chart` for options).
+
+    Returns ({ticker: path}, {ticker: error}).
+    """
+    outputs, failures = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_chart, t, store, **options) for t in tickers]
+        for future in as_completed(futures):
+            ticker, path, error = future.result()
+            if error is None:
+                outputs[ticker] = path
+            else:
+                failures[ticker] = error
+    return dict(sorted(outputs.items())), dict(sorted(failures.items()))
+
+
+def graph_interactive():
+    store = get_store()
+    series = store.series()
+    if not series:
+        print("No stock data found in", store.root)
         return
 
-    # Build a dictionary mapping each stock symbol to its file(s) and metadata.
+    # Build a dictionary mapping each stock symbol to its intervals and timeframes.
     stock_files = {}
-    for file in csv_files:
-        info = parse_filename(file)
-        if info:
-            stock, start_date, end_date, interval = info
-            stock_files.setdefault(stock, []).append((file, start_date, end_date, interval))
+    for stock, interval in series:
+        start, end = store.bounds(stock, interval)
+        stock_files.setdefault(stock, []).append(
+            (interval, str(start.date()), str(end.date()))
+        )
 
     # Optionally list all available stocks and details.
     list_available_stocks(stock_files)
@@ -110,6 +297,8 @@ def main():
     available_stocks = sorted(stock_files.keys())
 
     # Use questionary to let the user select stocks with arrow keys.
+    import questionary
+
     selected_stocks = questionary.checkbox(
         "Select the stock(s) you want to graph:", choices=available_stocks
     ).ask()
@@ -119,9 +308,54 @@ def main():
         return
 
     for stock in selected_stocks:
-        # For simplicity, we take the first file for the stock.
-        process_stock(stock, stock_files[stock][0])
+        # For simplicity, we take the first interval for the stock.
+        process_stock(stock, stock_files[stock][0], store)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Graph stored closing prices")
+    parser.add_argument("--batch", action="store_true", help="render files without prompts")
+    parser.add_argument("--tickers", nargs="+", help="defaults to every stored ticker")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--start", help="first date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date (YYYY-MM-DD)")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--format", default="png", choices=["png", "svg"])
+    parser.add_argument("--width", type=int, default=1200, help="chart width in pixels")
+    parser.add_argument("--height", type=int, default=600, help="chart height in pixels")
+    parser.add_argument("--downsample", default="minmax", choices=DOWNSAMPLERS)
+    parser.add_argument("--signals", nargs="+", metavar="INDICATOR", help="overlay signals")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    args = add_arguments(parser).parse_args(argv)
+
+    if not args.batch:
+        with profiling(args, "create_graph"):
+            graph_interactive()
+        return 0
+
+    store = get_store()
+    tickers = [t.upper() for t in args.tickers] if args.tickers else None
+    tickers = tickers or sorted({t for t, i in store.series() if i == args.interval})
+    with profiling(args, "create_graph"):
+        outputs, failures = render_batch(
+            tickers,
+            store,
+            workers=args.workers,
+            output_dir=args.output_dir,
+            interval=args.interval,
+            fmt=args.format,
+            size=(args.width, args.height),
+            method=args.downsample,
+            signal_keys=args.signals,
+            start=args.start,
+            end=args.end,
+        )
+    for ticker, path in outputs.items():
+        print(f"✅ {ticker}: {path}")
+    for ticker, error in failures.items():
+        print(f"❌ {ticker}: {error}")
+    return 0 if not failures else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,81 +1,89 @@
 # src/indicators/get_indicator_data.py
-from pathlib import Path
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-import pandas as pd
-import questionary
+from indicator_cache import DEFAULT_MAX_BYTES, IndicatorCache, fingerprint
+from indicator_store import DEFAULT_ROOT, IndicatorStore
 from indicators import INDICATORS
+from indicators.pipeline import Pipeline
+from instrumentation import add_arguments, profiling, span
+from resample import Pyramid
+from storage import get_store
 
 
-def get_available_tickers(raw_data_dir):
-    """Get sorted list of available tickers from raw data files"""
-    data_files = list(raw_data_dir.glob("*_*_*_1d.csv"))
-    tickers = sorted({f.name.split("_")[0] for f in data_files})
-    return tickers
+def get_available_tickers(store, interval="1d"):
+    """Get sorted list of tickers whose interval is stored or derivable from finer bars"""
+    return Pyramid(store).tickers(interval)
 
 
-def process_stock_data(ticker, indicator, raw_data_dir, output_dir):
-    """Process a single stock's data file with interactive file selection"""
-    try:
-        # Find matching data files
-        pattern = f"{ticker}_*_*_1d.csv"
-        input_files = list(raw_data_dir.glob(pattern))
-
-        if not input_files:
-            raise FileNotFoundError(f"No data file found for {ticker}")
-
-        # Handle multiple file matches
-        if len(input_files) > 1:
-            file_choices = []
-            for f in input_files:
-                parts = f.stem.split("_")
-                if len(parts) >= 3:
-                    date_range = f"{parts[1]} to {parts[2]}"
-                else:
-                    date_range = "Unknown date range"
-                file_choices.append(
-                    questionary.Choice(title=f"{f.name} ({date_range})", value=f)
-                )
+def load_stock_data(ticker, store, interval="1d"):
+    """Load a stock's bars as one series, deriving them from stored finer bars if needed"""
+    return Pyramid(store).read(ticker, interval)
 
-            input_file = questionary.select(
-                f"Multiple configurations found for {ticker}. Select file:",
-                choices=file_choices,
-                instruction="(↑↓ to navigate, Enter to select)",
-            ).ask()
-        else:
-            input_file = input_files[0]
-
-        # Generate base filename without indicator key
-        input_stem = input_file.stem.rsplit("_", 1)[0]  # Remove existing indicator suffix
-        output_file = output_dir / f"{input_stem}_indicator.csv"
-
-        # Read data and apply indicator
-        df = pd.read_csv(input_file, parse_dates=["Date"])
-        strategy = indicator["class"]()
-        df = strategy.calculate(df)
-
-        # Prefix columns with indicator key
-        df = df.rename(
-            columns={col: f"{indicator['key']}_{col}" for col in df.columns if col != "Date"}
-        )
 
-        # Check for existing file and merge data
-        if output_file.exists():
-            existing_df = pd.read_csv(output_file, parse_dates=["Date"])
+def _prefixed(result, key):
+    return result.rename(
+        columns={col: f"{key}_{col}" for col in result.columns if col != "Date"}
+    )
 
-            # Check if date ranges match
-            if not existing_df["Date"].equals(df["Date"]):
-                # Handle timeframe mismatch - create new file with indicator suffix
-                output_file = output_dir / f"{input_stem}_{indicator['key']}_indicator.csv"
-                df.to_csv(output_file, index=False)
-            else:
-                # Merge new columns into existing data
-                merged_df = existing_df.copy()
-                for col in df.columns:
-                    if col != "Date":
-                        merged_df[col] = df[col]
-                merged_df.to_csv(output_file, index=False)
-        else:
-            df.to_csv(output_file, index=False)
+
+def apply_indicator(df, key, cache=None, data_fingerprint=None):
+    """Run one registered indicator on `df` and prefix its columns with the key
+
+    With a cache, the result is looked up by the fingerprint of `df` (computed here
+    unless given) and only computed on a miss.
+    """
+    return apply_indicators(df, [key], cache, data_fingerprint)[key]
+
+
+def apply_indicators(df, keys, cache=None, data_fingerprint=None):
+    """Run several indicators on the same bars; returns {key: prefixed columns}
+
+    Cached results are reused; the remaining indicators are evaluated together by one
+    Pipeline, which computes the series they share (dates, shifted closes, EMAs, true
+    range...) once and never copies or modifies `df` (see indicators/pipeline.py).
+    """
+    results, cache_keys = {}, {}
+    if cache is not None:
+        data_fingerprint = data_fingerprint or fingerprint(df)
+        for key in keys:
+            cache_keys[key] = cache.key(data_fingerprint, key, INDICATORS[key]["class"])
+            cached = cache.get(cache_keys[key])
+            if cached is not None:
+                results[key] = cached
+    missing = [key for key in keys if key not in results]
+    if missing:
+        frames = Pipeline(missing).frames(df)
+        for key in missing:
+            results[key] = _prefixed(frames[key], key)
+            if cache is not None:
+                cache.put(cache_keys[key], results[key])
+    return {key: results[key] for key in keys}
+
+
+def apply_indicators_blocks(blocks, keys):
+    """Run several indicators over bars read in blocks; yields {key: prefixed columns}
+
+    `blocks` returns a fresh iterator over consecutive frames of bars (see
+    Pipeline.run_blocks). The lookback of every indicator is carried from one block to
+    the next, so the blocks concatenate to what `apply_indicators` returns for the whole
+    series while only one block is in memory. Results are not cached: the cache keys on
+    a fingerprint of the whole frame.
+    """
+    for frames in Pipeline(keys).frame_blocks(blocks):
+        yield {key: _prefixed(frames[key], key) for key in keys}
+
+
+def process_stock_data(ticker, indicator, store, results, cache=None, interval="1d"):
+    """Process a single stock's data and store the indicator's columns"""
+    try:
+        with span("process_ticker", ticker=ticker):
+            df = load_stock_data(ticker, store, interval)
+            df = apply_indicator(df, indicator["key"], cache)
+            output_file = results.write(ticker, indicator["key"], df, interval)
         print(f"✅ Processed {ticker} with {indicator['name']} ({len(df)} records)")
         print(f"📁 Output: {output_file}\n")
         return True
@@ -85,20 +93,107 @@ def process_stock_data(ticker, indicator, raw_data_dir, output_dir):
         return False
 
 
-def main():
+def process_ticker(ticker, keys, store, results, cache=None, interval="1d", chunk_rows=None):
+    """Read one ticker once, run every requested indicator and store each one's columns
+
+    With `chunk_rows`, the bars are streamed in blocks of that many rows and each
+    block's results are written before the next block is read, so memory stays bounded
+    by the block size instead of the length of the series (the cache is not used).
+    Runs in a worker process; returns (ticker, output directory or None, error or None,
+    cache stats or None).
+    """
+    try:
+        with span("process_ticker", ticker=ticker):
+            if chunk_rows:
+                blocks = apply_indicators_blocks(
+                    lambda: Pyramid(store).read_blocks(ticker, interval, chunk_rows), keys
+                )
+                results.write_blocks(ticker, blocks, interval)
+                output_file = results.path(ticker, keys[0], interval)
+            else:
+                df = load_stock_data(ticker, store, interval)
+                for key, result in apply_indicators(df, keys, cache).items():
+                    output_file = results.write(ticker, key, result, interval)
+        output, error = str(output_file.parent), None
+    except Exception as e:
+        output, error = None, f"{type(e).__name__}: {e}"
+    return ticker, output, error, cache.stats() if cache is not None else None
+
+
+def run_batch(
+    keys,
+    store,
+    results,
+    tickers=None,
+    workers=None,
+    cache=None,
+    interval="1d",
+    chunk_rows=None,
+):
+    """
+    Compute a subset of INDICATORS over a universe of tickers on a process pool.
+
+    Each ticker is handled by one task: its bars are read once, every indicator in
+    `keys` is run on them and each indicator's columns are written once. Failures are
+    collected per ticker. With a cache, unchanged inputs are not recomputed. Returns a
+    JSON-serialisable summary of the run. Intervals that are not stored are derived
+    from stored finer bars (see resample.py). With `chunk_rows`, each ticker is streamed
+    in blocks of that many rows (see process_ticker).
+    """
+    unknown = [k for k in keys if k not in INDICATORS]
+    if unknown:
+        raise ValueError(f"Unknown indicators: {', '.join(unknown)}")
+
+    tickers = tickers or get_available_tickers(store, interval)
+    started = time.perf_counter()
+    outputs, failures = {}, {}
+    cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(process_ticker, t, keys, store, results, cache, interval, chunk_rows)
+            for t in tickers
+        ]
+        for future in as_completed(futures):
+            ticker, output_file, error, stats = future.result()
+            if error is None:
+                outputs[ticker] = output_file
+            else:
+                failures[ticker] = error
+            for name in cache_stats if stats else ():
+                cache_stats[name] += stats[name]
+
+    summary = {
+        "indicators": list(keys),
+        "interval": interval,
+        "chunk_rows": chunk_rows,
+        "tickers": len(tickers),
+        "succeeded": len(outputs),
+        "failed": len(failures),
+        "seconds": round(time.perf_counter() - started, 3),
+        "outputs": dict(sorted(outputs.items())),
+        "failures": dict(sorted(failures.items())),
+    }
+    if cache is not None:
+        summary["cache"] = cache_stats
+    return summary
+
+
+def indicators_interactive():
     """Main function to execute the strategy"""
     # Configure paths
-    raw_data_dir = Path("data-files/raw")
-    output_dir = Path("data-files/indicator-result")
-    output_dir.mkdir(parents=True, exist_ok=True)
+    store = get_store()
+    results = IndicatorStore()
 
     # Get available tickers
-    tickers = get_available_tickers(raw_data_dir)
+    tickers = get_available_tickers(store)
 
     if not tickers:
-        print(f"❌ No data files found in {raw_data_dir.resolve()}")
+        print(f"❌ No data files found in {store.root.resolve()}")
         return
 
+    import questionary
+
     # Select indicator
     selected_indicator_key = questionary.select(
         "Select an indicator to use:",
@@ -127,17 +222,69 @@ def main():
     # Process selected stocks
     print("\n🚀 Processing stocks...\n")
     success_count = 0
+    cache = IndicatorCache()
 
     for ticker in selected_tickers:
-        success = process_stock_data(ticker, selected_indicator, raw_data_dir, output_dir)
+        success = process_stock_data(ticker, selected_indicator, store, results, cache)
         if success:
             success_count += 1
 
     # Show summary
     print(f"\n🎉 Successfully processed {success_count}/{len(selected_tickers)} stocks")
     print(f"Indicator used: {selected_indicator['name']}")
-    print(f"Output directory: {output_dir.resolve()}")
+    print(f"Output directory: {results.root.resolve()}")
+    stats = cache.stats()
+    print(f"Cache: {stats['hits']} hits, {stats['misses']} misses")
+
+
+def main(argv=None):
+    """
+    Entry point: interactive prompts by default, or with --batch all (or selected)
+    indicators over the whole universe without prompts
+    """
+    parser = argparse.ArgumentParser(description="Compute indicators for many tickers")
+    parser.add_argument("--batch", action="store_true", help="run without prompts")
+    parser.add_argument(
+        "--indicators", nargs="+", default=list(INDICATORS), choices=list(INDICATORS)
+    )
+    parser.add_argument("--tickers", nargs="+", help="defaults to every ticker with data")
+    parser.add_argument("--interval", default="1d", help="derived from finer bars if needed")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--output-dir", default=DEFAULT_ROOT)
+    parser.add_argument("--summary", help="also write the JSON summary to this file")
+    parser.add_argument("--no-cache", action="store_true", help="always recompute")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="stream each ticker in blocks of this many rows to bound memory (no cache)",
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_MAX_BYTES // 2**20, help="cache size in MB"
+    )
+    args = add_arguments(parser).parse_args(argv)
+
+    if not args.batch:
+        with profiling(args, "get_indicator_data"):
+            indicators_interactive()
+        return 0
+
+    with profiling(args, "get_indicator_data"):
+        summary = run_batch(
+            args.indicators,
+            get_store(),
+            IndicatorStore(args.output_dir),
+            tickers=[t.upper() for t in args.tickers] if args.tickers else None,
+            workers=args.workers,
+            cache=None if args.no_cache else IndicatorCache(max_bytes=args.cache_size * 2**20),
+            interval=args.interval,
+            chunk_rows=args.chunk_size,
+        )
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if summary["failed"] == 0 else 1
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
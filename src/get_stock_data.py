@@ -1,8 +1,14 @@
+import argparse
 import os
 from datetime import datetime, timedelta
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
-import yfinance as yf
+from instrumentation import add_arguments, profiling, span
+from providers import get_provider
+from resample import Pyramid
+from storage import get_store, merge_bars
 
 
 def get_valid_date(prompt, default_date):
@@ -17,33 +23,51 @@ def get_valid_date(prompt, default_date):
             print("Invalid date format. Please use YYYY-MM-DD.")
 
 
+VALID_INTERVALS = [
+    "1m",
+    "2m",
+    "5m",
+    "15m",
+    "30m",
+    "60m",
+    "90m",
+    "1h",
+    "1d",
+    "5d",
+    "1wk",
+    "1mo",
+    "3mo",
+]
+
+
 def get_valid_interval(prompt, default_interval):
-    valid_intervals = [
-        "1m",
-        "2m",
-        "5m",
-        "15m",
-        "30m",
-        "60m",
-        "90m",
-        "1h",
-        "1d",
-        "5d",
-        "1wk",
-        "1mo",
-        "3mo",
-    ]
     while True:
         interval = input(prompt).strip().lower()
         if not interval:
             return default_interval
-        if interval in valid_intervals:
+        if interval in VALID_INTERVALS:
             return interval
-        print(f"Invalid interval. Valid options are: {', '.join(valid_intervals)}")
+        print(f"Invalid interval. Valid options are: {', '.join(VALID_INTERVALS)}")
+
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close"]
+
+# Prices are only stored as float32 when no value moves by more than half of the
+# smallest quoted tick (0.0001); float32 keeps ~7 significant digits.
+PRICE_TOLERANCE = 5e-5
+
+DEFAULT_CHUNK_ROWS = 250_000
+
 
+def clean_data(df, compact=False, chunk_size=None):
+    """Clean the stock data by removing incorrect headers, ensuring data types, and dropping NaNs.
 
-def clean_data(df):
-    """Clean the stock data by removing incorrect headers, ensuring data types, and dropping NaNs."""
+    With `compact`, prices are downcast to float32 where precision allows, volume uses the
+    smallest safe integer type and dates carrying UTC offsets are normalised to UTC, so
+    'Date' is always an int64-backed datetime64 column (see `compact_dtypes`).
+    With `chunk_size`, the columns are converted `chunk_size` rows at a time so the
+    conversion temporaries stay bounded however large the frame is.
+    """
     if df.empty:
         print("No data found for the given parameters.")
         return None
@@ -61,73 +85,273 @@ def clean_data(df):
 
     df.columns = expected_columns  # Assign correct column names
 
-    # Convert to proper data types
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Open"] = pd.to_numeric(df["Open"], errors="coerce")
-    df["High"] = pd.to_numeric(df["High"], errors="coerce")
-    df["Low"] = pd.to_numeric(df["Low"], errors="coerce")
-    df["Close"] = pd.to_numeric(df["Close"], errors="coerce")
+    if not chunk_size or len(df) <= chunk_size:
+        return _clean_rows(df, compact)
+
+    # Chunks are compacted independently; concat widens a column only when a chunk
+    # needed the wider type, so no full-size float64 copy is built in between.
+    return pd.concat(
+        [
+            _clean_rows(df.iloc[i : i + chunk_size].copy(), compact)
+            for i in range(0, len(df), chunk_size)
+        ]
+    )
 
-    if "Adj Close" in df.columns:
-        df["Adj Close"] = pd.to_numeric(df["Adj Close"], errors="coerce")
 
-    df["Volume"] = pd.to_numeric(df["Volume"], errors="coerce")
+def _clean_rows(df, compact=False):
+    """Convert the named columns of a block of raw rows and drop unusable rows"""
+    # Convert to proper data types; columns that are already numeric are left alone
+    df["Date"] = _parse_dates(df["Date"], utc=compact)
+    for column in [*(c for c in PRICE_COLUMNS if c in df.columns), "Volume"]:
+        if not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], errors="coerce")
 
     # Drop NaN values if any
     df.dropna(inplace=True)
 
-    return df
+    return compact_dtypes(df) if compact else df
 
 
-# Get user inputs with validation
-today = datetime.today().date()
-default_start = today - timedelta(days=5 * 365)  # Approximate 5 years
+def _parse_dates(dates, utc=False):
+    """Parse dates, converting offset-carrying strings to UTC when they mix offsets (or with `utc`)"""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    try:
+        parsed = pd.to_datetime(dates, errors="coerce")
+    except ValueError:
+        # Intraday bars spanning a DST change carry mixed UTC offsets.
+        return pd.to_datetime(dates, errors="coerce", utc=True)
+    if utc and getattr(parsed.dtype, "tz", None) is not None:
+        # A fixed offset differs between chunks on either side of a DST change.
+        return parsed.dt.tz_convert("UTC")
+    return parsed
 
-# Ticker input
-while True:
-    ticker = input("Enter stock ticker symbol (e.g., AAPL): ").strip().upper()
-    if ticker:
-        break
-    print("Ticker cannot be empty. Please try again.")
 
-# Date inputs
-start_date = get_valid_date(
-    f"Enter start date [YYYY-MM-DD] (default: {default_start}): ", default_start
-)
+def compact_dtypes(df):
+    """
+    Downcast a cleaned frame in place: float32 prices where no value moves by more than
+    PRICE_TOLERANCE, the smallest integer type holding every volume (volumes with a
+    fractional part stay float) and an int64-backed 'Date' column.
+    """
+    for column in (c for c in PRICE_COLUMNS if c in df.columns):
+        values = df[column].to_numpy(dtype=np.float64)
+        narrow = values.astype(np.float32)
+        if len(values) == 0 or np.max(np.abs(narrow - values)) <= PRICE_TOLERANCE:
+            df[column] = narrow
 
-end_date = get_valid_date(f"Enter end date [YYYY-MM-DD] (default: {today}): ", today)
+    volume = df["Volume"].to_numpy()
+    if len(volume) and np.all(np.mod(volume, 1) == 0):
+        downcast = "unsigned" if volume.min() >= 0 else "integer"
+        df["Volume"] = pd.to_numeric(df["Volume"].astype(np.int64), downcast=downcast)
 
-# Ensure end date is after start date
-while end_date <= start_date:
-    print("End date must be after start date.")
-    end_date = get_valid_date(f"Enter end date [YYYY-MM-DD] (default: {today}): ", today)
+    if df["Date"].dtype == object:
+        df["Date"] = pd.to_datetime(df["Date"], utc=True)
+    return df
 
-# Interval input
-interval = get_valid_interval("Enter interval [1m,1h,1d,etc.] (default: 1d): ", "1d")
 
-# Download data
-try:
-    print(
-        f"\nDownloading {ticker} data from {start_date} to {end_date} ({interval} interval)..."
-    )
-    data = yf.download(
-        ticker,
-        start=start_date,
-        end=end_date + timedelta(days=1),  # Include end date
-        interval=interval,
+def memory_usage(df):
+    """In-memory size of a frame in bytes, including the contents of object columns"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def clean_file(path, output=None, chunk_size=DEFAULT_CHUNK_ROWS, compact=True):
+    """
+    Clean a stored or raw CSV file `chunk_size` rows at a time into `output` (by default
+    the file is replaced atomically), so memory stays bounded by the chunk size.
+
+    Returns a report with the rows kept and the in-memory size of the cleaned bars with
+    the default dtypes (`bytes_before`) and with the compact ones (`bytes_after`).
+    """
+    path = Path(path)
+    output = Path(output or path)
+    tmp = output.with_suffix(f".{os.getpid()}.tmp")
+    report = {"file": str(path), "rows": 0, "bytes_before": 0, "bytes_after": 0}
+
+    try:
+        with span("clean_file", file=path.name):
+            for chunk in pd.read_csv(path, index_col=0, chunksize=chunk_size):
+                cleaned = clean_data(chunk)
+                if cleaned is None or cleaned.empty:
+                    continue
+                report["rows"] += len(cleaned)
+                report["bytes_before"] += memory_usage(cleaned)
+                if compact:
+                    compact_dtypes(cleaned)
+                report["bytes_after"] += memory_usage(cleaned)
+                cleaned.to_csv(tmp, mode="a", header=not tmp.exists(), index=False)
+        if not tmp.exists():
+            raise ValueError(f"No usable rows in {path}")
+        os.replace(tmp, output)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    before = report["bytes_before"]
+    report["saved_pct"] = (
+        round(100 * (1 - report["bytes_after"] / before), 1) if before else 0.0
     )
+    return report
+
+
+def download_data(provider, ticker, start_date, end_date, interval, compact=False):
+    """Download and clean bars for [start_date, end_date] (both inclusive)"""
+    with span("download", ticker=ticker, interval=interval):
+        raw = provider.download(ticker, start_date, end_date, interval)
+    with span("clean_data", ticker=ticker, interval=interval):
+        return clean_data(raw, compact=compact, chunk_size=DEFAULT_CHUNK_ROWS)
+
+
+def missing_ranges(existing, start_date, end_date):
+    """
+    Return the (start, end) date ranges of [start_date, end_date] not covered by the
+    stored bars. The tail range starts on the last stored day so a partial last bar is
+    refreshed; overlapping bars are de-duplicated by `merge_bars`.
+    """
+    first = existing["Date"].iloc[0].date()
+    last = existing["Date"].iloc[-1].date()
+    ranges = []
+
+    # Only fetch the head if at least one business day precedes the first stored bar,
+    # so a start date falling on a weekend does not trigger a request every run.
+    if start_date < first and np.busday_count(start_date, first) > 0:
+        ranges.append((start_date, first))
+    if end_date >= last:
+        ranges.append((last, end_date))
+    return ranges
+
+
+def derive_data(ticker, start_date, end_date, interval, store):
+    """
+    Build a ticker/interval from stored finer bars when they cover [start_date, end_date]
+    (see resample.py), instead of downloading it.
+
+    Returns the stored DataFrame and the number of bars derived, or (None, 0) when the
+    interval has been downloaded before or no finer series covers the range.
+    """
+    pyramid = Pyramid(store)
+    if store.exists(ticker, interval) and not pyramid.is_derived(ticker, interval):
+        return None, 0
+    if pyramid.covering_source(ticker, interval, start_date, end_date) is None:
+        return None, 0
+    derived = pyramid.refresh(ticker, interval)
+    return store.read(ticker, interval), derived
 
-    # Clean the data
-    data = clean_data(data)
 
+def mark_downloaded(ticker, interval, store):
+    """Record that a series now holds provider bars and refresh the levels derived from it"""
+    store.catalog.drop_derived(store.name, ticker, interval)
+    Pyramid(store).refresh_all(ticker)
+
+
+def update_data(ticker, start_date, end_date, interval, store, provider, compact=False):
+    """
+    Download only the bars missing from the store for a ticker/interval and merge them
+    into the stored series in place. Intervals that can be derived from stored finer bars
+    are derived instead (see `derive_data`).
+
+    Returns the stored DataFrame and the number of bars added.
+    """
+    data, added = derive_data(ticker, start_date, end_date, interval, store)
     if data is not None:
-        # Create main data directory and raw subdirectory
-        os.makedirs("data-files/raw", exist_ok=True)
+        return data, added
+
+    if not store.exists(ticker, interval):
+        data = download_data(provider, ticker, start_date, end_date, interval, compact)
+        if data is None:
+            return None, 0
+        store.write(ticker, interval, data)
+        mark_downloaded(ticker, interval, store)
+        return data, len(data)
+
+    existing = store.read(ticker, interval)
+    frames = []
+    for range_start, range_end in missing_ranges(existing, start_date, end_date):
+        data = download_data(provider, ticker, range_start, range_end, interval, compact)
+        if data is not None:
+            frames.append(data)
+
+    if not frames:
+        return existing, 0
+
+    with span("merge", ticker=ticker, interval=interval):
+        merged = merge_bars(existing, pd.concat(frames, ignore_index=True))
+    store.write(ticker, interval, merged, replace=True)
+    mark_downloaded(ticker, interval, store)
+    return merged, len(merged) - len(existing)
+
+
+def download_interactive():
+    # Get user inputs with validation
+    today = datetime.today().date()
+    default_start = today - timedelta(days=5 * 365)  # Approximate 5 years
+
+    # Ticker input
+    while True:
+        ticker = input("Enter stock ticker symbol (e.g., AAPL): ").strip().upper()
+        if ticker:
+            break
+        print("Ticker cannot be empty. Please try again.")
+
+    # Date inputs
+    start_date = get_valid_date(
+        f"Enter start date [YYYY-MM-DD] (default: {default_start}): ", default_start
+    )
+
+    end_date = get_valid_date(f"Enter end date [YYYY-MM-DD] (default: {today}): ", today)
+
+    # Ensure end date is after start date
+    while end_date <= start_date:
+        print("End date must be after start date.")
+        end_date = get_valid_date(f"Enter end date [YYYY-MM-DD] (default: {today}): ", today)
+
+    # Interval input
+    interval = get_valid_interval("Enter interval [1m,1h,1d,etc.] (default: 1d): ", "1d")
+
+    store = get_store()
+    provider = get_provider()
+
+    try:
+        # Resample stored finer bars instead of downloading when they cover the range
+        data, derived = derive_data(ticker, start_date, end_date, interval, store)
+        if data is not None:
+            print(f"\nDerived {derived} new {interval} bars, {len(data)} records stored")
+            return
+
+        # Offer to fetch only the missing bars when the series is already stored
+        update = False
+        if store.exists(ticker, interval):
+            answer = input(
+                f"Existing {interval} data found for {ticker}. Fetch only missing bars? (Y/n): "
+            )
+            update = answer.strip().lower() != "n"
+
+        if update:
+            print(f"\nUpdating {ticker} data up to {end_date} ({interval} interval)...")
+            data, added = update_data(ticker, start_date, end_date, interval, store, provider)
+            print(f"\nAdded {added} new records, {len(data)} records stored for {ticker}")
+            return
+
+        # Download data
+        print(
+            f"\nDownloading {ticker} data from {start_date} to {end_date} ({interval} interval)..."
+        )
+        data = download_data(provider, ticker, start_date, end_date, interval)
+
+        if data is not None:
+            # Save to the configured data store (CSV by default, see storage.py)
+            path = store.write(ticker, interval, data)
+            mark_downloaded(ticker, interval, store)
+            print(f"\nSuccessfully cleaned and saved {len(data)} records to {path}")
+
+    except Exception as e:
+        print(f"\nAn error occurred: {e!s}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download stock data interactively")
+    args = add_arguments(parser).parse_args(argv)
+    with profiling(args, "get_stock_data"):
+        download_interactive()
 
-        # Save to CSV
-        csv_filename = f"data-files/raw/{ticker}_{start_date}_{end_date}_{interval}.csv"
-        data.to_csv(csv_filename, index=False)
-        print(f"\nSuccessfully cleaned and saved {len(data)} records to {csv_filename}")
 
-except Exception as e:
-    print(f"\nAn error occurred: {e!s}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# src/indicator_cache.py
+"""
+Content-addressed cache for computed indicator columns.
+
+An entry is keyed by:
+  - a fingerprint of the input bars (hash of every value, independent of file names)
+  - the indicator key from the INDICATORS registry
+  - the constructor parameters the indicator was built with
+  - a hash of the source of the module defining the indicator class
+
+so editing an indicator, changing its parameters or changing a single input value all
+produce a new key. Entries are pickled DataFrames in one directory; when the total size
+exceeds `max_bytes` the least recently used entries are evicted. A hit refreshes the
+entry's modification time, which is what the LRU order is based on.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+CACHE_FORMAT = 1
+DEFAULT_CACHE_DIR = "data-files/cache/indicators"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_code_versions = {}
+
+
+def fingerprint(df):
+    """Hash the contents (values and column names) of a DataFrame"""
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def code_version(cls):
+    """Hash the source of the module defining `cls`"""
+    if cls not in _code_versions:
+        module = sys.modules[cls.__module__]
+        try:
+            source = inspect.getsource(module)
+        except (OSError, TypeError):
+            source = cls.__qualname__
+        _code_versions[cls] = hashlib.sha256(source.encode()).hexdigest()[:16]
+    return _code_versions[cls]
+
+
+def constructor_params(cls, params=None):
+    """Full constructor arguments of an indicator: defaults overridden by `params`"""
+    bound = inspect.signature(cls).bind_partial(**(params or {}))
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+class IndicatorCache:
+    """Size-bounded LRU cache of indicator results on disk"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled; worker processes get a fresh one.
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def key(self, data_fingerprint, indicator_key, cls, params=None):
+        payload = json.dumps(
+            [
+                CACHE_FORMAT,
+                data_fingerprint,
+                indicator_key,
+                constructor_params(cls, params),
+                code_version(cls),
+            ],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key):
+        """Return the cached frame for `key`, or None on a miss"""
+        path = self._path(key)
+        try:
+            df = pd.read_pickle(path)
+            os.utime(path)  # Mark as recently used
+        except (FileNotFoundError, EOFError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return df
+
+    def put(self, key, df):
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        df.to_pickle(tmp)
+        os.replace(tmp, path)
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached frame for `key`, computing and storing it on a miss"""
+        df = self.get(key)
+        if df is None:
+            df = compute()
+            self.put(key, df)
+        return df
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in `max_bytes`"""
+        entries = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self.lock:
+                self.evictions += 1
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.pkl"):
+            path.unlink(missing_ok=True)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
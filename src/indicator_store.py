@@ -0,0 +1,122 @@
+# src/indicator_store.py
+"""
+Per-ticker store for indicator outputs.
+
+Each indicator's columns live in their own file, keyed by ticker, interval and indicator:
+
+  data-files/indicator-result/TICKER/INTERVAL/KEY.csv
+
+All files share the 'Date' column as their index. Adding or refreshing an indicator only
+rewrites that indicator's file, and reading several indicators aligns them on the union
+of their dates, so indicators computed over different (or partly overlapping) date
+ranges never fork into separate outputs. `write_blocks` writes results that arrive in
+blocks of rows, appending each block as it comes. `export_csv` produces the combined wide file
+(TICKER_indicator.csv) for spreadsheets.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+from instrumentation import span
+
+DEFAULT_ROOT = "data-files/indicator-result"
+
+
+class IndicatorStore:
+    """Indicator columns stored separately per ticker/interval/indicator"""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = Path(root)
+
+    def path(self, ticker, key, interval="1d"):
+        return self.root / ticker / interval / f"{key}.csv"
+
+    def write(self, ticker, key, df, interval="1d"):
+        """Replace one indicator's columns for a ticker ('Date' plus `{key}_*` columns)"""
+        path = self.path(ticker, key, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with span("indicator_write", ticker=ticker, indicator=key, interval=interval):
+            df.to_csv(tmp, index=False)
+            os.replace(tmp, path)
+        return path
+
+    def write_blocks(self, ticker, blocks, interval="1d"):
+        """
+        Write indicators computed block by block.
+
+        `blocks` yields {key: DataFrame} for consecutive rows (see Pipeline.frame_blocks);
+        each block is appended to its indicator's file as it arrives, so only one block is
+        held in memory. Files replace the previous versions once complete. Returns
+        {key: path}.
+        """
+        paths, tmps, handles = {}, {}, {}
+        try:
+            for frames in blocks:
+                for key, df in frames.items():
+                    if key not in handles:
+                        paths[key] = self.path(ticker, key, interval)
+                        paths[key].parent.mkdir(parents=True, exist_ok=True)
+                        tmps[key] = paths[key].with_suffix(f".{os.getpid()}.tmp")
+                        handles[key] = open(tmps[key], "w", newline="")
+                    with span("indicator_write_block", ticker=ticker, indicator=key):
+                        df.to_csv(handles[key], index=False, header=handles[key].tell() == 0)
+        except BaseException:
+            for key, handle in handles.items():
+                handle.close()
+                tmps[key].unlink(missing_ok=True)
+            raise
+        for key, handle in handles.items():
+            handle.close()
+            os.replace(tmps[key], paths[key])
+        return paths
+
+    def indicators(self, ticker, interval="1d"):
+        """Keys of the indicators stored for a ticker"""
+        return sorted(p.stem for p in (self.root / ticker / interval).glob("*.csv"))
+
+    def tickers(self, interval="1d"):
+        return sorted(p.parent.name for p in self.root.glob(f"*/{interval}") if p.is_dir())
+
+    def listing(self, interval="1d"):
+        """{ticker: keys of its stored indicators} for an interval, in one directory scan"""
+        listing = {}
+        for path in sorted(self.root.glob(f"*/{interval}/*.csv")):
+            listing.setdefault(path.parent.parent.name, []).append(path.stem)
+        return listing
+
+    def read(self, ticker, keys=None, interval="1d", columns=None):
+        """
+        Read indicators for a ticker aligned on the union of their dates.
+
+        `columns` optionally restricts each indicator to some of its columns, given
+        without the key prefix (e.g. ["Close", "Signal"]).
+        """
+        keys = keys or self.indicators(ticker, interval)
+        if not keys:
+            raise FileNotFoundError(f"No indicator results found for {ticker} ({interval})")
+
+        merged = None
+        for key in keys:
+            usecols = None
+            if columns is not None:
+                usecols = ["Date", *(f"{key}_{c}" for c in columns)]
+            df = pd.read_csv(self.path(ticker, key, interval), usecols=usecols)
+            df["Date"] = _parse_dates(df["Date"])
+            df = df.set_index("Date")
+            merged = df if merged is None else merged.join(df, how="outer")
+        return merged.sort_index().reset_index()
+
+    def export_csv(self, ticker, path=None, interval="1d"):
+        """Write every indicator of a ticker into one wide CSV file"""
+        path = Path(path or self.root / f"{ticker}_{interval}_indicator.csv")
+        self.read(ticker, interval=interval).to_csv(path, index=False)
+        return path
+
+
+def _parse_dates(dates):
+    try:
+        return pd.to_datetime(dates)
+    except (ValueError, TypeError):
+        # Intraday bars spanning a DST change carry mixed UTC offsets.
+        return pd.to_datetime(dates, utc=True)
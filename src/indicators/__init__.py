@@ -1,5 +1,10 @@
 # src/indicators/__init__.py
+from .atr import ATR
+from .bollinger_bands import BollingerBands
 from .djia_weakness import DJIAWeakness
+from .ema import EMA
+from .macd import MACD
+from .rsi import RSI
 from .us_presidential_cycles import USPresidentialCycles
 from .weekly_average_buy import WeeklyAverageBuyIndicator  # New indicator added
 
@@ -22,4 +27,29 @@ INDICATORS = {
             "set threshold or if it falls on the historically cheapest weekday (if threshold is None)"
         ),
     },
+    "ema": {
+        "name": "Exponential Moving Average",
+        "class": EMA,
+        "description": "Buy while the close is above its EMA(20)",
+    },
+    "macd": {
+        "name": "MACD",
+        "class": MACD,
+        "description": "Buy while the MACD(12, 26) line is above its 9-bar signal line",
+    },
+    "rsi": {
+        "name": "Relative Strength Index",
+        "class": RSI,
+        "description": "Buy when RSI(14) < 30",
+    },
+    "bollinger_bands": {
+        "name": "Bollinger Bands",
+        "class": BollingerBands,
+        "description": "Buy when the close falls below the lower band (20 bars, 2 std)",
+    },
+    "atr": {
+        "name": "Average True Range",
+        "class": ATR,
+        "description": "Buy when the close drops more than 2 ATR(14) below the previous close",
+    },
 }
@@ -0,0 +1,52 @@
+# src/indicators/atr.py
+import math
+
+import numpy as np
+
+from .kernels import assign, true_range, wilder, wilder_step
+
+
+class ATR:
+    """Average True Range, signalling closes that drop sharply relative to volatility"""
+
+    outputs = ("ATR", "Signal")
+
+    def __init__(self, length=14, multiplier=2):
+        self.name = "Average True Range"
+        self.length = length
+        self.multiplier = multiplier
+        # Streaming state: previous close and the Wilder state of the true range
+        self.previous_close = math.nan
+        self.atr = (math.nan, 0, 0.0)
+
+    def calculate(self, df, intermediates=None):
+        """
+        Calculate indicator values; buy when the close falls more than `multiplier` ATRs
+        below the previous close (`intermediates` shares the close-to-close changes)
+        """
+        return assign(df, self, intermediates)
+
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return ["delta", f"atr:{self.length}"]
+
+    def evaluate(self, change, atr):
+        with np.errstate(invalid="ignore"):
+            return {"ATR": atr, "Signal": -change > self.multiplier * atr}
+
+    def warm_up(self, df):
+        """Initialise the streaming state from the bars in `df` (not modified)"""
+        close = df["Close"].to_numpy(np.float64)
+        ranges = true_range(df["High"].to_numpy(), df["Low"].to_numpy(), close)
+        self.atr = tuple(v.item() for v in wilder(ranges, self.length)[1])
+        self.previous_close = float(close[-1]) if len(close) else math.nan
+        return self
+
+    def update(self, bar):
+        """Add one bar (mapping with 'High', 'Low' and 'Close') and return its signal in O(1)"""
+        high, low, close = bar["High"], bar["Low"], bar["Close"]
+        ranges = float(true_range([high], [low], [close], self.previous_close)[0])
+        self.atr = wilder_step(self.atr, ranges, self.length)
+        drop = self.previous_close - close
+        self.previous_close = close
+        return bool(drop > self.multiplier * self.atr[0])
@@ -0,0 +1,51 @@
+# src/indicators/bollinger_bands.py
+from collections import deque
+
+import numpy as np
+
+from .kernels import assign
+
+
+class BollingerBands:
+    """Bollinger Bands: a moving average with bands `num_std` standard deviations wide"""
+
+    outputs = ("BBMiddle", "BBUpper", "BBLower", "Signal")
+
+    def __init__(self, length=20, num_std=2):
+        self.name = "Bollinger Bands"
+        self.length = length
+        self.num_std = num_std
+        self.closes = deque(maxlen=length)  # Ring buffer for streaming updates
+
+    def calculate(self, df, intermediates=None):
+        """Calculate indicator values; buy when the close falls below the lower band"""
+        return assign(df, self, intermediates)
+
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return ["close", f"rolling_mean_std:{self.length}"]
+
+    def evaluate(self, close, mean_std):
+        middle, std = mean_std
+        lower = middle - self.num_std * std
+        with np.errstate(invalid="ignore"):
+            signal = close < lower
+        return {
+            "BBMiddle": middle,
+            "BBUpper": middle + self.num_std * std,
+            "BBLower": lower,
+            "Signal": signal,
+        }
+
+    def warm_up(self, df):
+        """Initialise the streaming state from the last bars of `df` (not modified)"""
+        self.closes = deque(df["Close"].iloc[-self.length :], maxlen=self.length)
+        return self
+
+    def update(self, bar):
+        """Add one bar (mapping with a 'Close') and return its signal"""
+        self.closes.append(bar["Close"])
+        if len(self.closes) < self.length:
+            return False
+        window = np.fromiter(self.closes, dtype=np.float64)
+        return bool(bar["Close"] < window.mean() - self.num_std * window.std())
@@ -1,28 +1,57 @@
 # src/indicators/djia_weakness.py
+import math
+from collections import deque
+
+import numpy as np
+
+from .kernels import assign
+
+
 class DJIAWeakness:
     """Implementation of DJIA's Weakness indicator"""
 
+    outputs = ("ROC", "Signal")
+
     def __init__(self, roc_length=13, threshold=-15):
         self.name = "DJIA's Weakness"
         self.roc_length = roc_length
         self.threshold = threshold
+        self.closes = deque(maxlen=roc_length + 1)  # Ring buffer for streaming updates
+        self.roc = math.nan
 
-    def calculate(self, df):
-        """Calculate indicator values"""
-        df = self._calculate_roc(df)
-        df = self._generate_signals(df)
-        return df
-
-    def _calculate_roc(self, df):
-        """Calculate Rate of Change (ROC)"""
-        df["ROC"] = (
-            100
-            * (df["Close"] - df["Close"].shift(self.roc_length))
-            / df["Close"].shift(self.roc_length)
+    def calculate(self, df, intermediates=None):
+        """Calculate indicator values (`intermediates` shares the shifted closes)"""
+        return assign(df, self, intermediates)
+
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return ["close", f"close_shift:{self.roc_length}"]
+
+    def evaluate(self, close, previous):
+        """ROC from the closes and the closes `roc_length` bars back"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            roc = 100 * (close - previous) / previous
+            return {"ROC": roc, "Signal": roc < self.threshold}
+
+    def warm_up(self, df):
+        """Initialise the streaming state from the last bars of `df` (not modified)"""
+        self.closes = deque(
+            df["Close"].iloc[-(self.roc_length + 1) :], maxlen=self.roc_length + 1
         )
-        return df
+        self.roc = self._roc_from_buffer()
+        return self
+
+    def update(self, bar):
+        """Add one bar (mapping with a 'Close') and return its signal in O(1)"""
+        self.closes.append(bar["Close"])
+        self.roc = self._roc_from_buffer()
+        return self.roc < self.threshold
 
-    def _generate_signals(self, df):
-        """Generate buy signals based on ROC threshold"""
-        df["Signal"] = df["ROC"] < self.threshold
-        return df
+    def _roc_from_buffer(self):
+        """ROC of the newest close against the close `roc_length` bars earlier"""
+        if len(self.closes) <= self.roc_length:
+            return math.nan
+        # Float64 division like `calculate`: a zero previous close gives inf or NaN.
+        previous = np.float64(self.closes[0])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return float(100 * (self.closes[-1] - previous) / previous)
@@ -0,0 +1,37 @@
+# src/indicators/ema.py
+import math
+
+from .kernels import assign, ema, ewma_step
+
+
+class EMA:
+    """Exponential Moving Average trend filter"""
+
+    outputs = ("EMA", "Signal")
+
+    def __init__(self, span=20):
+        self.name = "Exponential Moving Average"
+        self.span = span
+        self.alpha = 2 / (span + 1)
+        self.ema = math.nan  # Streaming state: the last average
+
+    def calculate(self, df, intermediates=None):
+        """Calculate indicator values (`intermediates` shares the EMA with MACD)"""
+        return assign(df, self, intermediates)
+
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return ["close", f"ema:{self.span}"]
+
+    def evaluate(self, close, ema):
+        return {"EMA": ema, "Signal": close > ema}
+
+    def warm_up(self, df):
+        """Initialise the streaming state from the bars in `df` (not modified)"""
+        self.ema = float(ema(df["Close"].to_numpy(), self.span)[1])
+        return self
+
+    def update(self, bar):
+        """Add one bar (mapping with a 'Close') and return its signal in O(1)"""
+        self.ema = ewma_step(self.ema, bar["Close"], self.alpha)
+        return bar["Close"] > self.ema
@@ -0,0 +1,397 @@
+# src/indicators/kernels.py
+"""
+Vectorized kernels shared by the technical indicators.
+
+Every kernel takes NumPy arrays with time along axis 0: a 1-D series of one ticker or a
+2-D dates x tickers panel (one column per ticker), and returns arrays of the same shape.
+
+The recursive kernels run in linear time and can warm-start: they take the state left
+by a previous call (the last mean, the previous close, the trailing window) and return
+the state after their last row, so a series processed in pieces gives the same values as
+one call over the whole series.
+
+  - ewma / ema: y[t] = (1 - alpha) * y[t-1] + alpha * x[t], seeded with the first value
+    like pandas' `ewm(adjust=False)`; NaN inputs carry the previous mean forward
+  - wilder: the same recursion with alpha = 1 / length, seeded like Wilder with the simple
+    average of the first `length` values (NaN until then)
+  - rolling_mean_std: trailing mean and population standard deviation
+  - delta, returns, true_range: one-bar differences, using the previous close from state
+  - ewma_step / wilder_step: one bar of `ewma` / `wilder` on scalars, for the indicators'
+    streaming `update`
+
+`Intermediates` memoizes these series for one set of bars, so indicators evaluated
+together (e.g. MACD and EMA, RSI and ATR) compute returns, true range and EMAs once. It
+also provides the calendar series (parsed dates, weekday, year) and shifted closes, all
+addressable by name (see SERIES) for the indicator pipeline. Built with the `state` an
+Intermediates left after the previous block of bars, every series continues from that
+block, so a long series can be evaluated one block at a time.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=np.float64)
+
+
+def _columns(x):
+    """View of a 1-D or 2-D array as a 2-D (rows x columns) array"""
+    return x.reshape(len(x), math.prod(x.shape[1:]))
+
+
+def _previous(x, previous=None):
+    """Values shifted one row down; the first row comes from `previous` (NaN without it)"""
+    out = np.empty_like(x)
+    out[1:] = x[:-1]
+    out[:1] = np.nan if previous is None else previous
+    return out
+
+
+def delta(x, previous=None):
+    """x[t] - x[t-1]; `previous` is the value before x[0]"""
+    x = _as_float(x)
+    return x - _previous(x, previous)
+
+
+def returns(x, previous=None):
+    """Simple returns x[t] / x[t-1] - 1; `previous` is the value before x[0]"""
+    x = _as_float(x)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return x / _previous(x, previous) - 1
+
+
+def true_range(high, low, close, previous_close=None):
+    """
+    Wilder's true range: the largest of high - low, |high - previous close| and
+    |low - previous close|. The first bar uses high - low unless `previous_close` is given.
+    """
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev = _previous(close, previous_close)
+    # fmax ignores a missing previous close; a missing high or low stays NaN.
+    gaps = np.fmax(np.abs(high - prev), np.abs(low - prev))
+    return np.where(np.isnan(high - low), np.nan, np.fmax(high - low, gaps))
+
+
+def gains_losses(change):
+    """Positive and negative parts of one-bar changes (NaN stays NaN)"""
+    return np.where(change < 0, 0.0, change), np.where(change > 0, 0.0, -change)
+
+
+def ewma(x, alpha, state=None):
+    """
+    Recursive exponential mean along axis 0 in linear time.
+
+    `state` is the mean before x[0] (one value per column, NaN where there is none yet).
+    Returns (means, state after the last row).
+    """
+    x = _as_float(x)
+    values = _columns(x)
+    if state is not None:
+        values = np.vstack([np.reshape(state, (1, -1)), values])
+    means = pd.DataFrame(values).ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+    means = means.to_numpy()
+    if state is not None:
+        means = means[1:]
+    means = means.reshape(x.shape)
+    if len(means):
+        return means, means[-1].copy()
+    return means, np.full(x.shape[1:], np.nan) if state is None else np.asarray(state)
+
+
+def ewma_step(mean, value, alpha):
+    """One step of the recursive mean of `ewma` (NaN values carry the mean)"""
+    if math.isnan(value):
+        return mean
+    if math.isnan(mean):
+        return value
+    return (1 - alpha) * mean + alpha * value
+
+
+def ema(x, span, state=None):
+    """Exponential moving average with alpha = 2 / (span + 1); returns (ema, state)"""
+    return ewma(x, 2 / (span + 1), state)
+
+
+def wilder(x, length, state=None):
+    """
+    Wilder's smoothing (alpha = 1 / length), used by RSI and ATR: NaN until `length`
+    values have been seen, then their simple average, then the recursive mean.
+
+    `state` is (mean, count, total) per column: the mean once seeded, and the number and
+    sum of the values seen until then. Returns (means, state after the last row).
+    """
+    x = _as_float(x)
+    values = _columns(x)
+    shape = values.shape[1:]
+    mean, count, total = state or (np.nan, 0, 0.0)
+    mean = np.broadcast_to(_as_float(mean), shape)
+    count = np.broadcast_to(np.asarray(count, dtype=np.int64), shape)
+    total = np.broadcast_to(_as_float(total), shape)
+    if not len(values):
+        return x.copy(), tuple(a.reshape(x.shape[1:]) for a in (mean, count, total))
+
+    # Running count and sum (added one value at a time, like `wilder_step`) of the values
+    # that seed each column's average; the mean starts at the row of the length-th value.
+    valid = ~np.isnan(values)
+    counts = count + np.cumsum(valid, axis=0)
+    sums = np.cumsum(np.vstack([total[None], np.where(valid, values, 0.0)]), axis=0)[1:]
+    seed = valid & (counts == length) & (count < length)
+    seeded = np.where(counts < length, np.nan, values)
+    seeded[seed] = sums[seed] / length
+    means, mean = ewma(seeded, 1 / length, mean)
+    state = (
+        mean.reshape(x.shape[1:]),
+        np.minimum(counts[-1], length).reshape(x.shape[1:]),
+        np.where(count < length, sums[-1], total).reshape(x.shape[1:]),
+    )
+    return means.reshape(x.shape), state
+
+
+def wilder_step(state, value, length):
+    """One step of `wilder` on a scalar (mean, count, total) state; returns the new state"""
+    mean, count, total = state
+    if math.isnan(value):
+        return state
+    if count < length:
+        count, total = count + 1, total + value
+        return (total / length if count == length else mean), count, total
+    return ewma_step(mean, value, 1 / length), count, total
+
+
+def rolling_mean_std(x, length, history=None):
+    """
+    Trailing mean and population standard deviation over `length` rows (NaN until a full
+    window is available).
+
+    Every window is summed on its own, in a fixed order (two passes for the deviation),
+    so a value depends only on the rows of its window and not on where the series
+    started: a series processed in pieces gives bit-identical values.
+
+    `history` holds the rows before x[0] (at most the last `length - 1` are used).
+    Returns (mean, std, history for the next call).
+    """
+    x = _as_float(x)
+    values = _columns(x)
+    if history is not None:
+        history = _columns(_as_float(history))
+        values = np.vstack([history[max(0, len(history) - (length - 1)) :], values])
+    skip = len(values) - len(x)
+    mean, std = np.full(values.shape, np.nan), np.full(values.shape, np.nan)
+    windows = len(values) - length + 1
+    if windows > 0:
+        # Row k of the window ending at row i is values[i - length + 1 + k].
+        rows = [values[k : k + windows] for k in range(length)]
+        total = rows[0].copy()
+        for row in rows[1:]:
+            total += row
+        average = total / length
+        squares = (rows[0] - average) ** 2
+        for row in rows[1:]:
+            squares += (row - average) ** 2
+        mean[length - 1 :] = average
+        std[length - 1 :] = np.sqrt(squares / length)
+    tail = values[max(0, len(values) - (length - 1)) :]
+    return (
+        mean[skip:].reshape(x.shape),
+        std[skip:].reshape(x.shape),
+        tail.reshape(-1, *x.shape[1:]).copy(),
+    )
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """RSI from smoothed gains and losses (100 when there are no losses)"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, rsi)
+
+
+# Named series an Intermediates can provide, with the series each one is computed from.
+# Names take an integer parameter after a colon where the method does ("ema:20").
+SERIES = {
+    "open": (),
+    "high": (),
+    "low": (),
+    "close": (),
+    "volume": (),
+    "dates": (),
+    "weekday": ("dates",),
+    "year": ("dates",),
+    "close_shift": ("close",),
+    "delta": ("close",),
+    "returns": ("close",),
+    "true_range": ("high", "low", "close"),
+    "ema": ("close",),
+    "rolling_mean_std": ("close",),
+    "wilder_gains_losses": ("delta",),
+    "atr": ("true_range",),
+}
+
+
+def parse_series(name):
+    """Split a series name into its base name and integer arguments ("ema:20" -> ema, 20)"""
+    base, _, arg = name.partition(":")
+    if base not in SERIES:
+        raise KeyError(f"Unknown series {name!r}")
+    return base, tuple(int(a) for a in arg.split(",")) if arg else ()
+
+
+class Intermediates:
+    """
+    Series derived from one set of bars, computed on first use and then shared.
+
+    Built from a DataFrame (`from_frame`, which reads its columns without copying or
+    modifying it) or from arrays: 1-D series or 2-D panels with time along axis 0.
+    Series are available by name (`intermediates["ema:20"]`, see SERIES) or through the
+    methods below.
+
+    `previous` is the `state` of the Intermediates of the bars just before these ones
+    (the trailing closes, last EMA values, previous close... of every series computed
+    there); series then continue across the boundary as if both blocks were one.
+    """
+
+    def __init__(self, close=None, high=None, low=None, dates=None, frame=None, previous=None):
+        self.arrays = {}
+        for name, values in (("Close", close), ("High", high), ("Low", low)):
+            if values is not None:
+                self.arrays[name] = _as_float(values)
+        self.frame = frame
+        self._dates = dates
+        self.memo = {}
+        self.computed = []  # Keys in the order they were computed, to check the sharing
+        self.previous = previous or {}
+        self.state = {}  # Lookback after the last bar, by series key, for the next block
+
+    @classmethod
+    def from_frame(cls, df, previous=None):
+        """Read the bars of `df`, with the dates from its 'Date' column or datetime index"""
+        dates = df["Date"] if "Date" in df else None
+        if dates is None and pd.api.types.is_datetime64_any_dtype(df.index):
+            dates = df.index
+        return cls(dates=dates, frame=df, previous=previous)
+
+    def __getitem__(self, name):
+        base, args = parse_series(name)
+        if not SERIES[base] and base != "dates":
+            return self.column(base.capitalize())
+        return getattr(self, base)(*args)
+
+    def get(self, key, compute):
+        if key not in self.memo:
+            self.memo[key] = compute()
+            self.computed.append(key)
+        return self.memo[key]
+
+    def carry(self, key, compute):
+        """
+        Memoize a series whose `compute(previous state)` returns (values, state): the
+        state comes from the previous block and the new one is kept for the next.
+        """
+
+        def values():
+            values, self.state[key] = compute(self.previous.get(key))
+            return values
+
+        return self.get(key, values)
+
+    def column(self, name):
+        if name not in self.arrays:
+            if self.frame is None or name not in self.frame:
+                raise KeyError(f"'{name}' column required")
+            self.arrays[name] = self.frame[name].to_numpy(np.float64)
+        return self.arrays[name]
+
+    def dates(self):
+        """'Date' values as a DatetimeIndex, parsed once"""
+
+        def compute():
+            if self._dates is None:
+                raise KeyError("'Date' column required")
+            dates = self._dates
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates)
+            return pd.DatetimeIndex(dates)
+
+        return self.get(("dates",), compute)
+
+    def weekday(self):
+        """Weekday of every bar (Monday=0)"""
+        return self.get(("weekday",), lambda: self.dates().dayofweek.to_numpy())
+
+    def year(self):
+        return self.get(("year",), lambda: self.dates().year.to_numpy())
+
+    def close_shift(self, periods):
+        """Close `periods` bars earlier (NaN for the first bars)"""
+
+        def compute(history):
+            close = self.column("Close")
+            if history is not None:
+                close = np.concatenate([history, close])
+            out = np.full_like(close, np.nan)
+            if periods < len(close):
+                out[periods:] = close[: len(close) - periods]
+            skip = len(close) - len(self.column("Close"))
+            return out[skip:], close[max(0, len(close) - periods) :].copy()
+
+        return self.carry(("close_shift", periods), compute)
+
+    def _last_close(self, previous):
+        close = self.column("Close")
+        return close[-1] if len(close) else previous
+
+    def delta(self):
+        return self.carry(
+            ("delta",),
+            lambda prev: (delta(self.column("Close"), prev), self._last_close(prev)),
+        )
+
+    def returns(self):
+        return self.carry(
+            ("returns",),
+            lambda prev: (returns(self.column("Close"), prev), self._last_close(prev)),
+        )
+
+    def true_range(self):
+        def compute(prev):
+            high, low, close = (self.column(c) for c in ("High", "Low", "Close"))
+            return true_range(high, low, close, prev), self._last_close(prev)
+
+        return self.carry(("true_range",), compute)
+
+    def ema(self, span):
+        return self.carry(("ema", span), lambda state: ema(self.column("Close"), span, state))
+
+    def rolling_mean_std(self, length):
+        def compute(history):
+            mean, std, history = rolling_mean_std(self.column("Close"), length, history)
+            return (mean, std), history
+
+        return self.carry(("rolling_mean_std", length), compute)
+
+    def wilder_gains_losses(self, length):
+        """Wilder-smoothed gains and losses of the closes"""
+
+        def compute(state):
+            gain, loss = gains_losses(self.delta())
+            gain_state, loss_state = state or (None, None)
+            gain, gain_state = wilder(gain, length, gain_state)
+            loss, loss_state = wilder(loss, length, loss_state)
+            return (gain, loss), (gain_state, loss_state)
+
+        return self.carry(("wilder_gains_losses", length), compute)
+
+    def atr(self, length):
+        return self.carry(
+            ("atr", length), lambda state: wilder(self.true_range(), length, state)
+        )
+
+
+def assign(df, indicator, intermediates=None):
+    """`calculate` through `evaluate`: add the indicator's outputs as columns of `df`"""
+    shared = intermediates or Intermediates.from_frame(df)
+    outputs = indicator.evaluate(*(shared[name] for name in indicator.inputs()))
+    for column in indicator.outputs:
+        df[column] = outputs[column]
+    return df
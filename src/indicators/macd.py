@@ -0,0 +1,64 @@
+# src/indicators/macd.py
+import math
+
+from .kernels import assign, ema, ewma_step
+
+
+class MACD:
+    """Moving Average Convergence Divergence"""
+
+    outputs = ("MACD", "MACDSignal", "MACDHist", "Signal")
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        if fast >= slow:
+            raise ValueError("fast span must be shorter than the slow span.")
+        self.name = "MACD"
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        # Streaming state: the last fast, slow and signal-line averages
+        self.fast_ema = self.slow_ema = self.signal_ema = math.nan
+
+    def calculate(self, df, intermediates=None):
+        """Calculate indicator values (`intermediates` shares the EMAs with EMA)"""
+        return assign(df, self, intermediates)
+
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return [f"ema:{self.fast}", f"ema:{self.slow}"]
+
+    def evaluate(self, fast, slow):
+        return self.evaluate_block(None, fast, slow)[0]
+
+    def evaluate_block(self, state, fast, slow):
+        """`evaluate` on one block of bars; `state` is the signal line before the block"""
+        macd = fast - slow
+        signal_line, state = ema(macd, self.signal, state)
+        histogram = macd - signal_line
+        outputs = {
+            "MACD": macd,
+            "MACDSignal": signal_line,
+            "MACDHist": histogram,
+            "Signal": histogram > 0,
+        }
+        return outputs, state
+
+    def warm_up(self, df):
+        """Initialise the streaming state from the bars in `df` (not modified)"""
+        close = df["Close"].to_numpy()
+        fast, self.fast_ema = ema(close, self.fast)
+        slow, self.slow_ema = ema(close, self.slow)
+        self.signal_ema = ema(fast - slow, self.signal)[1]
+        self.fast_ema, self.slow_ema, self.signal_ema = map(
+            float, (self.fast_ema, self.slow_ema, self.signal_ema)
+        )
+        return self
+
+    def update(self, bar):
+        """Add one bar (mapping with a 'Close') and return its signal in O(1)"""
+        close = bar["Close"]
+        self.fast_ema = ewma_step(self.fast_ema, close, 2 / (self.fast + 1))
+        self.slow_ema = ewma_step(self.slow_ema, close, 2 / (self.slow + 1))
+        macd = self.fast_ema - self.slow_ema
+        self.signal_ema = ewma_step(self.signal_ema, macd, 2 / (self.signal + 1))
+        return macd - self.signal_ema > 0
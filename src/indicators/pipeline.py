@@ -0,0 +1,135 @@
+# src/indicators/pipeline.py
+"""
+Evaluate many indicators over the same bars in one pass.
+
+Every indicator declares the series it reads (`inputs()`, e.g. "close_shift:13",
+"weekday", "ema:12") and the columns it produces (`outputs`); `evaluate` turns the input
+arrays into output arrays without touching a DataFrame. A Pipeline collects the inputs
+of all its indicators, orders the derived series they depend on (see kernels.SERIES)
+and computes each one once in an `Intermediates` shared by every indicator, so parsed
+dates, weekdays, years, shifted closes, EMAs or true ranges are never recomputed.
+
+The input frame is only read: its columns are taken as NumPy arrays and the results
+are new arrays, so the frame is neither copied nor modified.
+
+A series too long for memory is evaluated in blocks of rows (`run_blocks`): each
+block's Intermediates continues from the lookback the previous block left (trailing
+closes for "close_shift:13", EMA and Wilder values, the previous close, the rolling
+window), and indicators with lookback of their own carry it through `evaluate_block`,
+so only one block is held at a time. An indicator whose values depend on every bar
+(`needs_scan`, e.g. full-sample weekday averages) first sees all blocks once through
+`scan_block`.
+"""
+import pandas as pd
+from instrumentation import span
+
+from .kernels import SERIES, Intermediates, parse_series
+
+
+class Pipeline:
+    """A set of indicators evaluated together on shared series"""
+
+    def __init__(self, indicators):
+        """
+        Parameters:
+          indicators (dict): {key: indicator instance}, or an iterable of INDICATORS keys
+                             (instances built with their default parameters)
+        """
+        if not isinstance(indicators, dict):
+            from . import INDICATORS
+
+            indicators = {key: INDICATORS[key]["class"]() for key in indicators}
+        self.indicators = indicators
+
+    def plan(self):
+        """Every series the indicators need, each after the series it is computed from"""
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            base, _ = parse_series(name)
+            for dependency in SERIES[base]:
+                visit(dependency)
+            order.append(name)
+
+        for indicator in self.indicators.values():
+            for name in indicator.inputs():
+                visit(name)
+        return order
+
+    def run(self, df, intermediates=None, states=None):
+        """
+        Evaluate every indicator on the bars of `df` (not modified).
+
+        With `states` ({key: state}, updated in place), the bars are one block of a longer
+        series and indicators that define `evaluate_block` continue from their state.
+        Returns {key: {output column: array}}.
+        """
+        shared = intermediates or Intermediates.from_frame(df)
+        with span("pipeline", indicators=len(self.indicators), rows=len(df)):
+            for name in self.plan():
+                shared[name]
+            results = {}
+            for key, indicator in self.indicators.items():
+                inputs = [shared[n] for n in indicator.inputs()]
+                with span("evaluate", indicator=key, rows=len(df)):
+                    if states is not None and hasattr(indicator, "evaluate_block"):
+                        outputs, states[key] = indicator.evaluate_block(states[key], *inputs)
+                    else:
+                        outputs = indicator.evaluate(*inputs)
+                results[key] = {c: outputs[c] for c in indicator.outputs}
+        return results
+
+    def run_blocks(self, blocks):
+        """
+        Evaluate every indicator over a series read in consecutive blocks of rows.
+
+        `blocks` is a callable returning a fresh iterator over the blocks (e.g.
+        `lambda: store.read_blocks(ticker, interval, rows)`); it is called twice when an
+        indicator needs a first pass over every bar. Yields (block, Intermediates,
+        results) per block, with the results `run` gives for those rows of the whole
+        series.
+        """
+        states = dict.fromkeys(self.indicators)
+        scans = {k: i for k, i in self.indicators.items() if getattr(i, "needs_scan", False)}
+        if scans:
+            previous = None
+            for block in blocks():
+                shared = Intermediates.from_frame(block, previous)
+                with span("scan", indicators=len(scans), rows=len(block)):
+                    for key, indicator in scans.items():
+                        inputs = (shared[n] for n in indicator.inputs())
+                        states[key] = indicator.scan_block(states[key], *inputs)
+                previous = shared.state
+
+        previous = None
+        for block in blocks():
+            shared = Intermediates.from_frame(block, previous)
+            results = self.run(block, shared, states)
+            previous = shared.state
+            yield block, shared, results
+
+    def frames(self, df, intermediates=None):
+        """
+        Evaluate every indicator and return {key: DataFrame} shaped like the output of
+        `calculate`: 'Date', the input columns and the indicator's columns.
+        """
+        shared = intermediates or Intermediates.from_frame(df)
+        return _frames(df, shared, self.run(df, shared))
+
+    def frame_blocks(self, blocks):
+        """`frames` of every block of `run_blocks`; yields {key: DataFrame} per block"""
+        for block, shared, results in self.run_blocks(blocks):
+            yield _frames(block, shared, results)
+
+
+def _frames(df, shared, results):
+    columns = {c: df[c].to_numpy() for c in df.columns}
+    if "Date" in columns:
+        columns["Date"] = shared.dates()
+    return {
+        key: pd.DataFrame({**columns, **outputs}, copy=False)
+        for key, outputs in results.items()
+    }
@@ -0,0 +1,56 @@
+# src/indicators/rsi.py
+import math
+
+import numpy as np
+
+from .kernels import assign, gains_losses, rsi_from_averages, wilder, wilder_step
+
+
+class RSI:
+    """Relative Strength Index with Wilder's smoothing"""
+
+    outputs = ("RSI", "Signal")
+
+    def __init__(self, length=14, oversold=30):
+        self.name = "Relative Strength Index"
+        self.length = length
+        self.oversold = oversold
+        # Streaming state: previous close and the Wilder states of the gains and losses
+        self.previous_close = math.nan
+        self.gains = self.losses = (math.nan, 0, 0.0)
+
+    def calculate(self, df, intermediates=None):
+        """Calculate indicator values (`intermediates` shares the close-to-close changes)"""
+        return assign(df, self, intermediates)
+
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return [f"wilder_gains_losses:{self.length}"]
+
+    def evaluate(self, averages):
+        rsi = rsi_from_averages(*averages)
+        with np.errstate(invalid="ignore"):
+            return {"RSI": rsi, "Signal": rsi < self.oversold}
+
+    def warm_up(self, df):
+        """Initialise the streaming state from the bars in `df` (not modified)"""
+        close = df["Close"].to_numpy(np.float64)
+        gain, loss = gains_losses(np.diff(close, prepend=np.nan))
+        self.gains = tuple(v.item() for v in wilder(gain, self.length)[1])
+        self.losses = tuple(v.item() for v in wilder(loss, self.length)[1])
+        self.previous_close = float(close[-1]) if len(close) else math.nan
+        return self
+
+    def update(self, bar):
+        """Add one bar (mapping with a 'Close') and return its signal in O(1)"""
+        close = bar["Close"]
+        change = close - self.previous_close
+        gain, loss = (
+            (math.nan, math.nan)
+            if math.isnan(change)
+            else (max(change, 0.0), max(-change, 0.0))
+        )
+        self.gains = wilder_step(self.gains, gain, self.length)
+        self.losses = wilder_step(self.losses, loss, self.length)
+        self.previous_close = close
+        return bool(rsi_from_averages(self.gains[0], self.losses[0]) < self.oversold)
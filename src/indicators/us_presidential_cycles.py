@@ -1,27 +1,38 @@
 # src/indicators/presidential_cycles.py
 import pandas as pd
 
+from .kernels import assign
+
 
 class USPresidentialCycles:
     """Implementation of US Presidential Cycles indicator"""
 
+    outputs = ("Signal",)
+
     def __init__(self):
         self.name = "US Presidential Cycles"
 
-    def calculate(self, df):
-        """Calculate indicator values"""
-        df = self._generate_signals(df)
-        return df
+    def calculate(self, df, intermediates=None):
+        """Calculate indicator values (`intermediates` shares the parsed dates)"""
+        return assign(df, self, intermediates)
 
-    def _generate_signals(self, df):
-        """Generate signals based on presidential cycle phase"""
-        # Convert to datetime and extract year
-        df["Date"] = pd.to_datetime(df["Date"])
-        years = df["Date"].dt.year
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return ["year"]
 
-        # Calculate cycle position (0-3)
+    def evaluate(self, years):
+        """Signals from the year of every bar"""
+        # Green phases: Election (0), Post-Election (1), Pre-Election (3)
         cycle_position = years % 4
+        return {
+            "Signal": (cycle_position == 0) | (cycle_position == 1) | (cycle_position == 3)
+        }
 
-        # Green phases: Election (0), Post-Election (1), Pre-Election (3)
-        df["Signal"] = (cycle_position == 0) | (cycle_position == 1) | (cycle_position == 3)
-        return df
+    def warm_up(self, df):
+        """The signal only depends on the current bar, so there is no state to build"""
+        return self
+
+    def update(self, bar):
+        """Return the signal for one bar (mapping with a 'Date')"""
+        cycle_position = pd.Timestamp(bar["Date"]).year % 4
+        return cycle_position in (0, 1, 3)
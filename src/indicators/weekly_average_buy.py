@@ -1,5 +1,10 @@
+from collections import deque
+
+import numpy as np
 import pandas as pd
 
+from .kernels import assign
+
 
 class WeeklyAverageBuyIndicator:
     """
@@ -13,11 +18,18 @@ class WeeklyAverageBuyIndicator:
       - Best-Day Mode: When threshold_pct is None, the indicator computes the historical average
         for each weekday and signals a buy only if today falls on the weekday with the lowest average close.
 
+    By default the weekday averages are computed over the full dataset, so historical signals use
+    future prices. With expanding=True every row only uses prior bars of the same weekday
+    (optionally only the last `window` of them), and in best-day mode the cheapest weekday is
+    re-evaluated as of each row. Both are computed in a single vectorized pass.
+
     Note: This indicator is simplistic and assumes that historical weekday performance predicts future lows.
     Use it with caution in trending or highly volatile markets.
     """
 
-    def __init__(self, threshold_pct=None):
+    outputs = ("Weekday", "HistoricalAvg", "PctDiff", "Signal")
+
+    def __init__(self, threshold_pct=None, expanding=False, window=None):
         """
         Parameters:
           threshold_pct (float or None): The percentage difference threshold (negative value expected).
@@ -25,63 +37,107 @@ class WeeklyAverageBuyIndicator:
                                            (Close - HistoricalAvg) / HistoricalAvg * 100 < threshold_pct
                                          If None, the indicator signals a buy only on the weekday that is
                                          historically the cheapest.
+          expanding (bool): Point-in-time mode. Each row's HistoricalAvg only uses bars before it.
+          window (int or None): In point-in-time mode, only average the last `window` prior bars of
+                                each weekday (e.g. 52 for roughly one year of daily bars).
         """
+        if window is not None and window < 1:
+            raise ValueError("window must be a positive number of bars.")
         self.name = "Weekly Average Buy Indicator"
         self.threshold_pct = threshold_pct
+        self.expanding = expanding
+        self.window = window
         self.best_day = None  # Will be set if threshold_pct is None
 
-    def calculate(self, df):
+        # Streaming state: per-weekday running sums (with Kahan compensation, as pandas
+        # uses for groupby means) and counts, or in expanding mode the running state of
+        # `_expanding_block`.
+        self.weekday_sums = {}
+        self.weekday_compensation = {}
+        self.weekday_counts = {}
+        self.expanding_state = None
+
+    def calculate(self, df, intermediates=None):
         """
         Calculate the indicator signals.
 
-        Expects a DataFrame `df` with a datetime index and a 'Close' column.
-        If the DataFrame index is not datetime but a 'Date' column exists,
-        it converts that column to datetime and sets it as the index.
-
-        After processing, a 'Date' column is added (copied from the index)
-        and reordered to be the first column.
-
-        Returns the DataFrame with additional columns:
-          - 'Date': the date (placed as the first column)
+        Expects a DataFrame `df` with a 'Close' column and a 'Date' column (or a datetime
+        index). Returns `df` with additional columns:
           - 'Weekday': numerical weekday (Monday=0, ..., Sunday=6)
-          - 'HistoricalAvg': the average Close for that weekday (computed on the full dataset)
+          - 'HistoricalAvg': the average Close for that weekday (computed on the full dataset, or
+                             on the prior bars only in expanding mode)
           - 'PctDiff': percent difference between today's close and the historical average
           - 'Signal': True if a buy signal is generated, else False.
         """
-        # Ensure the index is datetime. If not, try converting the 'Date' column.
-        if not pd.api.types.is_datetime64_any_dtype(df.index):
-            if "Date" in df.columns:
-                df["Date"] = pd.to_datetime(df["Date"])
-                df = df.set_index("Date")
-            else:
-                raise ValueError(
-                    "DataFrame index must be a datetime type or contain a 'Date' column to convert."
-                )
-
-        # Calculate the weekday averages and signals.
-        df = self._calculate_weekday_average(df)
-        df = self._generate_signals(df)
+        return assign(df, self, intermediates)
 
-        # Add a 'Date' column from the index.
-        df["Date"] = df.index
+    def inputs(self):
+        """Series read by `evaluate` (see indicators/pipeline.py)"""
+        return ["close", "weekday"]
 
-        # Reorder columns so that 'Date' is the first column.
-        cols = list(df.columns)
-        # Remove the 'Date' column from its current location
-        cols.remove("Date")
-        # Insert it at the beginning
-        cols.insert(0, "Date")
-        df = df[cols]
+    def evaluate(self, close, weekday):
+        """
+        Outputs from the closes and the weekday of every bar.
 
-        return df
+        Works on a two-column frame built from the shared arrays, never on the bars.
+        """
+        df = pd.DataFrame({"Close": close, "Weekday": weekday})
+        df = self._generate_signals(self._average_by_weekday(df))
+        return {column: df[column].to_numpy() for column in self.outputs}
+
+    @property
+    def needs_scan(self):
+        """Full-sample averages use every bar, so blocks are scanned once first"""
+        return not self.expanding
 
-    def _calculate_weekday_average(self, df):
-        # Create a column for weekday (0=Monday, 6=Sunday; trading data typically use 0-4).
-        df["Weekday"] = df.index.dayofweek
+    def scan_block(self, state, close, weekday):
+        """
+        First pass over a series read in blocks: per-weekday sums of the closes (with
+        the Kahan compensation of pandas' groupby mean) and counts.
+        """
+        sums, compensation, counts = state or ({}, {}, {})
+        for day, value in zip(weekday.tolist(), close.tolist()):
+            counts.setdefault(day, 0)
+            if value != value:  # NaN closes are skipped by groupby().mean()
+                continue
+            total = sums.get(day, 0.0)
+            y = value - compensation.get(day, 0.0)
+            t = total + y
+            compensation[day] = t - total - y
+            sums[day] = t
+            counts[day] += 1
+        return sums, compensation, counts
+
+    def evaluate_block(self, state, close, weekday):
+        """
+        `evaluate` on one block of a series read in blocks.
+
+        Full-sample mode reads the averages from the `scan_block` state; expanding mode
+        continues the per-weekday running sums and counts (and trailing window) of the
+        previous blocks.
+        """
+        df = pd.DataFrame({"Close": close, "Weekday": weekday})
+        if self.expanding:
+            df, state = self._expanding_block(df, state)
+        else:
+            sums, _, counts = state
+            days = sorted(counts)
+            averages = [sums[d] / counts[d] if counts[d] else np.nan for d in days]
+            df = self._apply_averages(
+                df, pd.Series(averages, index=pd.Index(days, name="Weekday"), name="Close")
+            )
+        df = self._generate_signals(df)
+        return {column: df[column].to_numpy() for column in self.outputs}, state
+
+    def _average_by_weekday(self, df):
+        """Add HistoricalAvg and PctDiff to a frame with 'Close' and 'Weekday' columns"""
+        if self.expanding:
+            return self._calculate_expanding_average(df)
 
         # Compute the historical average close for each weekday over the entire DataFrame.
-        avg_by_day = df.groupby("Weekday")["Close"].mean()
+        return self._apply_averages(df, df.groupby("Weekday")["Close"].mean())
 
+    def _apply_averages(self, df, avg_by_day):
         # Map the corresponding historical average to each row based on its weekday.
         df["HistoricalAvg"] = df["Weekday"].map(avg_by_day)
 
@@ -93,10 +149,115 @@ class WeeklyAverageBuyIndicator:
 
         return df
 
+    def _calculate_expanding_average(self, df):
+        """
+        Point-in-time weekday averages from grouped cumulative sums.
+
+        For every row, builds the average of each weekday known just before that row (one
+        column per weekday), so both the row's own HistoricalAvg and the cheapest weekday
+        as of that row come out of the same pass.
+        """
+        grouped = df.groupby("Weekday")["Close"]
+        total = grouped.cumsum()
+        count = grouped.cumcount() + 1
+        if self.window is not None:
+            # Drop the bars that fell out of the trailing window.
+            total = total - total.groupby(df["Weekday"]).shift(self.window, fill_value=0)
+            count = count.clip(upper=self.window)
+        return self._point_in_time(df, (total / count).to_numpy())[0]
+
+    def _expanding_block(self, df, state):
+        """
+        `_calculate_expanding_average` continued from the state of the previous blocks.
+
+        Replays the grouped cumulative sums row by row (see `_expanding_row`) so the
+        averages match the single pass over the whole series exactly.
+        """
+        state = state or self._expanding_start()
+        averages = np.empty(len(df))
+        for i, (day, value) in enumerate(zip(df["Weekday"].tolist(), df["Close"].tolist())):
+            averages[i] = self._expanding_row(state, day, value)
+        df, state["averages"] = self._point_in_time(df, averages, state["averages"])
+        return df, state
+
+    def _expanding_start(self):
+        """Running state of `_expanding_row` before the first bar"""
+        return {
+            "sums": [0.0] * 7,
+            "compensation": [0.0] * 7,
+            "counts": [0] * 7,
+            "totals": [deque(maxlen=self.window) for _ in range(7)] if self.window else None,
+            "averages": None,  # Latest average of every weekday (see `_point_in_time`)
+        }
+
+    def _expanding_row(self, state, day, value):
+        """
+        Add one bar to the running state; returns the average of its weekday including it.
+
+        Same arithmetic as the grouped cumulative sums of `_calculate_expanding_average`:
+        Kahan-compensated like pandas' groupby cumsum, NaN closes leaving the sum unchanged
+        but counting as bars, and the trailing window as the difference of two running
+        totals.
+        """
+        sums, compensation, counts = state["sums"], state["compensation"], state["counts"]
+        counts[day] += 1
+        total = np.nan
+        if value == value:
+            y = value - compensation[day]
+            total = sums[day] + y
+            compensation[day] = total - sums[day] - y
+            sums[day] = total
+        count = counts[day]
+        if self.window is not None:
+            # The running total `window` bars back, 0 before there are that many.
+            trailing = state["totals"][day]
+            dropped = trailing[0] if len(trailing) == self.window else 0
+            trailing.append(total)
+            total, count = total - dropped, min(count, self.window)
+        return total / count
+
+    def _point_in_time(self, df, averages, previous=None):
+        """
+        HistoricalAvg, PctDiff and the cheapest weekday as of each row, from the average
+        of each bar's weekday including that bar.
+
+        `previous` holds the latest average of every weekday before the first row (the
+        last row returned by the previous call). Returns (df, latest averages).
+        """
+        # Averages scattered into their weekday column after the previous row, carried
+        # forward and shifted by one row so row i only sees bars before it.
+        n = len(df)
+        weekdays = df["Weekday"].to_numpy()
+        known = np.full((n + 1, 7), np.nan)
+        if previous is not None:
+            known[0] = previous
+        known[np.arange(1, n + 1), weekdays] = averages
+        known = pd.DataFrame(known).ffill().to_numpy()
+        latest, known = known[-1], known[:-1]
+
+        df["HistoricalAvg"] = known[np.arange(n), weekdays]
+        df["PctDiff"] = 100 * (df["Close"] - df["HistoricalAvg"]) / df["HistoricalAvg"]
+
+        # Cheapest weekday as of each row (-1 while no weekday has history yet); ties go to the
+        # earliest weekday like Series.idxmin.
+        seen = ~np.isnan(known)
+        self.point_in_time_best_day = np.where(
+            seen.any(axis=1), np.argmin(np.where(seen, known, np.inf), axis=1), -1
+        )
+
+        # Store the latest averages (including the last bar) for potential further use.
+        self.avg_by_day = pd.Series(latest).dropna()
+        self.avg_by_day.index.name = "Weekday"
+        return df, latest
+
     def _generate_signals(self, df):
         if self.threshold_pct is not None:
             # In threshold mode: signal if today's price is below the historical average by more than the threshold.
             df["Signal"] = df["PctDiff"] < self.threshold_pct
+        elif self.expanding:
+            # Point-in-time best-day mode: compare with the cheapest weekday known before today.
+            df["Signal"] = df["Weekday"].to_numpy() == self.point_in_time_best_day
+            self.best_day = self.avg_by_day.idxmin() if len(self.avg_by_day) else None
         else:
             # In best-day mode: determine the weekday with the lowest historical average.
             best_day = self.avg_by_day.idxmin()  # e.g., 1 if Tuesday is cheapest.
@@ -104,3 +265,103 @@ class WeeklyAverageBuyIndicator:
             # Signal a buy only if today is that weekday.
             df["Signal"] = df["Weekday"] == best_day
         return df
+
+    def warm_up(self, df):
+        """
+        Initialise the streaming state from the bars in `df` (not modified).
+
+        Expects the same input as `calculate`: a datetime index or a 'Date' column, and a
+        'Close' column.
+        """
+        if pd.api.types.is_datetime64_any_dtype(df.index):
+            weekdays = df.index.dayofweek
+        elif "Date" in df.columns:
+            weekdays = pd.DatetimeIndex(pd.to_datetime(df["Date"])).dayofweek
+        else:
+            raise ValueError(
+                "DataFrame index must be a datetime type or contain a 'Date' column to convert."
+            )
+
+        if self.expanding:
+            frame = pd.DataFrame({"Close": df["Close"].to_numpy(), "Weekday": weekdays})
+            self.expanding_state = self._expanding_block(frame, None)[1]
+            if self.expanding_state["averages"] is not None:
+                self.expanding_state["averages"] = self.expanding_state["averages"].copy()
+            return self
+
+        self.weekday_sums = {}
+        self.weekday_compensation = {}
+        self.weekday_counts = {}
+        for weekday, close in zip(weekdays, df["Close"]):
+            self._add_close(weekday, close)
+        return self
+
+    def update(self, bar):
+        """
+        Add one bar (mapping with 'Date' and 'Close') and return its signal.
+
+        The running per-weekday sums make this O(1) per bar, and the result is identical to
+        the last row of `calculate` run on all bars seen so far: expanding mode steps the
+        same running sums as `calculate` (see `_expanding_row`).
+        """
+        weekday = pd.Timestamp(bar["Date"]).dayofweek
+        close = bar["Close"]
+        if self.expanding:
+            # Point-in-time: judge the bar against prior bars only, then add it.
+            state = self.expanding_state
+            if state is None:
+                state = self.expanding_state = self._expanding_start()
+            if state["averages"] is None:
+                state["averages"] = np.full(7, np.nan)
+            known = state["averages"]
+            signal = self._signal_from_averages(known, weekday, close)
+            average = self._expanding_row(state, weekday, close)
+            if average == average:  # Like the forward fill of `_point_in_time`
+                known[weekday] = average
+            return signal
+
+        self._add_close(weekday, close)
+        return self._signal_from_state(weekday, close)
+
+    def _signal_from_averages(self, known, weekday, close):
+        """Point-in-time signal for a close given the latest average of every weekday"""
+        historical_avg = known[weekday]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct_diff = 100 * (np.float64(close) - historical_avg) / historical_avg
+        if self.threshold_pct is not None:
+            return bool(pct_diff < self.threshold_pct)
+
+        # Lowest average wins, ties go to the earliest weekday like `_point_in_time`.
+        seen = ~np.isnan(known)
+        if not seen.any():
+            return False
+        self.best_day = int(np.argmin(np.where(seen, known, np.inf)))
+        return bool(weekday == self.best_day)
+
+    def _signal_from_state(self, weekday, close):
+        """Signal for a close on `weekday` given the current per-weekday sums"""
+        if not self.weekday_counts.get(weekday):
+            return False
+        historical_avg = self.weekday_sums[weekday] / self.weekday_counts[weekday]
+        pct_diff = 100 * (close - historical_avg) / historical_avg
+
+        if self.threshold_pct is not None:
+            return bool(pct_diff < self.threshold_pct)
+
+        # Lowest average wins, ties go to the earliest weekday like Series.idxmin.
+        self.best_day = min(
+            sorted(self.weekday_sums),
+            key=lambda day: self.weekday_sums[day] / self.weekday_counts[day],
+        )
+        return bool(weekday == self.best_day)
+
+    def _add_close(self, weekday, close):
+        """Kahan-compensated running sum, matching pandas' groupby mean bit for bit"""
+        if close != close:  # NaN closes are skipped by groupby().mean()
+            return
+        total = self.weekday_sums.get(weekday, 0.0)
+        y = close - self.weekday_compensation.get(weekday, 0.0)
+        t = total + y
+        self.weekday_compensation[weekday] = t - total - y
+        self.weekday_sums[weekday] = t
+        self.weekday_counts[weekday] = self.weekday_counts.get(weekday, 0) + 1
@@ -0,0 +1,292 @@
+# src/instrumentation.py
+"""
+Per-stage timing and memory instrumentation shared by all entry points.
+
+Pipeline code wraps each stage in a span:
+
+    with span("clean_data", ticker=ticker):
+        ...
+
+Spans are free when profiling is off. When it is on, every finished span records its
+wall time and the peak traced memory (tracemalloc) allocated while it ran. Labels such
+as `ticker` are inherited by nested spans, so a `calculate` span inside a
+`process_ticker` span is attributed to that ticker.
+
+tracemalloc only tracks the whole process, so a peak is only attributable to a span
+while no other thread runs spans: spans that overlap a span of another thread (e.g. the
+download threads of batch_download.py) record their time but no `peak_memory_bytes`.
+Worker processes trace their own memory, so process pools are measured per span.
+
+Summaries and Prometheus metrics are per stage, and also per ticker with
+`by=("stage", "ticker")` (--profile-tickers); Prometheus samples carry a `ticker`
+label wherever the spans had one.
+
+Profiling is enabled by `enable()` (the entry points call it for --profile) and is
+inherited by worker processes through the NOCTURNE_PROFILE environment variable: each
+process appends its spans to the shared JSON lines file, and the parent aggregates it
+into a ranked summary and a Prometheus text-format file.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+ENV_VAR = "NOCTURNE_PROFILE"
+DEFAULT_METRICS_DIR = "data-files/metrics"
+
+_state = threading.local()
+_config = {"enabled": False, "memory": False, "jsonl": None}
+_records = []
+_lock = threading.Lock()
+_active = {}  # Thread id -> span stack, for the threads with a span open
+
+
+def enable(jsonl_path=None, memory=True):
+    """Start recording spans, optionally appending them to a JSON lines file"""
+    if jsonl_path is not None:
+        Path(jsonl_path).parent.mkdir(parents=True, exist_ok=True)
+        # Worker processes pick the configuration up from the environment.
+        os.environ[ENV_VAR] = json.dumps({"jsonl": str(jsonl_path), "memory": memory})
+    _config.update(enabled=True, memory=memory, jsonl=jsonl_path)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _config.update(enabled=False, memory=False, jsonl=None)
+    os.environ.pop(ENV_VAR, None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _config["enabled"]
+
+
+def records():
+    """Spans recorded in this process"""
+    with _lock:
+        return list(_records)
+
+
+def _stack():
+    if not hasattr(_state, "stack"):
+        _state.stack = []
+    return _state.stack
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a pipeline stage (and its peak memory when memory tracing is on)"""
+    if not _config["enabled"]:
+        yield
+        return
+
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    frame = {"labels": {**(parent["labels"] if parent else {}), **labels}, "peak": 0}
+
+    memory = _config["memory"] and tracemalloc.is_tracing()
+    with _lock:
+        _active[threading.get_ident()] = stack
+        if len(_active) > 1:
+            # Another thread has spans open: no peak is attributable to either, and
+            # resetting the process-wide peak would corrupt theirs.
+            for frames in _active.values():
+                for other in frames:
+                    other["shared"] = True
+            frame["shared"] = True
+    memory = memory and not frame.get("shared")
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if parent is not None:
+            parent["peak"] = max(parent["peak"], peak)
+        tracemalloc.reset_peak()
+        frame["start_memory"] = current
+
+    stack.append(frame)
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        stack.pop()
+        if not stack:
+            with _lock:
+                _active.pop(threading.get_ident(), None)
+        record = {"stage": stage, **frame["labels"], "seconds": round(seconds, 6)}
+        if memory and not frame.get("shared"):
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            record["peak_memory_bytes"] = max(peak - frame["start_memory"], 0)
+            if parent is not None:
+                # Nested spans reset the tracemalloc peak; carry it up to the parent.
+                parent["peak"] = max(parent["peak"], peak)
+        record["start"] = round(started_at, 6)
+        record["pid"] = os.getpid()
+        _record(record)
+
+
+def _record(record):
+    with _lock:
+        _records.append(record)
+        if _config["jsonl"]:
+            with open(_config["jsonl"], "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def load_jsonl(path):
+    """Read every span recorded in a JSON lines file"""
+    if not Path(path).exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(spans, by=("stage",)):
+    """
+    Aggregate spans per stage (or per any labels, e.g. by=("stage", "ticker")), ranked
+    by total time. Spans without one of the labels are grouped under None.
+    """
+    stages = {}
+    for record in spans:
+        group = tuple(record.get(label) for label in by)
+        entry = stages.setdefault(
+            group,
+            {**dict(zip(by, group)), "calls": 0, "seconds": 0.0, "max_seconds": 0.0},
+        )
+        entry["calls"] += 1
+        entry["seconds"] += record["seconds"]
+        entry["max_seconds"] = max(entry["max_seconds"], record["seconds"])
+        if "peak_memory_bytes" in record:
+            entry["peak_memory_bytes"] = max(
+                entry.get("peak_memory_bytes", 0), record["peak_memory_bytes"]
+            )
+    return sorted(stages.values(), key=lambda e: e["seconds"], reverse=True)
+
+
+def format_summary(spans, by_ticker=False):
+    """Ranked, human-readable table of the time and memory spent per stage (and ticker)"""
+    rows = summarize(spans, ("stage", "ticker") if by_ticker else ("stage",))
+    if not rows:
+        return "No spans recorded."
+    ticker = f"{'Ticker':<10} " if by_ticker else ""
+    lines = [
+        f"{'Stage':<28} {ticker}{'Calls':>7} {'Total s':>10} {'Mean ms':>10} {'Peak MB':>9}"
+    ]
+    for row in rows:
+        peak = row.get("peak_memory_bytes")
+        ticker = f"{row['ticker'] or '-':<10} " if by_ticker else ""
+        lines.append(
+            f"{row['stage']:<28} {ticker}{row['calls']:>7} {row['seconds']:>10.3f} "
+            f"{row['seconds'] / row['calls'] * 1000:>10.2f} "
+            f"{peak / 2**20 if peak is not None else float('nan'):>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(spans, path):
+    """
+    Write per-stage metrics in the Prometheus text exposition format, one sample per
+    stage and ticker (the `ticker` label is left out for spans without one)
+    """
+    rows = summarize(spans, ("stage", "ticker"))
+    metrics = [
+        (
+            "nocturne_stage_seconds_total",
+            "counter",
+            "Total time spent in the stage",
+            "seconds",
+        ),
+        ("nocturne_stage_calls_total", "counter", "Number of times the stage ran", "calls"),
+        (
+            "nocturne_stage_max_seconds",
+            "gauge",
+            "Slowest single run of the stage",
+            "max_seconds",
+        ),
+        (
+            "nocturne_stage_peak_memory_bytes",
+            "gauge",
+            "Peak traced memory allocated during the stage",
+            "peak_memory_bytes",
+        ),
+    ]
+    lines = []
+    for name, kind, help_text, field in metrics:
+        samples = [row for row in rows if field in row]
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for row in samples:
+            labels = f'stage="{_escape(row["stage"])}"'
+            if row["ticker"] is not None:
+                labels += f',ticker="{_escape(row["ticker"])}"'
+            lines.append(f"{name}{{{labels}}} {row[field]}")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text("\n".join(lines) + "\n")
+    os.replace(tmp, path)  # The node exporter must never read a partial file
+    return path
+
+
+def add_arguments(parser):
+    """Add the shared --profile options to an argparse parser"""
+    group = parser.add_argument_group("profiling")
+    group.add_argument(
+        "--profile", action="store_true", help="time every stage and print a ranked summary"
+    )
+    group.add_argument("--metrics-dir", default=DEFAULT_METRICS_DIR)
+    group.add_argument(
+        "--no-memory", action="store_true", help="skip tracemalloc peak-memory sampling"
+    )
+    group.add_argument(
+        "--profile-tickers", action="store_true", help="also summarize per stage and ticker"
+    )
+    return parser
+
+
+@contextmanager
+def profiling(args, name):
+    """
+    Profile an entry point run when args.profile is set.
+
+    Spans go to METRICS_DIR/<name>.jsonl; at the end a ranked summary is printed and
+    METRICS_DIR/<name>.prom is written for the node exporter's textfile collector.
+    """
+    if not getattr(args, "profile", False):
+        yield
+        return
+
+    metrics_dir = Path(args.metrics_dir)
+    jsonl = metrics_dir / f"{name}.jsonl"
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    jsonl.unlink(missing_ok=True)
+    enable(jsonl, memory=not args.no_memory)
+    try:
+        with span(name):
+            yield
+    finally:
+        disable()
+        spans = load_jsonl(jsonl)
+        prom = write_prometheus(spans, metrics_dir / f"{name}.prom")
+        print("\n⏱  Profile\n" + format_summary(spans))
+        if getattr(args, "profile_tickers", False):
+            print("\n⏱  Per ticker\n" + format_summary(spans, by_ticker=True))
+        print(f"\nMetrics: {jsonl} and {prom}")
+
+
+# Worker processes inherit the profiling configuration of their parent.
+if os.environ.get(ENV_VAR):
+    _inherited = json.loads(os.environ[ENV_VAR])
+    enable(_inherited["jsonl"], memory=_inherited["memory"])
@@ -0,0 +1,171 @@
+# src/load_test.py
+"""
+Load test for the query service (see service.py).
+
+Many clients, each on its own keep-alive connection, send requests drawn from a mix of
+series, indicator and signal queries over the tickers the service reports, and the run
+reports throughput and latency percentiles per route. Exits with status 1 when any
+request fails.
+
+Usage:
+  python src/load_test.py --clients 100 --requests 200          # against a running service
+  python src/load_test.py --serve --clients 100 --requests 200  # start one, test it, stop it
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from service import DEFAULT_HOST, DEFAULT_PORT
+
+SRC = Path(__file__).resolve().parent
+
+
+async def request(reader, writer, host, path):
+    """Send one GET on an open connection; returns (status, body)"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (header := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def get(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return await request(reader, writer, host, path)
+    finally:
+        writer.close()
+
+
+async def wait_until_up(host, port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await get(host, port, "/health")
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def query_mix(tickers, interval, seed=0):
+    """Paths weighted towards the cheap, frequent queries"""
+    rng = random.Random(seed)
+    bars, results = tickers["bars"], tickers["indicators"]
+    paths = []
+    for _ in range(1000):
+        draw = rng.random()
+        if bars and draw < 0.4:
+            ticker = rng.choice(bars)
+            year = rng.randint(2000, 2024)
+            paths.append(
+                (
+                    "series",
+                    f"/series/{ticker}?interval={interval}&start={year}-01-01"
+                    f"&end={year}-12-31&columns=Close,Volume",
+                )
+            )
+        elif results and draw < 0.8:
+            ticker = rng.choice(results)
+            start = f"{rng.randint(2000, 2024)}-{rng.randint(1, 12):02d}-01"
+            paths.append(
+                (
+                    "indicators",
+                    f"/indicators/{ticker}?interval={interval}&start={start}"
+                    "&columns=Close,Signal",
+                )
+            )
+        elif draw < 0.95:
+            paths.append(("signals", f"/signals?interval={interval}"))
+        else:
+            paths.append(("stats", "/stats"))
+    return paths
+
+
+async def client(host, port, paths, count, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for route, path in random.choices(paths, k=count):
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, host, path)
+            latencies.setdefault(route, []).append(time.perf_counter() - started)
+            if status != 200:
+                errors.append((status, path))
+    finally:
+        writer.close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+async def run(host, port, clients, requests, interval):
+    _, body = await get(host, port, f"/tickers?interval={interval}")
+    paths = query_mix(json.loads(body), interval)
+    latencies, errors = {}, []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(client(host, port, paths, requests, latencies, errors) for _ in range(clients))
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(len(v) for v in latencies.values())
+
+    print(
+        f"{clients} clients, {total} requests in {elapsed:.2f}s: {total / elapsed:,.0f} req/s"
+    )
+    print(
+        f"{'route':<12} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for route, values in sorted(latencies.items()):
+        p50, p95, p99 = (percentile(values, p) * 1000 for p in (50, 95, 99))
+        print(
+            f"{route:<12} {len(values):>7} {p50:>8.2f} {p95:>8.2f} {p99:>8.2f} "
+            f"{max(values) * 1000:>8.2f}"
+        )
+    mean = sum(sum(values) for values in latencies.values()) / total
+    print(f"mean latency {mean * 1000:.2f} ms")
+    _, stats = await get(host, port, "/stats")
+    print("cache:", stats.decode())
+    for status, path in errors[:10]:
+        print(f"❌ {status} {path}")
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the query service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="per client")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--serve", action="store_true", help="start a local service first")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.serve:
+        command = [sys.executable, str(SRC / "service.py"), "--port", str(args.port)]
+        command += ["--preload", args.interval]
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_until_up(args.host, args.port))
+        return asyncio.run(
+            run(args.host, args.port, args.clients, args.requests, args.interval)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# src/nocturne.py
+"""
+Single command line entry point for the data pipeline.
+
+  nocturne fetch                          prompt for one ticker and download it
+  nocturne fetch AAPL MSFT --start ...    download many tickers (see batch_download.py)
+  nocturne indicators [--batch ...]       compute indicators (see get_indicator_data.py)
+  nocturne graph                          graph stored closing prices (see create_graph.py)
+  nocturne list [--interval 1d]           list the stored series and their date ranges
+  nocturne clean [FILE ...]               re-clean CSV files in bounded-memory chunks into
+                                          compact dtypes, reporting the memory saved
+  nocturne derive [TICKER ...]            resample stored fine bars into coarser intervals
+                                          (see resample.py)
+  nocturne screen [--indicators ...]      tickers signalling on their latest bar, ranked
+                                          (see screener.py)
+  nocturne simulate AAPL --interval 1m    paper-trade indicator signals with stop-loss and
+                                          take-profit orders (see simulator.py)
+  nocturne serve [--port 8765]            keep bars and indicator results in memory behind
+                                          a local HTTP API (see service.py)
+
+Each subcommand's module is imported only when that subcommand runs, so `nocturne list`
+starts without loading pandas, matplotlib, yfinance or questionary
+(`python src/benchmark.py startup` checks the startup budget).
+
+Usage:
+  python src/nocturne.py list
+  python src/nocturne.py indicators --batch --indicators djia_weakness --profile
+  python src/nocturne.py indicators --batch --interval 1m --chunk-size 250000
+"""
+import argparse
+import sys
+from pathlib import Path
+
+
+def fetch(argv):
+    """Batch download when tickers are given, otherwise the interactive prompts"""
+    import batch_download
+
+    parser = batch_download.build_parser(prog="nocturne fetch")
+    args = parser.parse_args(argv)
+    if args.tickers or args.file:
+        return batch_download.run(args, parser)
+
+    from get_stock_data import download_interactive
+    from instrumentation import profiling
+
+    with profiling(args, "get_stock_data"):
+        download_interactive()
+    return 0
+
+
+def indicators(argv):
+    import get_indicator_data
+
+    return get_indicator_data.main(argv)
+
+
+def graph(argv):
+    import create_graph
+
+    return create_graph.main(argv)
+
+
+def list_series(argv):
+    """Print every stored series with its first and last bar"""
+    from storage import BACKENDS, get_store
+
+    parser = argparse.ArgumentParser(prog="nocturne list", description=list_series.__doc__)
+    parser.add_argument("--interval", help="only list series of this interval")
+    parser.add_argument("--backend", choices=list(BACKENDS), help="default: $NOCTURNE_STORE")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.backend)
+    series = [(t, i) for t, i in store.series() if args.interval in (None, i)]
+    if not series:
+        print("No stock data found in", store.root)
+        return 0
+    for ticker, interval in series:
+        start, end = store.bounds(ticker, interval)
+        print(f"{ticker:<10} {interval:<5} {start.date()} to {end.date()}")
+    return 0
+
+
+def clean(argv):
+    """Re-clean CSV files chunk by chunk into compact dtypes and report the savings"""
+    from get_stock_data import DEFAULT_CHUNK_ROWS, clean_file
+    from instrumentation import add_arguments, profiling
+    from storage import get_store
+
+    parser = argparse.ArgumentParser(prog="nocturne clean", description=clean.__doc__)
+    parser.add_argument("files", nargs="*", help="default: every file of the CSV store")
+    parser.add_argument("--output-dir", help="write cleaned copies here instead of in place")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--no-compact", action="store_true", help="keep float64 prices")
+    args = add_arguments(parser).parse_args(argv)
+
+    store = get_store("csv")
+    files = args.files or [f for t, i in store.series() for f in store.files(t, i)]
+    failures = 0
+    with profiling(args, "clean"):
+        for path in files:
+            output = f"{args.output_dir}/{Path(path).name}" if args.output_dir else None
+            if output:
+                Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+            try:
+                report = clean_file(path, output, args.chunk_size, not args.no_compact)
+                if output is None:
+                    store.index_file(path)
+            except Exception as e:
+                print(f"❌ {path}: {e}")
+                failures += 1
+                continue
+            print(
+                f"✅ {Path(path).name}: {report['rows']} rows, "
+                f"{report['bytes_before'] / 2**20:.1f} MB -> "
+                f"{report['bytes_after'] / 2**20:.1f} MB in memory "
+                f"({report['saved_pct']}% saved)"
+            )
+    return 1 if failures else 0
+
+
+def derive(argv):
+    import resample
+
+    return resample.main(argv)
+
+
+def screen(argv):
+    import screener
+
+    return screener.main(argv)
+
+
+def simulate(argv):
+    import simulator
+
+    return simulator.main(argv)
+
+
+def serve(argv):
+    import service
+
+    return service.main(argv)
+
+
+COMMANDS = {
+    "fetch": fetch,
+    "indicators": indicators,
+    "graph": graph,
+    "list": list_series,
+    "clean": clean,
+    "derive": derive,
+    "screen": screen,
+    "simulate": simulate,
+    "serve": serve,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="nocturne",
+        description="Nocturne Intelligence data pipeline",
+        epilog="Run 'nocturne <command> --help' for the options of a command.",
+    )
+    parser.add_argument("command", choices=list(COMMANDS))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    return COMMANDS[args.command](args.args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# src/resample.py
+"""
+Interval pyramid: coarser OHLCV bars derived locally from stored finer bars.
+
+`resample` aggregates bars (open=first, high=max, low=min, close=last, volume=sum) into
+buckets that respect trading sessions and the calendar:
+
+  - intraday buckets (5m, 15m, 30m, 1h, 90m...) are counted from the session open
+    (09:30 exchange time by default) and never span two sessions
+  - 1d buckets are exchange-local calendar days, 1wk weeks starting on Monday, 1mo and
+    3mo calendar months and quarters, labelled by their first day
+
+`Pyramid` keeps derived levels in the store next to the downloaded ones, so every reader
+sees them as ordinary series. The catalog records which levels are derived and the
+state of the series they were built from; when new fine bars arrive, only the buckets
+from the last derived bar onwards are recomputed (a change at the head of the source
+rebuilds the level). Downloaded series are never overwritten by derived ones.
+
+Usage:
+  python src/resample.py AAPL --levels 5m 15m 1h 1d 1wk 1mo
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+from instrumentation import span
+
+INTRADAY_MINUTES = {
+    "1m": 1,
+    "2m": 2,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "60m": 60,
+    "90m": 90,
+    "1h": 60,
+}
+CALENDAR_INTERVALS = ["1d", "1wk", "1mo", "3mo"]
+DEFAULT_LEVELS = ["5m", "15m", "1h", "1d", "1wk", "1mo"]
+
+SESSION_OPEN = "09:30"
+EXCHANGE_TZ = "America/New_York"
+
+
+def interval_minutes(interval):
+    """Approximate length of a bar, used to order intervals from fine to coarse"""
+    if interval in INTRADAY_MINUTES:
+        return INTRADAY_MINUTES[interval]
+    return {"1d": 1440, "5d": 5 * 1440, "1wk": 7 * 1440, "1mo": 31 * 1440, "3mo": 92 * 1440}[
+        interval
+    ]
+
+
+def can_derive(source, target):
+    """Whether every `target` bucket is made of whole `source` bars"""
+    if source == target or target not in INTRADAY_MINUTES and target not in CALENDAR_INTERVALS:
+        return False
+    if source in INTRADAY_MINUTES:
+        if target in INTRADAY_MINUTES:
+            step, target_step = INTRADAY_MINUTES[source], INTRADAY_MINUTES[target]
+            return target_step > step and target_step % step == 0
+        return True
+    # Weeks straddle month ends, so months and quarters come from days (or months).
+    return (source, target) in {("1d", "1wk"), ("1d", "1mo"), ("1d", "3mo"), ("1mo", "3mo")}
+
+
+def _bucket_labels(dates, interval, session_open, exchange_tz):
+    """Exchange-local bucket label of every bar, as naive datetime64[ns], and the tz"""
+    tz = getattr(dates.dtype, "tz", None)
+    if tz is not None and str(tz) == "UTC":
+        dates, tz = dates.dt.tz_convert(exchange_tz), exchange_tz
+    wall = dates.dt.tz_localize(None) if tz is not None else dates
+    wall = wall.to_numpy().astype("datetime64[ns]")
+    days = wall.astype("datetime64[D]")
+
+    if interval in INTRADAY_MINUTES:
+        step = np.timedelta64(INTRADAY_MINUTES[interval], "m")
+        hours, minutes = (int(part) for part in session_open.split(":"))
+        opens = days + np.timedelta64(hours * 60 + minutes, "m")
+        buckets = np.floor_divide(wall - opens, step)
+        return opens + buckets * step, tz
+    if interval == "1d":
+        labels = days
+    elif interval == "1wk":
+        # 1970-01-01 was a Thursday: (days + 3) % 7 is the weekday with Monday = 0.
+        labels = days - (days.astype(np.int64) + 3) % 7
+    elif interval == "1mo":
+        labels = days.astype("datetime64[M]")
+    elif interval == "3mo":
+        months = days.astype("datetime64[M]").astype(np.int64)
+        labels = (months - months % 3).astype("datetime64[M]")
+    else:
+        raise ValueError(f"Cannot resample to {interval!r}")
+    return labels.astype("datetime64[ns]"), None
+
+
+def resample(df, interval, session_open=SESSION_OPEN, exchange_tz=EXCHANGE_TZ):
+    """
+    Aggregate bars sorted by 'Date' into `interval` bars.
+
+    Intraday labels keep the timezone of the input (UTC input is labelled in
+    `exchange_tz`); daily and coarser bars are labelled with naive dates.
+    """
+    if df.empty:
+        return df.copy()
+    with span("resample", interval=interval, rows=len(df)):
+        labels, tz = _bucket_labels(df["Date"], interval, session_open, exchange_tz)
+        starts = np.concatenate([[0], np.flatnonzero(labels[1:] != labels[:-1]) + 1])
+        ends = np.append(starts[1:], len(labels)) - 1
+
+        dates = pd.DatetimeIndex(labels[starts])
+        if tz is not None:
+            dates = dates.tz_localize(tz, ambiguous="NaT", nonexistent="shift_forward")
+        out = {"Date": dates}
+        for column in df.columns.drop("Date"):
+            values = df[column].to_numpy()
+            if column == "Open":
+                out[column] = values[starts]
+            elif column == "High":
+                out[column] = np.maximum.reduceat(values, starts)
+            elif column == "Low":
+                out[column] = np.minimum.reduceat(values, starts)
+            elif column == "Volume":
+                out[column] = np.add.reduceat(values, starts)
+            else:  # Close, Adj Close
+                out[column] = values[ends]
+        return pd.DataFrame(out)
+
+
+class Pyramid:
+    """Derived intervals of the series held by a store"""
+
+    def __init__(self, store, session_open=SESSION_OPEN, exchange_tz=EXCHANGE_TZ):
+        self.store = store
+        self.session_open = session_open
+        self.exchange_tz = exchange_tz
+
+    def intervals(self, ticker):
+        """Stored intervals of a ticker, finest first"""
+        stored = [i for t, i in self.store.series() if t == ticker]
+        return sorted(stored, key=interval_minutes)
+
+    def source(self, ticker, interval):
+        """The coarsest stored interval `interval` can be derived from, or None"""
+        candidates = [i for i in self.intervals(ticker) if can_derive(i, interval)]
+        return candidates[-1] if candidates else None
+
+    def is_derived(self, ticker, interval):
+        return interval in self.store.catalog.derived(self.store.name, ticker)
+
+    def available(self, ticker, interval):
+        return self.store.exists(ticker, interval) or self.source(ticker, interval) is not None
+
+    def tickers(self, interval):
+        """Tickers whose `interval` bars are stored or can be derived"""
+        stored = {}
+        for ticker, i in self.store.series():
+            stored.setdefault(ticker, []).append(i)
+        return sorted(
+            t
+            for t, intervals in stored.items()
+            if interval in intervals or any(can_derive(i, interval) for i in intervals)
+        )
+
+    def covering_source(self, ticker, interval, start_date, end_date):
+        """A stored finer interval covering every business day in [start_date, end_date]"""
+        source = self.source(ticker, interval)
+        if source is None:
+            return None
+        first, last = self.store.bounds(ticker, source)
+        first_day = np.busday_offset(np.datetime64(start_date, "D"), 0, roll="forward")
+        last_day = np.busday_offset(np.datetime64(end_date, "D"), 0, roll="backward")
+        if np.datetime64(first.date()) <= first_day and np.datetime64(last.date()) >= last_day:
+            return source
+        return None
+
+    def read(self, ticker, interval, start=None, end=None, columns=None):
+        """Read a series, deriving (or refreshing) it first when it is not downloaded"""
+        if not self.store.exists(ticker, interval) or self.is_derived(ticker, interval):
+            self.refresh(ticker, interval)
+        return self.store.read(ticker, interval, start, end, columns)
+
+    def read_blocks(self, ticker, interval, rows, columns=None):
+        """`read` as blocks of at most `rows` rows (see the stores' `read_blocks`)"""
+        if not self.store.exists(ticker, interval) or self.is_derived(ticker, interval):
+            self.refresh(ticker, interval)
+        return self.store.read_blocks(ticker, interval, rows, columns)
+
+    def refresh(self, ticker, interval):
+        """
+        Build a derived level, or bring it up to date with its source.
+
+        Returns the number of derived bars written (0 when the level was current).
+        """
+        catalog, backend = self.store.catalog, self.store.name
+        entry = catalog.derived(backend, ticker).get(interval)
+        if entry is None and self.store.exists(ticker, interval):
+            return 0  # Downloaded, not derived
+        source = entry["source_interval"] if entry else self.source(ticker, interval)
+        if source is None or not self.store.exists(ticker, source):
+            raise FileNotFoundError(f"No finer data to derive {ticker} ({interval}) from")
+        if self.is_derived(ticker, source):
+            self.refresh(ticker, source)
+
+        state = catalog.state(backend, ticker, source)
+        recorded = entry and (
+            entry["source_first_utc"],
+            entry["source_last_utc"],
+            entry["source_rows"],
+        )
+        if recorded == state:
+            return 0
+
+        with span("derive", ticker=ticker, interval=interval, source=source):
+            if entry and entry["source_first_utc"] == state[0]:
+                # Only bars after the old source tail are new; recompute from the last
+                # (possibly partial) derived bucket onwards. The source is read from a
+                # day earlier since daily labels are exchange-local, not UTC.
+                existing = self.store.read(ticker, interval)
+                since = existing["Date"].iloc[-1]
+                fine = self.store.read(ticker, source, start=since - pd.Timedelta(days=1))
+                fresh = resample(fine, interval, self.session_open, self.exchange_tz)
+                fresh = fresh[fresh["Date"] >= since]
+                tz = getattr(existing["Date"].dtype, "tz", None)
+                if tz is not None:
+                    fresh = fresh.assign(Date=fresh["Date"].dt.tz_convert(tz))
+                kept = existing[existing["Date"] < since]
+                derived = pd.concat([kept, fresh], ignore_index=True)
+                written = len(fresh)
+            else:
+                fine = self.store.read(ticker, source)
+                derived = resample(fine, interval, self.session_open, self.exchange_tz)
+                written = len(derived)
+            self.store.write(ticker, interval, derived, replace=True)
+        catalog.record_derived(backend, ticker, interval, source, state)
+        return written
+
+    def refresh_all(self, ticker):
+        """Bring every derived level of a ticker up to date, finest first"""
+        derived = self.store.catalog.derived(self.store.name, ticker)
+        return {i: self.refresh(ticker, i) for i in sorted(derived, key=interval_minutes)}
+
+    def build(self, ticker, levels=DEFAULT_LEVELS):
+        """Derive every level that is neither downloaded nor underivable"""
+        written = {}
+        for interval in sorted(levels, key=interval_minutes):
+            downloaded = self.store.exists(ticker, interval) and not self.is_derived(
+                ticker, interval
+            )
+            if not downloaded and self.source(ticker, interval) is not None:
+                written[interval] = self.refresh(ticker, interval)
+        return written
+
+
+def main(argv=None):
+    from storage import get_store
+
+    parser = argparse.ArgumentParser(description="Derive coarser intervals from stored bars")
+    parser.add_argument("tickers", nargs="*", help="defaults to every stored ticker")
+    parser.add_argument("--levels", nargs="+", default=DEFAULT_LEVELS)
+    parser.add_argument("--session-open", default=SESSION_OPEN, help="HH:MM exchange time")
+    parser.add_argument("--exchange-tz", default=EXCHANGE_TZ)
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    pyramid = Pyramid(store, args.session_open, args.exchange_tz)
+    tickers = [t.upper() for t in args.tickers] or sorted({t for t, _ in store.series()})
+    for ticker in tickers:
+        written = pyramid.build(ticker, args.levels)
+        if not written:
+            print(f"{ticker}: nothing to derive")
+            continue
+        levels = ", ".join(f"{i} ({n} bars)" for i, n in written.items())
+        print(f"{ticker}: {levels}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
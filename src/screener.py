@@ -0,0 +1,415 @@
+# src/screener.py
+"""
+Cross-sectional screener over a persistent dates x tickers panel.
+
+The closes and volumes of the whole universe are held in one aligned pair of C-contiguous
+float64 arrays (dates x tickers, NaN where a ticker has no bar) and every screen is
+evaluated on the whole panel with array operations instead of one `calculate` call per
+ticker:
+
+  - djia_weakness: ROC over `roc_length` bars of each ticker (tickers with gaps are
+    right-aligned first, so "bars back" means the ticker's own bars)
+  - weekly_average_buy: weekday sums and counts for every ticker at once (full-sample,
+    or point-in-time with an optional trailing window of same-weekday bars)
+  - presidential_cycles: the cycle year of each ticker's latest bar
+
+The result is the tickers whose latest bar signals, ranked by the indicator value (most
+negative ROC / PctDiff first), using the same parameters and semantics as the classes
+in INDICATORS.
+
+Panel dates are held as naive UTC with the timezone each ticker's bars were stored in,
+and calendar screens (weekdays, cycle years) read every ticker's dates in its own
+timezone, like the indicators do.
+
+The panel is saved under data-files/cache/panel with the catalog state of every ticker
+it was built from. The next run compares those states with the catalog and only reads
+the tickers whose series changed: bars after the last panel bar when the series only
+grew, the whole series when its history changed. Unchanged tickers are not read at all.
+
+Usage:
+  python src/screener.py --indicators djia_weakness weekly_average_buy
+  python src/screener.py --indicators weekly_average_buy --threshold-pct -2 --expanding
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from indicator_cache import constructor_params
+from indicators import INDICATORS
+from instrumentation import add_arguments, profiling, span
+from resample import Pyramid
+
+PANEL_FORMAT = 2
+DEFAULT_PANEL_DIR = "data-files/cache/panel"
+
+
+def _naive_utc(dates):
+    """'Date' values as naive datetime64[ns] (timezone-aware dates converted to UTC)"""
+    if getattr(dates.dtype, "tz", None) is not None:
+        dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+    return dates.to_numpy().astype("datetime64[ns]")
+
+
+class Panel:
+    """Aligned closes and volumes of a universe, with the catalog state they reflect"""
+
+    def __init__(
+        self, dates=None, tickers=(), close=None, volume=None, states=None, zones=None
+    ):
+        self.dates = np.asarray(dates if dates is not None else [], dtype="datetime64[ns]")
+        self.tickers = list(tickers)
+        shape = (len(self.dates), len(self.tickers))
+        self.close = np.ascontiguousarray(close if close is not None else np.empty(shape))
+        self.volume = np.ascontiguousarray(volume if volume is not None else np.empty(shape))
+        self.states = dict(states or {})
+        self.zones = dict(zones or {})  # Timezone of each ticker's bars (None when naive)
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved panel; an empty panel if there is none (or it has an old format)"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["format"]) != PANEL_FORMAT:
+                    return cls()
+                tickers = data["tickers"].tolist()
+                states = {t: tuple(int(v) for v in s) for t, s in zip(tickers, data["states"])}
+                zones = {t: str(z) or None for t, z in zip(tickers, data["zones"])}
+                return cls(
+                    data["dates"], tickers, data["close"], data["volume"], states, zones
+                )
+        except FileNotFoundError:
+            return cls()
+
+    def save(self, path):
+        """Write the panel atomically"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(
+            tmp,
+            format=PANEL_FORMAT,
+            dates=self.dates,
+            tickers=np.array(self.tickers, dtype=str),
+            close=self.close,
+            volume=self.volume,
+            states=np.array([self.states[t] for t in self.tickers], dtype=np.int64).reshape(
+                -1, 3
+            ),
+            zones=np.array([self.zones.get(t) or "" for t in self.tickers], dtype=str),
+        )
+        os.replace(tmp, path)
+        return path
+
+    def local_dates(self):
+        """Dates x tickers wall times (naive datetime64[ns]) in each ticker's timezone"""
+        local = np.repeat(self.dates[:, None], len(self.tickers), axis=1)
+        utc = pd.DatetimeIndex(self.dates).tz_localize("UTC")
+        for zone in {z for z in self.zones.values() if z is not None}:
+            columns = [k for k, t in enumerate(self.tickers) if self.zones.get(t) == zone]
+            local[:, columns] = utc.tz_convert(zone).tz_localize(None).to_numpy()[:, None]
+        return local
+
+    def last_rows(self):
+        """Row of the latest bar of every ticker (-1 for a ticker without bars)"""
+        if not len(self.dates):
+            return np.full(len(self.tickers), -1)
+        valid = ~np.isnan(self.close)
+        last = len(self.dates) - 1 - np.argmax(valid[::-1], axis=0)
+        return np.where(valid.any(axis=0), last, -1)
+
+    def update(self, store, interval="1d", tickers=None):
+        """
+        Bring the panel up to date with the store, reading only the series that changed.
+
+        `tickers` defaults to every ticker whose interval is stored or derivable; tickers
+        outside the selection are dropped. Returns {"appended": [...], "reloaded": [...],
+        "removed": [...]}.
+        """
+        pyramid = Pyramid(store)
+        targets = list(tickers) if tickers is not None else pyramid.tickers(interval)
+        catalog = store.catalog
+        derived = set(catalog.derived_tickers(store.name, interval))
+        states = catalog.states(store.name, interval)
+        for ticker in targets:
+            if ticker not in states or ticker in derived:
+                pyramid.refresh(ticker, interval)
+                states[ticker] = catalog.state(store.name, ticker, interval)
+
+        last_rows = dict(zip(self.tickers, self.last_rows()))
+        appended, reloaded, frames = [], [], {}
+        with span("panel_read", interval=interval):
+            for ticker in targets:
+                old, state = self.states.get(ticker), states[ticker]
+                if old == state:
+                    continue
+                start = None
+                grew = old is not None and old[0] == state[0] and old[1] <= state[1]
+                if grew and last_rows[ticker] >= 0:
+                    # Only newer bars (and a possibly revised last bar) to read.
+                    start = pd.Timestamp(self.dates[last_rows[ticker]], tz="UTC")
+                    appended.append(ticker)
+                else:
+                    reloaded.append(ticker)
+                df = store.read(ticker, interval, start=start, columns=["Close", "Volume"])
+                frames[ticker] = df
+                self.states[ticker] = state
+
+        removed = [t for t in self.tickers if t not in set(targets)]
+        if frames or removed:
+            with span("panel_merge", tickers=len(frames)):
+                self._merge(frames, reloaded, removed)
+        return {"appended": appended, "reloaded": reloaded, "removed": removed}
+
+    def _merge(self, frames, reloaded, removed):
+        index = pd.DatetimeIndex(self.dates)
+        close = pd.DataFrame(self.close, index=index, columns=self.tickers)
+        volume = pd.DataFrame(self.volume, index=index, columns=self.tickers)
+        close, volume = close.drop(columns=removed), volume.drop(columns=removed)
+        for ticker in removed:
+            self.states.pop(ticker, None)
+            self.zones.pop(ticker, None)
+        stale = [t for t in reloaded if t in close.columns]
+        close[stale] = np.nan
+        volume[stale] = np.nan
+
+        new_close, new_volume = {}, {}
+        for ticker, df in frames.items():
+            tz = getattr(df["Date"].dtype, "tz", None)
+            if ticker in reloaded or ticker not in self.zones:
+                # Appended bars keep the timezone the whole series was read in.
+                self.zones[ticker] = None if tz is None else str(tz)
+            dates = pd.DatetimeIndex(_naive_utc(df["Date"]))
+            keep = ~dates.duplicated(keep="last")
+            new_close[ticker] = pd.Series(df["Close"].to_numpy(np.float64)[keep], dates[keep])
+            new_volume[ticker] = pd.Series(
+                df["Volume"].to_numpy(np.float64)[keep], dates[keep]
+            )
+        new_close, new_volume = pd.DataFrame(new_close), pd.DataFrame(new_volume)
+
+        index = close.index.union(new_close.index)
+        columns = [*close.columns, *[t for t in new_close.columns if t not in close.columns]]
+        close = close.reindex(index=index, columns=columns)
+        volume = volume.reindex(index=index, columns=columns)
+        close.update(new_close)
+        volume.update(new_volume)
+
+        bars = close.notna().any(axis=1).to_numpy()
+        self.dates = index.to_numpy()[bars]
+        self.tickers = columns
+        self.close = np.ascontiguousarray(close.to_numpy(np.float64)[bars])
+        self.volume = np.ascontiguousarray(volume.to_numpy(np.float64)[bars])
+
+
+def right_align(values):
+    """
+    Move every column's NaN to the top, keeping the order of its values, so the last row
+    holds each ticker's latest value and row shifts count each ticker's own bars
+    """
+    order = np.argsort(~np.isnan(values), axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0)
+
+
+def screen_djia_weakness(panel, roc_length=13, threshold=-15):
+    """ROC of the latest bar of every ticker and its `ROC < threshold` signal"""
+    close = right_align(panel.close)
+    previous = np.full_like(close, np.nan)
+    previous[roc_length:] = close[:-roc_length] if roc_length else close
+    with np.errstate(invalid="ignore", divide="ignore"):
+        roc = 100 * (close - previous) / previous
+        return roc[-1], roc[-1] < threshold
+
+
+def _weekday_averages(close, weekdays, include):
+    """(7 x tickers) average close of each weekday over the rows where `include` is True"""
+    total = np.empty((7, close.shape[1]))
+    count = np.empty((7, close.shape[1]))
+    for weekday in range(7):
+        rows = include & (weekdays == weekday)
+        total[weekday] = np.where(rows, close, 0.0).sum(axis=0)
+        count[weekday] = rows.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _trailing(include, weekdays, window):
+    """Restrict `include` to the last `window` included rows of each weekday per column"""
+    for weekday in range(7):
+        rows = include & (weekdays == weekday)
+        from_end = np.cumsum(rows[::-1], axis=0)[::-1]
+        include = include & ~(rows & (from_end > window))
+    return include
+
+
+def screen_weekly_average_buy(panel, threshold_pct=None, expanding=False, window=None):
+    """PctDiff of the latest bar of every ticker against its weekday average, and the signal"""
+    if window is not None and window < 1:
+        raise ValueError("window must be a positive number of bars.")
+    close = panel.close
+    valid = ~np.isnan(close)
+    # Dates x tickers weekdays (Monday=0), each ticker's in its own timezone
+    days = panel.local_dates().astype("datetime64[D]").astype(np.int64)
+    weekdays = ((days + 3) % 7).astype(int)
+    last = panel.last_rows()
+    include = valid
+    if expanding:
+        # Point-in-time: only the bars before each ticker's latest bar count, optionally
+        # only the last `window` of each weekday.
+        include = valid & (np.arange(len(close))[:, None] < last[None, :])
+        if window is not None:
+            include = _trailing(include, weekdays, window)
+
+    averages = _weekday_averages(close, weekdays, include)
+    columns = np.arange(close.shape[1])
+    latest_weekday = weekdays[np.clip(last, 0, None), columns]
+    latest_close = close[np.clip(last, 0, None), columns]
+    historical = averages[latest_weekday, columns]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct_diff = np.where(last >= 0, 100 * (latest_close - historical) / historical, np.nan)
+        if threshold_pct is not None:
+            return pct_diff, pct_diff < threshold_pct
+    # Cheapest weekday per ticker; ties go to the earliest weekday like Series.idxmin.
+    seen = ~np.isnan(averages)
+    best_day = np.where(
+        seen.any(axis=0), np.argmin(np.where(seen, averages, np.inf), axis=0), -1
+    )
+    return pct_diff, (last >= 0) & (latest_weekday == best_day)
+
+
+def screen_presidential_cycles(panel):
+    """Cycle position of the year of every ticker's latest bar and its signal"""
+    last = panel.last_rows()
+    dates = panel.local_dates()[np.clip(last, 0, None), np.arange(len(panel.tickers))]
+    years = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+    cycle_position = (years % 4).astype(np.float64)
+    return np.where(last >= 0, cycle_position, np.nan), (last >= 0) & np.isin(
+        cycle_position, (0, 1, 3)
+    )
+
+
+SCREENS = {
+    "djia_weakness": {"function": screen_djia_weakness, "value": "ROC"},
+    "weekly_average_buy": {"function": screen_weekly_average_buy, "value": "PctDiff"},
+    "presidential_cycles": {"function": screen_presidential_cycles, "value": "CyclePosition"},
+}
+
+
+def screen(panel, keys, params=None, latest_only=True, min_volume=None):
+    """
+    Evaluate screens on the panel and return the signalling tickers.
+
+    Parameters:
+      keys (list): INDICATORS keys with an entry in SCREENS
+      params (dict): {key: constructor parameters of the indicator class}
+      latest_only (bool): only tickers with a bar on the panel's last date
+      min_volume (float): only tickers whose latest bar traded at least this volume
+
+    Returns a DataFrame with one row per (indicator, signalling ticker): the latest bar's
+    Date, Close, Volume, the indicator value and the ticker's rank, best first.
+    """
+    unknown = [k for k in keys if k not in SCREENS]
+    if unknown:
+        raise ValueError(f"No screen available for: {', '.join(unknown)}")
+    if not len(panel.dates):
+        return pd.DataFrame()
+
+    last = panel.last_rows()
+    has_bar = last >= 0
+    rows = np.clip(last, 0, None)
+    columns = np.arange(len(panel.tickers))
+    latest_volume = panel.volume[rows, columns]
+    eligible = has_bar.copy()
+    if latest_only:
+        eligible &= last == len(panel.dates) - 1
+    if min_volume is not None:
+        eligible &= latest_volume >= min_volume
+
+    frames = []
+    for key in keys:
+        # Validate the parameters against the indicator's own constructor.
+        kwargs = constructor_params(INDICATORS[key]["class"], (params or {}).get(key))
+        with span("screen", indicator=key, tickers=len(panel.tickers)):
+            values, signals = SCREENS[key]["function"](panel, **kwargs)
+        hits = np.flatnonzero(signals & eligible)
+        frame = pd.DataFrame(
+            {
+                "Indicator": key,
+                "Ticker": np.array(panel.tickers, dtype=object)[hits],
+                "Date": panel.dates[rows[hits]],
+                "Close": panel.close[rows[hits], hits],
+                "Volume": latest_volume[hits],
+                "Value": values[hits],
+            }
+        ).sort_values(["Value", "Ticker"], kind="stable")
+        frame.insert(1, "Rank", np.arange(1, len(frame) + 1))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def panel_path(store, interval, panel_dir=DEFAULT_PANEL_DIR):
+    return Path(panel_dir) / f"{store.name}_{interval}.npz"
+
+
+def main(argv=None):
+    from storage import get_store
+
+    parser = argparse.ArgumentParser(description="Screen the universe for indicator signals")
+    parser.add_argument(
+        "--indicators", nargs="+", default=["djia_weakness", "weekly_average_buy"]
+    )
+    parser.add_argument("--tickers", nargs="+", help="defaults to every ticker with data")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--roc-length", type=int, default=13)
+    parser.add_argument("--threshold", type=float, default=-15, help="ROC threshold (%%)")
+    parser.add_argument("--threshold-pct", type=float, help="default: best-day mode")
+    parser.add_argument("--expanding", action="store_true", help="point-in-time averages")
+    parser.add_argument("--window", type=int, help="point-in-time window of weekday bars")
+    parser.add_argument("--min-volume", type=float)
+    parser.add_argument(
+        "--include-stale", action="store_true", help="also screen tickers without a last bar"
+    )
+    parser.add_argument("--panel-dir", default=DEFAULT_PANEL_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the saved panel")
+    parser.add_argument("--output", help="also write the signals to this CSV file")
+    args = add_arguments(parser).parse_args(argv)
+
+    params = {
+        "djia_weakness": {"roc_length": args.roc_length, "threshold": args.threshold},
+        "weekly_average_buy": {
+            "threshold_pct": args.threshold_pct,
+            "expanding": args.expanding,
+            "window": args.window,
+        },
+    }
+    store = get_store()
+    path = panel_path(store, args.interval, args.panel_dir)
+    with profiling(args, "screener"):
+        panel = Panel() if args.rebuild else Panel.load(path)
+        tickers = [t.upper() for t in args.tickers] if args.tickers else None
+        changes = panel.update(store, args.interval, tickers)
+        panel.save(path)
+        results = screen(
+            panel,
+            args.indicators,
+            params,
+            latest_only=not args.include_stale,
+            min_volume=args.min_volume,
+        )
+
+    print(
+        f"Panel: {len(panel.dates)} bars x {len(panel.tickers)} tickers "
+        f"({len(changes['appended'])} updated, {len(changes['reloaded'])} loaded)"
+    )
+    if results.empty:
+        print("No signals.")
+    else:
+        print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
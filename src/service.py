@@ -0,0 +1,584 @@
+# src/service.py
+"""
+Resident query service: stored bars and indicator results kept in memory behind a local
+HTTP API.
+
+The service loads series once (on start-up, or on their first request) and answers
+every query from memory, so a question no longer costs a process start and a CSV parse:
+
+  GET /health                                   status, uptime and request count
+  GET /stats                                    cache size, hits, misses, evictions
+  GET /tickers?interval=1d                      tickers with bars / indicator results
+  GET /series/AAPL?interval=1d&start=2024-01-01&end=2024-06-30&columns=Close,Volume
+  GET /indicators/AAPL?keys=rsi,macd&columns=Signal&start=2024-01-01
+  GET /signals?indicators=rsi&tickers=AAPL,MSFT&all=1
+                                                latest signal of every ticker/indicator
+                                                (only the buying ones without all=1)
+
+Responses are JSON; frames are encoded by column: "data": {"Date": [...], "Close": [...]}.
+
+Resident series are evicted least recently used first once they exceed the cache size
+and reloaded on their next request; the last row of every series loaded so far is kept,
+so /signals stays cheap with a cache smaller than the results. A background task checks
+the resident series every few seconds (the catalog state of the bars, the size and mtime
+of indicator files) and reloads the ones that changed, serving the previous version until
+the new one is ready; a failed check is reported on stderr and retried at the next poll.
+Loads run in worker threads and concurrent requests for the same series share one load,
+so the event loop only slices and encodes frames.
+
+Usage:
+  python src/service.py --port 8765
+  python src/load_test.py --clients 50 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+from catalog import CATALOG_NAME
+from indicator_store import DEFAULT_ROOT, IndicatorStore
+from instrumentation import add_arguments, profiling, span
+from resample import Pyramid
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_POLL_SECONDS = 2.0
+
+STATUS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+# Routes taking a ticker: /series/TICKER, /indicators/TICKER
+TICKER_ROUTES = {"series", "indicators"}
+
+
+def _entry(frame, version):
+    """
+    A resident series: the frame, the version it was read at, its memory size, its
+    columns as Series (sliced per request without building a frame) and its last row
+    """
+    return {
+        "frame": frame,
+        "version": version,
+        "bytes": int(frame.memory_usage(deep=True).sum()),
+        "columns": {c: frame[c] for c in frame.columns},
+        "last": frame.iloc[-1].to_dict() if len(frame) else None,
+    }
+
+
+def _bound(value, tz):
+    """A query date bound as a Timestamp comparable with 'Date' values in timezone `tz`"""
+    ts = pd.Timestamp(value)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert("UTC").tz_localize(None)
+    return ts
+
+
+def _rows(entry, start=None, end=None):
+    """Positions [first, last) of the rows within [start, end], by binary search"""
+    dates = entry["columns"]["Date"]
+    tz = getattr(dates.dtype, "tz", None)
+    first = 0 if start is None else dates.searchsorted(_bound(start, tz), side="left")
+    last = len(dates) if end is None else dates.searchsorted(_bound(end, tz), side="right")
+    return slice(first, max(first, last))
+
+
+def _column(entry, name, rows):
+    if name not in entry["columns"]:
+        raise KeyError(f"Unknown column {name!r}")
+    return entry["columns"][name].iloc[rows]
+
+
+def _encode(meta, columns=None):
+    """JSON body of `meta`, with {name: Series} `columns` under "data" when given"""
+    if columns is None:
+        return json.dumps(meta, default=str).encode()
+    # Column by column: far cheaper than encoding the rows of a frame with to_json.
+    data = ", ".join(
+        f"{json.dumps(c)}: {s.to_json(orient='values', date_format='iso', date_unit='s')}"
+        for c, s in columns.items()
+    )
+    return f'{json.dumps(meta, default=str)[:-1]}, "data": {{{data}}}}}'.encode()
+
+
+def _split(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+
+def _content_length(headers):
+    """Declared body length of a request (None when the header is not a valid length)"""
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+class ResidentCache:
+    """Frames held in memory, the least recently used evicted beyond `max_bytes`"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.reloads = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous["bytes"]
+            self.reloads += 1
+        self.entries[key] = entry
+        self.bytes += entry["bytes"]
+        # The newest entry stays even when it alone exceeds the budget.
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted["bytes"]
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry["bytes"]
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+        }
+
+
+class QueryService:
+    """
+    Bars of a store and indicator results of an IndicatorStore, resident in memory.
+
+    Cache keys are ("bars", ticker, interval) and ("indicator", ticker, interval, key).
+    """
+
+    def __init__(self, store, results, max_bytes=DEFAULT_MAX_BYTES, poll=DEFAULT_POLL_SECONDS):
+        self.store = store
+        self.results = results
+        self.pyramid = Pyramid(store)
+        self.cache = ResidentCache(max_bytes)
+        self.poll = poll
+        self.watcher = None
+        self.loading = {}  # key -> task, shared by every request waiting for that series
+        # key -> (version, last row): kept after eviction, so /signals never reloads
+        self.latest = {}
+        self.listings = {}  # ("bars" | "indicators", interval) -> tickers, per poll
+        self.catalog_mtime = None
+        self.started = time.time()
+        self.requests = 0
+        self.routes = {
+            "health": self.health,
+            "stats": self.stats,
+            "tickers": self.tickers,
+            "series": self.series,
+            "indicators": self.indicators,
+            "signals": self.signals,
+        }
+
+    # Loading (worker threads)
+
+    def _bars_version(self, ticker, interval):
+        """State of the stored series the bars are read or derived from"""
+        catalog, backend = self.store.catalog, self.store.name
+        derived = catalog.derived(backend, ticker)
+        source = interval
+        if not self.store.exists(ticker, interval):
+            source = self.pyramid.source(ticker, interval)
+        while source in derived:
+            source = derived[source]["source_interval"]
+        if source is None:
+            raise FileNotFoundError(f"No data found for {ticker} ({interval})")
+        return source, catalog.state(backend, ticker, source)
+
+    def _indicator_version(self, ticker, interval, key):
+        path = self.results.path(ticker, key, interval)
+        if not path.exists():
+            raise FileNotFoundError(f"No {key} results found for {ticker} ({interval})")
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _version(self, key):
+        kind, ticker, interval, *rest = key
+        if kind == "bars":
+            return self._bars_version(ticker, interval)
+        return self._indicator_version(ticker, interval, *rest)
+
+    def _load(self, key):
+        kind, ticker, interval, *rest = key
+        with span("service_load", kind=kind, ticker=ticker, interval=interval):
+            # The version is taken first: a change during the read shows up as stale.
+            version = self._version(key)
+            if kind == "bars":
+                frame = self.pyramid.read(ticker, interval)
+            else:
+                frame = self.results.read(ticker, rest, interval)
+        return _entry(frame, version)
+
+    def _stale(self, resident, check_bars):
+        """Keys among the (key, version) pairs whose files changed (None when removed)"""
+        stale = {}
+        for key, version in resident:
+            if key[0] == "bars" and not check_bars:
+                continue
+            try:
+                current = self._version(key)
+            except FileNotFoundError:
+                current = None
+            if current != version:
+                stale[key] = current
+        return stale
+
+    def _catalog_mtime(self):
+        """Modification times of the catalog database and its write-ahead log"""
+        path = self.store.root / CATALOG_NAME
+        wal = path.with_name(path.name + "-wal")
+        return tuple(p.stat().st_mtime_ns if p.exists() else None for p in (path, wal))
+
+    # Event loop
+
+    async def entry(self, key):
+        """The resident entry of a series, loading it once however many requests wait"""
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        return await asyncio.shield(self._start_load(key))
+
+    def _start_load(self, key):
+        task = self.loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(self._load, key))
+            self.loading[key] = task
+            task.add_done_callback(lambda t, key=key: self._loaded(key, t))
+        return task
+
+    def _loaded(self, key, task):
+        self.loading.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            entry = task.result()
+            self.cache.put(key, entry)
+            self.latest[key] = entry["version"], entry["last"]
+
+    async def entries(self, keys):
+        """Entries of many series, with the exception in place of those that failed"""
+        entries = [self.cache.get(key) for key in keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        loaded = await asyncio.gather(
+            *(asyncio.shield(self._start_load(keys[i])) for i in missing),
+            return_exceptions=True,
+        )
+        for i, entry in zip(missing, loaded):
+            entries[i] = entry
+        return entries
+
+    async def preload(self, intervals):
+        """Load every stored series and indicator result of `intervals` (cache permitting)"""
+        keys = []
+        for interval in intervals:
+            keys += [("bars", t, interval) for t in await self.listing("bars", interval)]
+            for ticker, indicators in (await self.listing("indicators", interval)).items():
+                keys += [("indicator", ticker, interval, key) for key in indicators]
+        entries = await self.entries(keys)
+        return sum(not isinstance(entry, Exception) for entry in entries)
+
+    async def listing(self, kind, interval):
+        """
+        Tickers with bars of an interval ("bars"), or {ticker: indicator keys} of the
+        results ("indicators"); listed once per poll.
+        """
+        if (kind, interval) not in self.listings:
+            list_ = self.pyramid.tickers if kind == "bars" else self.results.listing
+            self.listings[kind, interval] = await asyncio.to_thread(list_, interval)
+        return self.listings[kind, interval]
+
+    async def watch(self):
+        """
+        Reload the resident series whose files changed, every `poll` seconds.
+
+        A failed poll (e.g. the catalog locked by a writer) is reported and retried at the
+        next one, so the service never silently stops refreshing.
+        """
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                await self._poll()
+            except Exception as e:
+                print(f"❌ Watch failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    def start_watch(self):
+        """Run `watch` in the background, restarted if it ever ends on an error"""
+        self.watcher = asyncio.ensure_future(self.watch())
+        self.watcher.add_done_callback(self._watch_done)
+        return self.watcher
+
+    def _watch_done(self, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        print(
+            f"❌ Watcher stopped ({type(error).__name__}: {error}), restarting",
+            file=sys.stderr,
+        )
+        self.start_watch()
+
+    async def _poll(self):
+        self.listings.clear()
+        catalog_mtime = await asyncio.to_thread(self._catalog_mtime)
+        check_bars = catalog_mtime != self.catalog_mtime
+        known = {key: version for key, (version, _) in self.latest.items()}
+        known.update((key, entry["version"]) for key, entry in self.cache.entries.items())
+        stale = await asyncio.to_thread(self._stale, list(known.items()), check_bars)
+        # Only remembered once the bars were checked, so a failed poll checks them again.
+        self.catalog_mtime = catalog_mtime
+        for key, current in stale.items():
+            if current is None or key not in self.cache.entries:
+                self.cache.discard(key)
+                self.latest.pop(key, None)
+            else:
+                # Requests keep getting the previous version until the load is done.
+                self._start_load(key)
+
+    # Routes: each takes (path arguments, query) and returns (status, body)
+
+    async def health(self, args, query):
+        uptime = round(time.time() - self.started, 1)
+        return 200, _encode({"status": "ok", "uptime": uptime, "requests": self.requests})
+
+    async def stats(self, args, query):
+        return 200, _encode({**self.cache.stats(), "loading": len(self.loading)})
+
+    async def tickers(self, args, query):
+        interval = query.get("interval", "1d")
+        bars, indicators = await asyncio.gather(
+            self.listing("bars", interval), self.listing("indicators", interval)
+        )
+        meta = {"interval": interval, "bars": bars, "indicators": list(indicators)}
+        return 200, _encode(meta)
+
+    async def series(self, args, query):
+        ticker, interval = args[0].upper(), query.get("interval", "1d")
+        entry = await self.entry(("bars", ticker, interval))
+        rows = _rows(entry, query.get("start"), query.get("end"))
+        names = _split(query.get("columns"))
+        names = ["Date", *(c for c in names if c != "Date")] if names else entry["columns"]
+        columns = {c: _column(entry, c, rows) for c in names}
+        meta = {"ticker": ticker, "interval": interval, "rows": len(columns["Date"])}
+        return 200, _encode(meta, columns)
+
+    async def indicators(self, args, query):
+        ticker, interval = args[0].upper(), query.get("interval", "1d")
+        keys = _split(query.get("keys"))
+        if keys is None:
+            keys = (await self.listing("indicators", interval)).get(ticker)
+        if not keys:
+            raise FileNotFoundError(f"No indicator results found for {ticker} ({interval})")
+        entries = await self.entries([("indicator", ticker, interval, key) for key in keys])
+        names = _split(query.get("columns"))
+
+        dates, parts = None, []
+        for key, entry in zip(keys, entries):
+            if isinstance(entry, Exception):
+                raise entry
+            rows = _rows(entry, query.get("start"), query.get("end"))
+            selected = ["Date", *(f"{key}_{c}" for c in names)] if names else entry["columns"]
+            part = {c: _column(entry, c, rows) for c in selected}
+            dates = part["Date"] if dates is None else dates
+            parts.append(part)
+        if all(part["Date"].equals(dates) for part in parts):
+            # Indicators computed from the same bars share their dates: no join needed.
+            columns = {"Date": dates}
+            for part in parts:
+                columns.update((c, s) for c, s in part.items() if c != "Date")
+        else:
+            # Aligned on the union of their dates, as IndicatorStore.read does.
+            merged = pd.concat(
+                [pd.DataFrame(part).set_index("Date") for part in parts], axis=1
+            ).sort_index()
+            merged = merged.reset_index()
+            columns = {c: merged[c] for c in merged.columns}
+        meta = {
+            "ticker": ticker,
+            "interval": interval,
+            "indicators": keys,
+            "rows": len(columns["Date"]),
+        }
+        return 200, _encode(meta, columns)
+
+    async def signals(self, args, query):
+        interval = query.get("interval", "1d")
+        tickers = _split(query.get("tickers"))
+        tickers = [t.upper() for t in tickers] if tickers else None
+        keys = _split(query.get("indicators"))
+        everything = query.get("all") in ("1", "true", "yes")
+        listing = await self.listing("indicators", interval)
+        if keys is None:
+            pairs = [(t, k) for t in tickers or listing for k in listing.get(t, [])]
+        else:
+            pairs = [(t, k) for t in tickers or listing for k in keys]
+
+        keys = [("indicator", t, interval, k) for t, k in pairs]
+        missing = [key for key in keys if key not in self.latest]
+        for entry in await self.entries(missing):
+            if isinstance(entry, Exception) and not isinstance(entry, FileNotFoundError):
+                raise entry
+        signals = []
+        for (ticker, key), cache_key in zip(pairs, keys):
+            if cache_key not in self.latest:
+                continue  # No such results
+            last = self.latest[cache_key][1]
+            if last is None or f"{key}_Signal" not in last:
+                continue
+            signal = bool(last[f"{key}_Signal"])
+            if signal or everything:
+                close = last.get(f"{key}_Close")
+                signals.append(
+                    {
+                        "ticker": ticker,
+                        "indicator": key,
+                        "date": last["Date"].isoformat(),
+                        "signal": signal,
+                        "close": None if pd.isna(close) else float(close),
+                    }
+                )
+        return 200, _encode({"interval": interval, "count": len(signals), "signals": signals})
+
+    # HTTP
+
+    async def respond(self, method, target):
+        """(status, JSON body) of one request"""
+        if method != "GET":
+            return 405, _encode({"error": f"{method} not allowed"})
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        name = parts[0] if parts else "health"
+        route = self.routes.get(name)
+        if route is None or len(parts) != (2 if name in TICKER_ROUTES else 1) and parts:
+            return 404, _encode({"error": f"Unknown path {url.path}"})
+        try:
+            return await route(parts[1:], query)
+        except FileNotFoundError as e:
+            return 404, _encode({"error": str(e)})
+        except (KeyError, ValueError) as e:
+            return 400, _encode({"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            return 500, _encode({"error": f"{type(e).__name__}: {e}"})
+
+    async def answer(self, line, length):
+        """(status, JSON body, HTTP version) of a request line and its Content-Length"""
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            return 400, _encode({"error": "Bad request line"}), ""
+        if length is None:
+            return 400, _encode({"error": "Bad Content-Length"}), version
+        self.requests += 1
+        return (*await self.respond(method, target), version)
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection (kept alive unless the client closes)"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                headers = {}
+                while (header := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = _content_length(headers)
+                if length:
+                    await reader.readexactly(length)
+                status, body, version = await self.answer(line, length)
+                connection = headers.get("connection", "").lower()
+                # Without a valid length the next request can't be found: close.
+                keep_alive = length is not None and (
+                    connection == "keep-alive"
+                    or (version == "HTTP/1.1" and connection != "close")
+                )
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, preload=("1d",)):
+    if preload:
+        started = time.perf_counter()
+        loaded = await service.preload(preload)
+        print(
+            f"Loaded {loaded} series ({service.cache.bytes / 2**20:.1f} MB) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+    server = await asyncio.start_server(service.handle, host, port, backlog=1024)
+    service.start_watch()
+    print(f"Serving on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.watcher.cancel()
+
+
+def main(argv=None):
+    from storage import get_store
+
+    parser = argparse.ArgumentParser(description="Serve stored bars and indicator results")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--results-dir", default=DEFAULT_ROOT)
+    parser.add_argument("--preload", nargs="*", default=["1d"], help="intervals to load")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // 2**20)
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, help="seconds")
+    args = add_arguments(parser).parse_args(argv)
+
+    service = QueryService(
+        get_store(), IndicatorStore(Path(args.results_dir)), args.cache_size * 2**20, args.poll
+    )
+    with profiling(args, "service"):
+        try:
+            asyncio.run(serve(service, args.host, args.port, args.preload))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,560 @@
+# src/simulator.py
+"""
+Event-driven paper-trading simulator.
+
+Stored bars of any interval (see get_stock_data.py) are replayed in time order across
+tickers. On every bar the pending orders of its ticker are matched against the bar's
+OHLC, the portfolio is marked to the close, then the strategy sees the bar and may
+place orders, which can fill from the next bar of that ticker onwards:
+
+  - market orders fill at the next open
+  - limit orders fill when the bar trades through the limit: a buy limit when the low
+    reaches it, a sell limit when the high does, at the limit or at a better open
+  - stop orders trigger when the bar trades through the stop (a buy stop on the high, a
+    sell stop on the low) and fill at the stop or at a worse open (gaps)
+  - stop-loss / take-profit: a filled buy with `stop_loss` / `take_profit` (fractions of
+    the fill price) places a one-cancels-the-other pair of sell stop and sell limit
+
+Pending orders sit in four priority queues per ticker (heapq), ordered by the price at
+which they trigger, so a bar only looks at the orders it actually triggers. When several
+orders trigger on the same bar they fill in the order the prices were reached along the
+assumed path inside the bar: open, low, high, close on an up bar and open, high, low,
+close otherwise. Market and stop fills pay `slippage_bps`, every fill pays
+`commission_bps`. The account is long-only and cash-only: buys are cut to the shares the
+cash can pay for and sells to the shares held.
+
+Strategies implement `on_bar(sim, k, i)` (and optionally `on_start(sim)` and
+`on_fill(sim, order, fill)`), where `k` indexes `sim.tickers` and `i` is the row of the
+bar in that ticker's arrays (`sim.open[k][i]`, `sim.close[k][i]`, ...).
+`SignalStrategy` buys on the signals of a registered indicator.
+
+Usage:
+  python src/simulator.py AAPL MSFT --interval 1m --indicator rsi --stop-loss 0.02 \\
+      --take-profit 0.04 --allocation 0.1
+"""
+import argparse
+import heapq
+import json
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from instrumentation import add_arguments, profiling, span
+
+MARKET, LIMIT, STOP = "market", "limit", "stop"
+BUY, SELL = 1, -1
+OPEN, FILLED, CANCELLED, REJECTED = "open", "filled", "cancelled", "rejected"
+
+
+class Order:
+    """An order of `qty` shares; `side` is BUY or SELL"""
+
+    __slots__ = (
+        "id",
+        "ticker",
+        "side",
+        "qty",
+        "type",
+        "price",
+        "stop_loss",
+        "take_profit",
+        "tag",
+        "status",
+        "oco",
+    )
+
+    def __init__(self, id, ticker, side, qty, type, price, stop_loss, take_profit, tag):
+        self.id = id
+        self.ticker = ticker
+        self.side = side
+        self.qty = qty
+        self.type = type
+        self.price = price
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.tag = tag
+        self.status = OPEN
+        self.oco = None  # The other order of a stop-loss / take-profit pair
+
+    def __repr__(self):
+        side = "buy" if self.side == BUY else "sell"
+        price = "" if self.price is None else f" @ {self.price:.4f}"
+        return f"Order({self.id}, {side} {self.qty} {self.type}{price}, {self.status})"
+
+
+class _Book:
+    """Pending orders of one ticker, each queue keyed so its head triggers first"""
+
+    __slots__ = ("market", "buy_limits", "sell_limits", "buy_stops", "sell_stops", "orders")
+
+    def __init__(self):
+        self.market = []
+        self.buy_limits = []  # (-limit, id, order): highest limit first
+        self.sell_limits = []  # (limit, id, order): lowest limit first
+        self.buy_stops = []  # (stop, id, order): lowest stop first
+        self.sell_stops = []  # (-stop, id, order): highest stop first
+        self.orders = []  # Every order placed since the ticker was last flattened
+
+    def __bool__(self):
+        return bool(
+            self.market
+            or self.buy_limits
+            or self.sell_limits
+            or self.buy_stops
+            or self.sell_stops
+        )
+
+
+def _touch(price, open_, high, low, close):
+    """Distance travelled along the assumed path inside a bar until `price` is reached"""
+    first = low if close >= open_ else high
+    if min(open_, first) <= price <= max(open_, first):
+        return abs(open_ - price)
+    return abs(open_ - first) + abs(first - price)
+
+
+def _event_times(dates):
+    """'Date' values as int64 nanoseconds comparable across tickers (UTC when tz-aware)"""
+    dates = pd.Series(dates)
+    if getattr(dates.dtype, "tz", None) is not None:
+        dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+    return dates.to_numpy().astype("datetime64[ns]").astype(np.int64)
+
+
+class Simulator:
+    """Replay bars of several tickers against a strategy's orders"""
+
+    def __init__(self, bars, cash=10_000.0, commission_bps=0.0, slippage_bps=0.0):
+        """
+        Parameters:
+          bars (dict): {ticker: DataFrame with 'Date', 'Open', 'High', 'Low', 'Close'},
+                       each sorted by date
+        """
+        self.tickers = list(bars)
+        self.frames = [bars[t] for t in self.tickers]
+        # Python lists: indexing them in the event loop is much cheaper than NumPy's.
+        self.open, self.high, self.low, self.close = (
+            [df[column].to_numpy(np.float64).tolist() for df in self.frames]
+            for column in ("Open", "High", "Low", "Close")
+        )
+        self.initial_cash = float(cash)
+        self.commission = commission_bps / 10_000
+        self.slippage = slippage_bps / 10_000
+
+    def reset(self):
+        n = len(self.tickers)
+        self.cash = self.initial_cash
+        self.market_value = 0.0
+        self.positions = [0] * n
+        self.marks = [0.0] * n  # Price the position is currently valued at
+        self.costs = [0.0] * n  # Cost of the open position, commissions included
+        self.books = [_Book() for _ in range(n)]
+        self.fills = []
+        self.trades = []
+        self.entry_times = [None] * n
+        self.now = None
+        self.next_id = 0
+        self.events = 0
+
+    @property
+    def equity(self):
+        return self.cash + self.market_value
+
+    # Orders
+
+    def submit(
+        self,
+        k,
+        side,
+        qty,
+        type=MARKET,
+        price=None,
+        stop_loss=None,
+        take_profit=None,
+        tag=None,
+    ):
+        """Place an order for ticker `k`; returns the Order"""
+        if type != MARKET and price is None:
+            raise ValueError(f"A {type} order needs a price")
+        if type not in (MARKET, LIMIT, STOP):
+            raise ValueError(f"Unknown order type {type!r}")
+        self.next_id += 1
+        order = Order(
+            self.next_id,
+            k,
+            side,
+            int(qty),
+            type,
+            price,
+            stop_loss,
+            take_profit,
+            tag,
+        )
+        book = self.books[k]
+        book.orders.append(order)
+        if type == MARKET:
+            book.market.append(order)
+        elif type == LIMIT:
+            if side == BUY:
+                heapq.heappush(book.buy_limits, (-price, order.id, order))
+            else:
+                heapq.heappush(book.sell_limits, (price, order.id, order))
+        elif side == BUY:
+            heapq.heappush(book.buy_stops, (price, order.id, order))
+        else:
+            heapq.heappush(book.sell_stops, (-price, order.id, order))
+        self.events += 1
+        return order
+
+    def buy(self, k, qty, type=MARKET, price=None, **kwargs):
+        return self.submit(k, BUY, qty, type, price, **kwargs)
+
+    def sell(self, k, qty, type=MARKET, price=None, **kwargs):
+        return self.submit(k, SELL, qty, type, price, **kwargs)
+
+    def cancel(self, order):
+        """Cancel an open order (dropped from its queue once it reaches the head)"""
+        if order.status == OPEN:
+            order.status = CANCELLED
+            self.events += 1
+
+    def flatten(self, k, tag="exit"):
+        """Cancel every open order of ticker `k` and sell its position at the next open"""
+        book = self.books[k]
+        for order in book.orders:
+            self.cancel(order)
+        self.books[k] = _Book()
+        if self.positions[k]:
+            return self.sell(k, self.positions[k], tag=tag)
+        return None
+
+    # Matching
+
+    def _match(self, k, open_, high, low, close):
+        """Fill the orders of ticker `k` triggered by a bar, in the order they trigger"""
+        book = self.books[k]
+        # (distance along the bar's path, order id, order, fill price)
+        triggered = []
+        if book.market:
+            triggered = [(0.0, order.id, order, open_) for order in book.market]
+            book.market.clear()
+        # Heads trigger while their key is within the bar: limit >= low for buy limits,
+        # limit <= high for sell limits, stop <= high for buy stops, stop >= low for sell
+        # stops. Limits fill at a better open, stops at a worse one.
+        for queue, bound, pick in (
+            (book.buy_limits, -low, min),
+            (book.sell_limits, high, max),
+            (book.buy_stops, high, max),
+            (book.sell_stops, -low, min),
+        ):
+            while queue and queue[0][0] <= bound:
+                order = heapq.heappop(queue)[2]
+                price = pick(open_, order.price)
+                triggered.append(
+                    (_touch(price, open_, high, low, close), order.id, order, price)
+                )
+        if not triggered:
+            return
+        if len(triggered) > 1:
+            triggered.sort()
+        # Orders placed by these fills (stop-loss / take-profit) wait for the next bar.
+        for _, _, order, price in triggered:
+            if order.status == OPEN:
+                self._fill(order, price)
+        book.orders = [order for order in book.orders if order.status == OPEN]
+        # Cancelled orders are dropped once they reach the head of their queue.
+        for queue in (book.buy_limits, book.sell_limits, book.buy_stops, book.sell_stops):
+            while queue and queue[0][2].status != OPEN:
+                heapq.heappop(queue)
+
+    def _fill(self, order, price):
+        k, side = order.ticker, order.side
+        if order.type != LIMIT:
+            price *= 1 + side * self.slippage
+        held = self.positions[k]
+        if side == BUY:
+            qty = min(order.qty, math.floor(self.cash / (price * (1 + self.commission))))
+        else:
+            qty = min(order.qty, held)
+        if qty <= 0:
+            order.status = REJECTED
+            self.events += 1
+            if order.oco is not None:
+                self.cancel(order.oco)
+            return
+
+        fee = qty * price * self.commission
+        self.cash -= side * qty * price + fee
+        # Revalue the position at the fill price, then add or remove the shares.
+        self.market_value += held * (price - self.marks[k]) + side * qty * price
+        self.marks[k] = price
+        self.positions[k] = held + side * qty
+        order.status = FILLED
+        fill = (self.now, self.tickers[k], side, qty, price, fee, order.type, order.tag)
+        self.fills.append(fill)
+        self.events += 1
+
+        if side == BUY:
+            if not held:
+                self.entry_times[k] = self.now
+            self.costs[k] += qty * price + fee
+        else:
+            cost = self.costs[k] * qty / held
+            self.costs[k] -= cost
+            proceeds = qty * price - fee
+            self.trades.append(
+                (
+                    self.tickers[k],
+                    self.entry_times[k],
+                    self.now,
+                    qty,
+                    proceeds - cost,
+                    proceeds / cost - 1,
+                )
+            )
+        if order.oco is not None:
+            self.cancel(order.oco)
+        if side == BUY and (order.stop_loss or order.take_profit):
+            self._bracket(k, qty, price, order)
+        if self.on_fill is not None:
+            self.on_fill(self, order, fill)
+
+    def _bracket(self, k, qty, price, entry):
+        """Place the stop-loss / take-profit sells of a filled buy as an OCO pair"""
+        orders = []
+        if entry.stop_loss:
+            stop = price * (1 - entry.stop_loss)
+            orders.append(self.sell(k, qty, STOP, stop, tag="stop_loss"))
+        if entry.take_profit:
+            limit = price * (1 + entry.take_profit)
+            orders.append(self.sell(k, qty, LIMIT, limit, tag="take_profit"))
+        if len(orders) == 2:
+            orders[0].oco, orders[1].oco = orders[1], orders[0]
+
+    # Replay
+
+    def run(self, strategy):
+        """
+        Replay every bar against `strategy`.
+
+        Returns a dict with the 'fills', closed 'trades' and 'equity' (by timestamp) and
+        the summary 'metrics', including events (bars, orders, fills, cancellations) per
+        second.
+        """
+        self.reset()
+        self.on_fill = getattr(strategy, "on_fill", None)
+        with span("simulate_setup", tickers=len(self.tickers)):
+            times = [_event_times(df["Date"]) for df in self.frames]
+            lengths = [len(t) for t in times]
+            all_times = np.concatenate(times) if times else np.empty(0, np.int64)
+            codes = np.repeat(np.arange(len(times)), lengths)
+            rows = np.concatenate([np.arange(n) for n in lengths]) if times else codes
+            order = np.lexsort((codes, all_times))
+            stamps, slots = np.unique(all_times[order], return_inverse=True)
+            codes, rows, slots = codes[order].tolist(), rows[order].tolist(), slots.tolist()
+        equity = np.empty(len(stamps))
+
+        if hasattr(strategy, "on_start"):
+            strategy.on_start(self)
+        on_bar = strategy.on_bar
+        opens, highs, lows, closes = self.open, self.high, self.low, self.close
+        books, positions, marks = self.books, self.positions, self.marks
+        started = time.perf_counter()
+        with span("simulate", tickers=len(self.tickers), bars=len(codes)):
+            for k, i, slot in zip(codes, rows, slots):
+                self.now = stamps[slot]
+                c = closes[k][i]
+                if books[k]:
+                    self._match(k, opens[k][i], highs[k][i], lows[k][i], c)
+                if positions[k]:
+                    self.market_value += positions[k] * (c - marks[k])
+                marks[k] = c
+                on_bar(self, k, i)
+                equity[slot] = self.cash + self.market_value
+        elapsed = time.perf_counter() - started
+        return self._results(stamps, equity, len(codes), elapsed)
+
+    def _results(self, stamps, equity, bars, elapsed):
+        index = pd.DatetimeIndex(stamps.astype("datetime64[ns]"), name="Date")
+        fills = pd.DataFrame(
+            self.fills,
+            columns=["Date", "Ticker", "Side", "Qty", "Price", "Commission", "Type", "Tag"],
+        )
+        fills["Date"] = pd.to_datetime(fills["Date"])
+        fills["Side"] = np.where(fills["Side"] == BUY, "buy", "sell")
+        trades = pd.DataFrame(
+            self.trades, columns=["Ticker", "Entry", "Exit", "Qty", "PnL", "Return"]
+        )
+        for column in ("Entry", "Exit"):
+            trades[column] = pd.to_datetime(trades[column])
+
+        events = bars + self.events
+        final = equity[-1] if len(equity) else self.initial_cash
+        peaks = np.maximum.accumulate(equity) if len(equity) else equity
+        metrics = {
+            "initial_cash": self.initial_cash,
+            "final_equity": float(final),
+            "return": float(final / self.initial_cash - 1),
+            "max_drawdown": float((equity / peaks - 1).min()) if len(equity) else 0.0,
+            "fills": len(fills),
+            "trades": len(trades),
+            "hit_rate": float((trades["PnL"] > 0).mean()) if len(trades) else 0.0,
+            "open_positions": sum(1 for qty in self.positions if qty),
+            "bars": bars,
+            "events": events,
+            "seconds": round(elapsed, 3),
+            "events_per_second": round(events / elapsed) if elapsed > 0 else None,
+        }
+        return {
+            "fills": fills,
+            "trades": trades,
+            "equity": pd.Series(equity, index=index, name="Equity"),
+            "metrics": metrics,
+        }
+
+
+class SignalStrategy:
+    """
+    Buy a ticker when its signal is on and nothing is held or pending for it.
+
+    Each entry buys `allocation` of the current equity (by the signal bar's close), with
+    a market order or a limit order `limit_offset` below the close that is cancelled
+    when unfilled after `entry_bars` bars. Exits come from the stop-loss / take-profit
+    pair and, with `hold_bars`, from a market sell that many bars after the entry.
+    """
+
+    def __init__(
+        self,
+        signals,
+        allocation=0.1,
+        stop_loss=None,
+        take_profit=None,
+        hold_bars=None,
+        limit_offset=None,
+        entry_bars=1,
+    ):
+        """
+        Parameters:
+          signals (list): per ticker of the simulator, a boolean sequence over its bars
+        """
+        self.signals = [np.asarray(s, dtype=bool).tolist() for s in signals]
+        self.allocation = allocation
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.hold_bars = hold_bars
+        self.limit_offset = limit_offset
+        self.entry_bars = entry_bars
+
+    def on_start(self, sim):
+        n = len(sim.tickers)
+        self.pending = [None] * n  # (entry order, bar it was placed on)
+        self.entered = [None] * n  # Bar of the first fill of the held position
+        self.exiting = [False] * n
+
+    def on_bar(self, sim, k, i):
+        if sim.positions[k]:
+            if self.entered[k] is None:
+                self.entered[k] = i  # Orders fill before the strategy sees the bar
+                self.pending[k] = None
+            elif (
+                self.hold_bars
+                and not self.exiting[k]
+                and i - self.entered[k] >= self.hold_bars
+            ):
+                sim.flatten(k, tag="hold")
+                self.exiting[k] = True
+            return
+        if self.entered[k] is not None:
+            self.entered[k], self.exiting[k] = None, False
+
+        pending = self.pending[k]
+        if pending is not None:
+            order, placed = pending
+            if order.status == OPEN and i - placed < self.entry_bars:
+                return
+            sim.cancel(order)
+            self.pending[k] = None
+        if not self.signals[k][i]:
+            return
+
+        close = sim.close[k][i]
+        qty = int(sim.equity * self.allocation // close)
+        if qty <= 0:
+            return
+        if self.limit_offset is None:
+            order = sim.buy(k, qty, stop_loss=self.stop_loss, take_profit=self.take_profit)
+        else:
+            price = close * (1 - self.limit_offset)
+            order = sim.buy(
+                k, qty, LIMIT, price, stop_loss=self.stop_loss, take_profit=self.take_profit
+            )
+        self.pending[k] = (order, i)
+
+
+def load_bars(store, tickers, interval="1d", start=None, end=None):
+    """{ticker: bars} read (or derived from finer bars) through the interval pyramid"""
+    from resample import Pyramid
+
+    pyramid = Pyramid(store)
+    return {t: pyramid.read(t, interval, start, end).reset_index(drop=True) for t in tickers}
+
+
+def indicator_signals(bars, key):
+    """The 'Signal' output of a registered indicator over every ticker's bars"""
+    from indicators.pipeline import Pipeline
+
+    pipeline = Pipeline([key])
+    return [pipeline.run(df)[key]["Signal"] for df in bars.values()]
+
+
+def main(argv=None):
+    from storage import get_store
+
+    parser = argparse.ArgumentParser(
+        description="Paper-trade indicator signals on stored bars"
+    )
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--indicator", default="rsi", help="indicator key, e.g. rsi")
+    parser.add_argument("--cash", type=float, default=10_000.0)
+    parser.add_argument("--allocation", type=float, default=0.1, help="of equity per entry")
+    parser.add_argument("--stop-loss", type=float, help="e.g. 0.02 for 2%% below the fill")
+    parser.add_argument("--take-profit", type=float, help="e.g. 0.04 for 4%% above the fill")
+    parser.add_argument("--hold", type=int, help="sell this many bars after the entry")
+    parser.add_argument("--limit-offset", type=float, help="enter with limit orders instead")
+    parser.add_argument("--entry-bars", type=int, default=1, help="bars a limit entry waits")
+    parser.add_argument("--commission-bps", type=float, default=0.0)
+    parser.add_argument("--slippage-bps", type=float, default=0.0)
+    parser.add_argument("--fills", help="write the fills to this CSV file")
+    parser.add_argument("--equity", help="write the equity curve to this CSV file")
+    args = add_arguments(parser).parse_args(argv)
+
+    with profiling(args, "simulator"):
+        tickers = [t.upper() for t in args.tickers]
+        bars = load_bars(get_store(), tickers, args.interval, args.start, args.end)
+        strategy = SignalStrategy(
+            indicator_signals(bars, args.indicator),
+            allocation=args.allocation,
+            stop_loss=args.stop_loss,
+            take_profit=args.take_profit,
+            hold_bars=args.hold,
+            limit_offset=args.limit_offset,
+            entry_bars=args.entry_bars,
+        )
+        simulator = Simulator(bars, args.cash, args.commission_bps, args.slippage_bps)
+        result = simulator.run(strategy)
+
+    print(json.dumps(result["metrics"], indent=2))
+    if args.fills:
+        result["fills"].to_csv(args.fills, index=False)
+    if args.equity:
+        result["equity"].to_csv(args.equity)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
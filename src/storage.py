@@ -0,0 +1,517 @@
+# src/storage.py
+"""
+Pluggable storage for cleaned OHLCV data.
+
+Every backend stores one logical series per (ticker, interval) and exposes the same
+small interface:
+
+  - write(ticker, interval, df, replace=False): persist the frame produced by
+    `clean_data`, adding its bars to the stored series (bars outside the frame are kept);
+    with `replace` the written frame becomes the whole series
+  - read(ticker, interval, start=None, end=None, columns=None): load only the rows in
+    [start, end] and only the requested columns ('Date' is always included)
+  - read_blocks(ticker, interval, rows, columns=None): the same series as `read`, as
+    consecutive frames of at most `rows` rows, holding one block in memory at a time
+  - series(): list the (ticker, interval) pairs currently stored
+  - bounds(ticker, interval): first and last bar as datetimes, without loading the series
+  - export_csv(ticker, interval, path): write a stored series out as a plain CSV
+
+Every write is recorded in the store's catalog (ROOT/catalog.sqlite, see catalog.py),
+so `series`, `bounds` and the CSV backend's file lookups are indexed queries instead of
+directory scans. A missing catalog is rebuilt from the files on first use; files changed
+behind the store's back are picked up by `python src/storage.py catalog rebuild`.
+
+Backends:
+  - "csv": the historical flat layout, data-files/raw/TICKER_start_end_interval.csv
+  - "parquet": columnar files partitioned as data-files/store/TICKER/INTERVAL.parquet,
+    date filters are pushed down to the Parquet row-group statistics
+  - "arrow": Arrow IPC files partitioned the same way, memory-mapped on read so a date
+    range is located with a binary search on the sorted 'Date' column
+
+The columnar backends need `pyarrow`; the CSV backend only needs pandas. Both are
+imported on first use, so listing the CSV store does not pay for loading them.
+The backend used by the entry points is taken from the NOCTURNE_STORE environment
+variable and defaults to "csv".
+"""
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from catalog import CATALOG_NAME, Catalog
+from instrumentation import span
+
+DEFAULT_BACKEND = "csv"
+DEFAULT_ROOTS = {
+    "csv": "data-files/raw",
+    "parquet": "data-files/store",
+    "arrow": "data-files/store",
+}
+
+
+def _to_timestamp(value, tz=None):
+    """Convert a date bound to a Timestamp comparable with a column in timezone `tz`"""
+    import pandas as pd
+
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert("UTC").tz_localize(None)
+    return ts
+
+
+def _select(df, start=None, end=None, columns=None):
+    """Apply a date range and a column selection to an in-memory frame."""
+    tz = getattr(df["Date"].dtype, "tz", None)
+    start, end = _to_timestamp(start, tz), _to_timestamp(end, tz)
+    if start is not None:
+        df = df[df["Date"] >= start]
+    if end is not None:
+        df = df[df["Date"] <= end]
+    if columns is not None:
+        df = df[_with_date(columns)]
+    return df.reset_index(drop=True)
+
+
+def _with_date(columns):
+    return ["Date", *[c for c in columns if c != "Date"]]
+
+
+def merge_bars(existing, new):
+    """Combine stored and freshly downloaded bars, keeping the newest copy of each bar"""
+    import pandas as pd
+
+    tz = getattr(existing["Date"].dtype, "tz", None)
+    if tz is not None and getattr(new["Date"].dtype, "tz", None) is not None:
+        new = new.assign(Date=new["Date"].dt.tz_convert(tz))
+    combined = pd.concat([existing, new], ignore_index=True)
+    combined = combined.drop_duplicates("Date", keep="last").sort_values("Date")
+    return combined.reset_index(drop=True)
+
+
+def _bar_bounds(dates):
+    """(ISO timestamp, UTC epoch nanoseconds) of the first and last bar of 'Date' values"""
+    import pandas as pd
+
+    def stamp(ts):
+        utc = ts.tz_convert("UTC").tz_localize(None) if ts.tzinfo is not None else ts
+        return ts.isoformat(), int(utc.as_unit("ns").value)
+
+    dates = pd.Series(dates)
+    return stamp(pd.Timestamp(dates.min())), stamp(pd.Timestamp(dates.max()))
+
+
+class _CatalogedStore:
+    """Catalog bookkeeping shared by every backend"""
+
+    name = None
+    suffix = None
+
+    def __init__(self, root=None):
+        self.root = Path(root or DEFAULT_ROOTS[self.name])
+        self._catalog_checked = False
+
+    @property
+    def catalog(self):
+        catalog = Catalog(self.root / CATALOG_NAME)
+        if not self._catalog_checked:
+            # Files written before the catalog existed are indexed once.
+            self._catalog_checked = True
+            if self.root.exists() and not catalog.series(self.name) and any(self._scan()):
+                self.rebuild_catalog()
+        return catalog
+
+    def _scan(self):
+        """Yield (ticker, interval, path) for every data file on disk"""
+        for path in self.root.glob(self.pattern):
+            key = self._series_of(path)
+            if key is not None:
+                yield (*key, path)
+
+    def _record(self, ticker, interval, path, dates):
+        first, last = _bar_bounds(dates)
+        self.catalog.record(self.name, ticker, interval, path, first, last, len(dates))
+
+    def index_file(self, path):
+        """Refresh the catalog entry of a file that was modified outside the store"""
+        ticker, interval = self._series_of(Path(path))
+        self._record(ticker, interval, Path(path), self._read_dates(Path(path)))
+
+    def rebuild_catalog(self):
+        """
+        Re-index every data file of this backend found under the root.
+
+        Returns {path: error} for the files that could not be read (they are left out).
+        """
+        catalog = Catalog(self.root / CATALOG_NAME)
+        catalog.clear(self.name)
+        self._catalog_checked = True
+        skipped = {}
+        for ticker, interval, path in self._scan():
+            try:
+                self._record(ticker, interval, path, self._read_dates(path))
+            except Exception as e:
+                skipped[path] = f"{type(e).__name__}: {e}"
+        return skipped
+
+    def series(self):
+        return self.catalog.series(self.name)
+
+    def bounds(self, ticker, interval):
+        """First and last bar as recorded in the catalog, without reading the data"""
+        bounds = self.catalog.bounds(self.name, ticker, interval)
+        if bounds is None:
+            raise FileNotFoundError(f"No data file found for {ticker} ({interval})")
+        return datetime.fromisoformat(bounds[0]), datetime.fromisoformat(bounds[1])
+
+    def export_csv(self, ticker, interval, path):
+        self.read(ticker, interval).to_csv(path, index=False)
+        return Path(path)
+
+
+class CsvStore(_CatalogedStore):
+    """Flat CSV files named TICKER_start_end_interval.csv"""
+
+    name = "csv"
+    suffix = ".csv"
+    pattern = "*_*_*_*.csv"
+
+    def _series_of(self, path):
+        parts = path.stem.split("_")
+        return (parts[0], parts[3]) if len(parts) >= 4 else None
+
+    def _read_dates(self, path):
+        import pandas as pd
+
+        dates = pd.read_csv(path, usecols=["Date"])["Date"]
+        try:
+            return pd.to_datetime(dates)
+        except (ValueError, TypeError):
+            return pd.to_datetime(dates, utc=True)
+
+    def files(self, ticker, interval):
+        """All CSV files holding bars for a ticker/interval, oldest range first"""
+        return self.catalog.files(self.name, ticker, interval)
+
+    def exists(self, ticker, interval):
+        return bool(self.files(ticker, interval))
+
+    def write(self, ticker, interval, df, replace=False):
+        """
+        Write the frame as TICKER_first_last_interval.csv and return its path.
+        With `replace`, the other files of the series are removed afterwards.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        first = df["Date"].iloc[0].date()
+        last = df["Date"].iloc[-1].date()
+        path = self.root / f"{ticker}_{first}_{last}_{interval}.csv"
+        stale = [f for f in self.files(ticker, interval) if f != path] if replace else []
+        with span("store_write:csv", ticker=ticker, interval=interval):
+            df.to_csv(path, index=False)
+        self._record(ticker, interval, path, df["Date"])
+        for f in stale:
+            f.unlink()
+        self.catalog.remove(*stale)
+        return path
+
+    def read(self, ticker, interval, start=None, end=None, columns=None):
+        """Read every file for the series and merge them on 'Date'"""
+        import pandas as pd
+
+        files = self.files(ticker, interval)
+        if not files:
+            raise FileNotFoundError(f"No data file found for {ticker} ({interval})")
+
+        usecols = _with_date(columns) if columns is not None else None
+        with span("store_read:csv", ticker=ticker, interval=interval):
+            frames = [pd.read_csv(f, usecols=usecols, parse_dates=["Date"]) for f in files]
+            df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+                # Intraday bars spanning a DST change carry mixed UTC offsets.
+                df["Date"] = pd.to_datetime(df["Date"], utc=True)
+        if len(frames) > 1:
+            df = df.drop_duplicates("Date", keep="last").sort_values("Date")
+        return _select(df, start, end, columns)
+
+    def read_blocks(self, ticker, interval, rows, columns=None):
+        """
+        Yield the series as frames of at most `rows` rows, oldest first.
+
+        The files must hold disjoint date ranges (`python src/storage.py catalog merge`
+        rewrites overlapping ones). Dates are parsed like `read`: when the first block has
+        UTC offsets, the 'Date' column is scanned once more beforehand so mixed offsets
+        are converted to UTC in every block, not only in the blocks that mix them.
+        """
+        import pandas as pd
+
+        entries = self.catalog.entries(self.name, ticker, interval)
+        if not entries:
+            raise FileNotFoundError(f"No data file found for {ticker} ({interval})")
+        for before, after in zip(entries, entries[1:]):
+            if after["first_utc"] <= before["last_utc"]:
+                raise ValueError(
+                    f"{ticker} ({interval}) is stored in overlapping files; merge them first "
+                    "with `python src/storage.py catalog merge`"
+                )
+        files = self.files(ticker, interval)
+        usecols = _with_date(columns) if columns is not None else None
+
+        def chunks(usecols):
+            for path in files:
+                with pd.read_csv(path, usecols=usecols, chunksize=rows) as reader:
+                    yield from reader
+
+        def parse(dates, utc=False):
+            try:
+                return pd.to_datetime(dates, utc=utc)
+            except (ValueError, TypeError):
+                return pd.to_datetime(dates, utc=True)
+
+        first = next(chunks(["Date"]), None)
+        utc = False
+        if first is not None and getattr(parse(first["Date"]).dtype, "tz", None) is not None:
+            dtypes = {parse(chunk["Date"]).dtype for chunk in chunks(["Date"])}
+            utc = len(dtypes) > 1
+        for block in chunks(usecols):
+            with span("store_read_block:csv", ticker=ticker, interval=interval):
+                block["Date"] = parse(block["Date"], utc)
+            yield block.reset_index(drop=True)
+
+
+class _ColumnarStore(_CatalogedStore):
+    """Shared layout for the columnar backends: ROOT/TICKER/INTERVAL.<suffix>"""
+
+    def __init__(self, root=None):
+        # Fail early with a clear message instead of on the first read.
+        import pyarrow  # noqa: F401
+
+        super().__init__(root)
+
+    @property
+    def pattern(self):
+        return f"*/*{self.suffix}"
+
+    def _series_of(self, path):
+        return path.parent.name, path.name[: -len(self.suffix)]
+
+    def _read_dates(self, path):
+        return self._read_file(path, None, None, ["Date"])["Date"]
+
+    def path(self, ticker, interval):
+        return self.root / ticker / f"{interval}{self.suffix}"
+
+    def exists(self, ticker, interval):
+        return self.path(ticker, interval).exists()
+
+    def write(self, ticker, interval, df, replace=False):
+        """
+        Write the frame sorted by 'Date', atomically. Without `replace` its bars are merged
+        into the stored series (see `merge_bars`), like the CSV backend keeps its other
+        files; with `replace` the frame becomes the whole series.
+        """
+        path = self.path(ticker, interval)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with span(f"store_write:{self.name}", ticker=ticker, interval=interval):
+            if not replace and path.exists():
+                df = merge_bars(self._read_file(path, None, None, None), df)
+            self._write_file(df.sort_values("Date").reset_index(drop=True), tmp)
+            os.replace(tmp, path)
+        self._record(ticker, interval, path, df["Date"])
+        return path
+
+    def read(self, ticker, interval, start=None, end=None, columns=None):
+        path = self.path(ticker, interval)
+        if not path.exists():
+            raise FileNotFoundError(f"No data file found for {ticker} ({interval})")
+        columns = _with_date(columns) if columns is not None else None
+        with span(f"store_read:{self.name}", ticker=ticker, interval=interval):
+            return self._read_file(path, start, end, columns)
+
+    def read_blocks(self, ticker, interval, rows, columns=None):
+        """Yield the series as frames of at most `rows` rows, oldest first"""
+        path = self.path(ticker, interval)
+        if not path.exists():
+            raise FileNotFoundError(f"No data file found for {ticker} ({interval})")
+        columns = _with_date(columns) if columns is not None else None
+        for table in self._read_batches(path, rows, columns):
+            with span(f"store_read_block:{self.name}", ticker=ticker, interval=interval):
+                yield table.to_pandas()
+
+
+def _date_tz(schema):
+    return getattr(schema.field("Date").type, "tz", None)
+
+
+class ParquetStore(_ColumnarStore):
+    """Parquet files with date-range pushdown on row-group statistics"""
+
+    name = "parquet"
+    suffix = ".parquet"
+    row_group_size = 64_000
+
+    def _write_file(self, df, path):
+        df.to_parquet(path, index=False, row_group_size=self.row_group_size)
+
+    def _read_file(self, path, start, end, columns):
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        tz = _date_tz(pq.read_schema(path))
+        filters = []
+        if start is not None:
+            filters.append(("Date", ">=", _to_timestamp(start, tz)))
+        if end is not None:
+            filters.append(("Date", "<=", _to_timestamp(end, tz)))
+        df = pd.read_parquet(path, columns=columns, filters=filters or None, memory_map=True)
+        return df.reset_index(drop=True)
+
+    def _read_batches(self, path, rows, columns):
+        """Tables of at most `rows` rows, decoded one batch of row groups at a time"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path, memory_map=True)
+        schema = parquet.schema_arrow  # Keeps the pandas metadata for `to_pandas`
+        if columns is not None:
+            schema = pa.schema([schema.field(c) for c in columns], metadata=schema.metadata)
+        for batch in parquet.iter_batches(batch_size=rows, columns=columns):
+            yield pa.Table.from_batches([batch], schema)
+
+
+class ArrowStore(_ColumnarStore):
+    """Arrow IPC files, memory-mapped and sliced by binary search on 'Date'"""
+
+    name = "arrow"
+    suffix = ".arrow"
+
+    def _write_file(self, df, path):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    def _open(self, path):
+        import pyarrow as pa
+
+        return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+    def _read_file(self, path, start, end, columns):
+        table = self._open(path)
+        if columns is not None:
+            table = table.select(columns)
+
+        # Only the 'Date' column is touched to locate the slice; the other columns stay
+        # in the memory map until the slice is converted. Timestamps are stored as UTC.
+        dates = table.column("Date").to_numpy()
+        lo, hi = 0, len(dates)
+        if start is not None:
+            lo = dates.searchsorted(_utc64(start, _date_tz(table.schema)), "left")
+        if end is not None:
+            hi = dates.searchsorted(_utc64(end, _date_tz(table.schema)), "right")
+        return table.slice(lo, max(hi - lo, 0)).to_pandas()
+
+    def _read_batches(self, path, rows, columns):
+        """Slices of at most `rows` rows of the memory-mapped table"""
+        table = self._open(path)
+        if columns is not None:
+            table = table.select(columns)
+        for offset in range(0, len(table), rows):
+            yield table.slice(offset, rows)
+
+
+def _utc64(value, tz):
+    ts = _to_timestamp(value, tz)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_datetime64()
+
+
+BACKENDS = {
+    "csv": CsvStore,
+    "parquet": ParquetStore,
+    "arrow": ArrowStore,
+}
+
+
+def get_store(backend=None, root=None):
+    """Instantiate a storage backend by name (defaults to $NOCTURNE_STORE or 'csv')"""
+    backend = backend or os.environ.get("NOCTURNE_STORE", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown storage backend {backend!r}. Valid options: {', '.join(BACKENDS)}"
+        )
+    return BACKENDS[backend](root)
+
+
+def convert(source, target):
+    """Copy every series from one store into another (e.g. raw CSVs into Parquet)"""
+    for ticker, interval in source.series():
+        target.write(ticker, interval, source.read(ticker, interval))
+    return target.series()
+
+
+def merge_overlapping(store):
+    """Rewrite every series stored in several files as a single file"""
+    merged = store.catalog.overlapping(store.name)
+    for ticker, interval in merged:
+        store.write(ticker, interval, store.read(ticker, interval), replace=True)
+    return merged
+
+
+def main():
+    """Convert between backends, export a stored series to CSV or maintain the catalog"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the market data store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    conv = sub.add_parser("convert", help="copy every series from one backend to another")
+    conv.add_argument("source", choices=list(BACKENDS))
+    conv.add_argument("target", choices=list(BACKENDS))
+
+    export = sub.add_parser("export", help="export one series as a CSV file")
+    export.add_argument("ticker")
+    export.add_argument("interval")
+    export.add_argument("path")
+
+    catalog = sub.add_parser("catalog", help="maintain the catalog of the current store")
+    catalog.add_argument(
+        "action",
+        choices=["rebuild", "verify", "merge"],
+        help="re-index the files on disk, check their checksums, or merge series stored "
+        "in several files into one",
+    )
+
+    args = parser.parse_args()
+    if args.command == "catalog":
+        store = get_store()
+        if args.action == "rebuild":
+            skipped = store.rebuild_catalog()
+            for path, error in skipped.items():
+                print(f"❌ {path}: {error}")
+            print(f"Indexed {len(store.series())} series in {store.catalog.path}")
+            return 1 if skipped else 0
+        elif args.action == "verify":
+            stale = store.catalog.verify(store.name)
+            for path in stale:
+                print(f"❌ {path} is missing or changed since it was indexed")
+            print(f"{len(stale)} stale file(s)")
+            return 1 if stale else 0
+        else:
+            for ticker, interval in merge_overlapping(store):
+                print(f"Merged {ticker} ({interval}) into one file")
+    elif args.command == "convert":
+        series = convert(get_store(args.source), get_store(args.target))
+        print(f"Converted {len(series)} series from {args.source} to {args.target}")
+    else:
+        path = get_store().export_csv(args.ticker.upper(), args.interval, args.path)
+        print(f"Exported {args.ticker.upper()} ({args.interval}) to {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
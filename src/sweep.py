@@ -0,0 +1,241 @@
+# src/sweep.py
+"""
+Batched parameter sweeps for indicator hyperparameters.
+
+Instead of running an indicator once per parameter set, every sweep computes the work
+shared by the whole grid once per ticker and broadcasts the cheap part:
+
+  - djia_weakness: the ROC for every `roc_length` is one 2-D array (lengths x bars) and
+    every `threshold` is applied to it at once (thresholds x lengths x bars)
+  - weekly_average_buy: the weekday averages and PctDiff are computed once per mode
+    (full-sample or expanding/window) and every `threshold_pct` is broadcast over them
+
+Tickers are spread over a process pool. The result is a tidy table with one row per
+ticker and parameter set: number of signals, signal rate, and the mean forward return
+and hit rate of the signals over `horizon` bars.
+
+Usage:
+  python src/sweep.py djia_weakness --roc-length 5 10 13 20 --threshold -5 -10 -15
+  python src/sweep.py weekly_average_buy --threshold-pct -1 -2 -3 --expanding
+"""
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from indicators import WeeklyAverageBuyIndicator
+from storage import get_store
+
+
+def forward_returns(close, horizon):
+    """Return from each bar's close to the close `horizon` bars later (NaN at the end)"""
+    out = np.full(len(close), np.nan)
+    if horizon < len(close):
+        out[:-horizon] = close[horizon:] / close[:-horizon] - 1
+    return out
+
+
+def signal_stats(signals, fwd):
+    """
+    Statistics of a stack of boolean signal rows against shared forward returns.
+
+    `signals` has shape (..., bars); returns arrays of shape (...) for the signal count,
+    signal rate, mean forward return and hit rate of the signalled bars.
+    """
+    count = signals.sum(axis=-1)
+    has_fwd = ~np.isnan(fwd)
+    scored = signals & has_fwd
+    scored_count = scored.sum(axis=-1)
+    fwd_filled = np.where(has_fwd, fwd, 0.0)
+    total = (scored * fwd_filled).sum(axis=-1)
+    wins = (scored & (fwd_filled > 0)).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_return = np.where(scored_count > 0, total / scored_count, np.nan)
+        hit_rate = np.where(scored_count > 0, wins / scored_count, np.nan)
+    rate = count / signals.shape[-1] if signals.shape[-1] else np.zeros_like(count, float)
+    return count, rate, mean_return, hit_rate
+
+
+def rate_of_change(close, lengths):
+    """ROC (in %) for every length at once, as a (lengths x bars) array"""
+    close = np.asarray(close, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    source = np.arange(len(close))[None, :] - lengths[:, None]
+    previous = np.where(source >= 0, close[np.clip(source, 0, None)], np.nan)
+    return 100 * (close[None, :] - previous) / previous
+
+
+def sweep_djia_weakness(df, grid, horizon):
+    """Sweep `roc_length` x `threshold` for one ticker"""
+    lengths = list(grid.get("roc_length", [13]))
+    thresholds = np.asarray(grid.get("threshold", [-15]), dtype=np.float64)
+    close = df["Close"].to_numpy(dtype=np.float64)
+
+    roc = rate_of_change(close, lengths)
+    # NaN ROC compares False, exactly like the indicator's `ROC < threshold`.
+    with np.errstate(invalid="ignore"):
+        signals = roc[None, :, :] < thresholds[:, None, None]
+    count, rate, mean_return, hit_rate = signal_stats(signals, forward_returns(close, horizon))
+
+    rows = []
+    for (t, threshold), (length_i, length) in itertools.product(
+        enumerate(thresholds), enumerate(lengths)
+    ):
+        rows.append(
+            {
+                "roc_length": length,
+                "threshold": float(threshold),
+                "signals": int(count[t, length_i]),
+                "signal_rate": float(rate[t, length_i]),
+                "mean_forward_return": float(mean_return[t, length_i]),
+                "hit_rate": float(hit_rate[t, length_i]),
+            }
+        )
+    return rows
+
+
+def sweep_weekly_average_buy(df, grid, horizon):
+    """Sweep `threshold_pct` (None for best-day mode) x `expanding` x `window` for one ticker"""
+    thresholds = list(grid.get("threshold_pct", [None]))
+    numeric = np.asarray([t for t in thresholds if t is not None], dtype=np.float64)
+    close = df["Close"].to_numpy(dtype=np.float64)
+    fwd = forward_returns(close, horizon)
+
+    rows = []
+    modes = itertools.product(grid.get("expanding", [False]), grid.get("window", [None]))
+    for expanding, window in modes:
+        if window is not None and not expanding:
+            continue  # The trailing window only applies to point-in-time mode.
+
+        # Best-day signals and PctDiff come out of a single indicator run per mode.
+        indicator = WeeklyAverageBuyIndicator(None, expanding=expanding, window=window)
+        result = indicator.calculate(df[["Date", "Close"]].copy())
+        pct_diff = result["PctDiff"].to_numpy(dtype=np.float64)
+
+        stacks, labels = [], []
+        if None in thresholds:
+            stacks.append(result["Signal"].to_numpy(dtype=bool)[None, :])
+            labels.append(None)
+        if len(numeric):
+            with np.errstate(invalid="ignore"):
+                stacks.append(pct_diff[None, :] < numeric[:, None])
+            labels.extend(float(t) for t in numeric)
+
+        count, rate, mean_return, hit_rate = signal_stats(np.vstack(stacks), fwd)
+        for i, threshold in enumerate(labels):
+            rows.append(
+                {
+                    "threshold_pct": threshold,
+                    "expanding": expanding,
+                    "window": window,
+                    "signals": int(count[i]),
+                    "signal_rate": float(rate[i]),
+                    "mean_forward_return": float(mean_return[i]),
+                    "hit_rate": float(hit_rate[i]),
+                }
+            )
+    return rows
+
+
+SWEEPS = {
+    "djia_weakness": sweep_djia_weakness,
+    "weekly_average_buy": sweep_weekly_average_buy,
+}
+
+
+def _sweep_ticker(ticker, df, key, grid, horizon):
+    try:
+        return [{"ticker": ticker, **row} for row in SWEEPS[key](df, grid, horizon)], None
+    except Exception as e:
+        return [], (ticker, f"{type(e).__name__}: {e}")
+
+
+def sweep(frames, key, grid, horizon=20, workers=None):
+    """
+    Evaluate a parameter grid for one indicator over {ticker: DataFrame} frames.
+
+    Returns (tidy DataFrame of per-ticker results, {ticker: error}).
+    """
+    if key not in SWEEPS:
+        raise ValueError(f"No sweep available for {key!r}. Valid options: {', '.join(SWEEPS)}")
+
+    rows, failures = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_sweep_ticker, ticker, df, key, grid, horizon)
+            for ticker, df in frames.items()
+        ]
+        for future in futures:
+            ticker_rows, failure = future.result()
+            rows.extend(ticker_rows)
+            if failure:
+                failures[failure[0]] = failure[1]
+    return pd.DataFrame(rows), failures
+
+
+def summarize(results):
+    """Average the per-ticker statistics of every parameter set across tickers"""
+    params = [
+        c
+        for c in results.columns
+        if c not in ("ticker", "signals", "signal_rate", "mean_forward_return", "hit_rate")
+    ]
+    return (
+        results.groupby(params, dropna=False)[
+            ["signals", "signal_rate", "mean_forward_return", "hit_rate"]
+        ]
+        .mean()
+        .reset_index()
+        .sort_values("mean_forward_return", ascending=False)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep indicator parameters")
+    parser.add_argument("indicator", choices=list(SWEEPS))
+    parser.add_argument("--tickers", nargs="+", help="defaults to every stored ticker")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--horizon", type=int, default=20, help="forward return bars")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--roc-length", type=int, nargs="+", default=[13])
+    parser.add_argument("--threshold", type=float, nargs="+", default=[-15])
+    parser.add_argument(
+        "--threshold-pct", nargs="+", default=["none"], help="numbers, or 'none' for best-day"
+    )
+    parser.add_argument("--expanding", action="store_true", help="also sweep point-in-time")
+    parser.add_argument(
+        "--window", type=int, nargs="+", help="point-in-time windows (implies --expanding)"
+    )
+    parser.add_argument("--output", help="write the per-ticker table to this CSV file")
+    args = parser.parse_args()
+
+    if args.indicator == "djia_weakness":
+        grid = {"roc_length": args.roc_length, "threshold": args.threshold}
+    else:
+        grid = {
+            "threshold_pct": [None if t == "none" else float(t) for t in args.threshold_pct],
+            "expanding": [False, True] if args.expanding or args.window else [False],
+            "window": [None, *(args.window or [])],
+        }
+
+    store = get_store()
+    tickers = args.tickers or sorted({t for t, i in store.series() if i == args.interval})
+    frames = {
+        t.upper(): store.read(t.upper(), args.interval, columns=["Close"]) for t in tickers
+    }
+
+    results, failures = sweep(frames, args.indicator, grid, args.horizon, args.workers)
+    for ticker, error in failures.items():
+        print(f"❌ {ticker}: {error}")
+    if results.empty:
+        print("No results.")
+        return
+
+    print(summarize(results).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
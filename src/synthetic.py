@@ -0,0 +1,74 @@
+# src/synthetic.py
+"""
+Deterministic synthetic market data.
+
+Generates random-walk OHLCV bars for any interval accepted by `get_stock_data`, either
+in the cleaned shape written to the data store ('Date' column first) or in the raw shape
+returned by the providers (indexed by date), so every pipeline stage can be exercised
+offline. The same seed always produces the same bars.
+"""
+import numpy as np
+import pandas as pd
+
+# Minutes per bar for intraday intervals; intraday bars are generated inside a regular
+# 09:30-16:00 session on business days.
+INTRADAY_MINUTES = {
+    "1m": 1,
+    "2m": 2,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "60m": 60,
+    "90m": 90,
+    "1h": 60,
+}
+SESSION_MINUTES = 390
+FREQUENCIES = {"1d": "B", "5d": "5B", "1wk": "W-MON", "1mo": "MS", "3mo": "QS"}
+
+
+def timestamps(n, interval="1d", start="2000-01-03"):
+    """`n` bar timestamps for an interval, starting at `start`"""
+    if interval in INTRADAY_MINUTES:
+        step = INTRADAY_MINUTES[interval]
+        per_day = -(-SESSION_MINUTES // step)
+        days = pd.bdate_range(start, periods=-(-n // per_day)).to_numpy()
+        session_open = np.timedelta64(9 * 60 + 30, "m")
+        offsets = session_open + np.arange(per_day) * np.timedelta64(step, "m")
+        stamps = (days[:, None] + offsets[None, :]).ravel()[:n]
+        return pd.DatetimeIndex(stamps)
+    if interval not in FREQUENCIES:
+        raise ValueError(f"Unsupported interval {interval!r}")
+    return pd.date_range(start, periods=n, freq=FREQUENCIES[interval])
+
+
+def generate_ohlcv(n, interval="1d", seed=0, start="2000-01-03", price=100.0, raw=False):
+    """
+    Generate `n` bars of a geometric random walk.
+
+    Returns the cleaned layout (Date, Open, High, Low, Close, Volume), or with raw=True
+    a provider-style frame indexed by date without the 'Date' column.
+    """
+    rng = np.random.default_rng(seed)
+    scale = 0.02 / np.sqrt(SESSION_MINUTES / INTRADAY_MINUTES.get(interval, SESSION_MINUTES))
+
+    close = price * np.exp(np.cumsum(rng.normal(0.0, scale, n)))
+    open_ = np.empty(n)
+    open_[0] = price
+    open_[1:] = close[:-1] * np.exp(rng.normal(0.0, scale / 4, n - 1))
+    spread = np.abs(rng.normal(0.0, scale, (2, n)))
+    high = np.maximum(open_, close) * (1 + spread[0])
+    low = np.minimum(open_, close) * (1 - spread[1])
+    volume = rng.lognormal(13, 0.5, n).astype(np.int64)
+
+    dates = timestamps(n, interval, start)
+    df = pd.DataFrame(
+        {"Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume},
+        index=pd.DatetimeIndex(dates, name="Date"),
+    )
+    return df if raw else df.reset_index()
+
+
+def generate_universe(n_tickers, n, interval="1d", seed=0, raw=False):
+    """Yield (ticker, frame) pairs for `n_tickers` independent random walks"""
+    for i in range(n_tickers):
+        yield f"SYN{i:04d}", generate_ohlcv(n, interval, seed=seed + i, raw=raw)
@@ -0,0 +1,62 @@
+"""Indicators streamed in blocks of rows against the in-memory path"""
+
+import pandas as pd
+import pytest
+from get_indicator_data import process_ticker
+from indicator_store import IndicatorStore
+from indicators import INDICATORS, WeeklyAverageBuyIndicator
+from indicators.pipeline import Pipeline
+from storage import BACKENDS
+from synthetic import generate_ohlcv
+
+INTERVAL = "1m"
+CHUNK_SIZES = [13, 997]
+
+
+@pytest.fixture(scope="module")
+def bars():
+    return generate_ohlcv(3_000, INTERVAL, seed=0)
+
+
+def weekly():
+    """Point-in-time weekday averages, which carry their running sums across blocks"""
+    return {
+        "expanding": WeeklyAverageBuyIndicator(threshold_pct=-1, expanding=True),
+        "best_day": WeeklyAverageBuyIndicator(expanding=True),
+        "window": WeeklyAverageBuyIndicator(expanding=True, window=52),
+    }
+
+
+@pytest.mark.parametrize("rows", CHUNK_SIZES)
+def test_point_in_time_weekday_averages_match_across_blocks(bars, rows):
+    expected = Pipeline(weekly()).frames(bars)
+    parts = list(
+        Pipeline(weekly()).frame_blocks(
+            lambda: (bars.iloc[i : i + rows] for i in range(0, len(bars), rows))
+        )
+    )
+    for name, frame in expected.items():
+        streamed = pd.concat([part[name] for part in parts], ignore_index=True)
+        assert streamed.equals(frame), name
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_files_written_block_by_block_are_byte_identical(bars, backend, tmp_path):
+    try:
+        store = BACKENDS[backend](tmp_path / backend)
+    except ImportError as e:
+        pytest.skip(f"{backend} backend unavailable: {e}")
+    store.write("SYN", INTERVAL, bars)
+    keys = list(INDICATORS)
+    results = {}
+    for chunk_rows in (None, *CHUNK_SIZES):
+        results[chunk_rows] = IndicatorStore(tmp_path / "results" / str(chunk_rows))
+        _, _, error, _ = process_ticker(
+            "SYN", keys, store, results[chunk_rows], interval=INTERVAL, chunk_rows=chunk_rows
+        )
+        assert error is None
+    for chunk_rows in CHUNK_SIZES:
+        for key in keys:
+            streamed = results[chunk_rows].path("SYN", key, INTERVAL).read_bytes()
+            in_memory = results[None].path("SYN", key, INTERVAL).read_bytes()
+            assert streamed == in_memory, f"{key} with chunk_rows={chunk_rows}"
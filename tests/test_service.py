@@ -0,0 +1,50 @@
+"""HTTP framing of the resident query service"""
+
+import asyncio
+
+import pytest
+from indicator_store import IndicatorStore
+from service import QueryService
+from storage import BACKENDS
+
+
+async def exchange(service, request):
+    """Send raw bytes on one connection; returns everything the service answers"""
+    server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response.decode()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.fixture
+def service(tmp_path):
+    return QueryService(
+        BACKENDS["csv"](tmp_path / "raw"), IndicatorStore(tmp_path / "results")
+    )
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-3"])
+def test_bad_content_length_gets_400_and_closes(service, length):
+    request = b"GET /health HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n"
+    response = asyncio.run(exchange(service, request + b"GET /health HTTP/1.1\r\n\r\n"))
+    assert response.startswith("HTTP/1.1 400 Bad Request")
+    assert "Connection: close" in response
+    assert '{"error": "Bad Content-Length"}' in response
+    assert response.count("HTTP/1.1 ") == 1
+
+
+def test_request_body_is_skipped_on_a_kept_alive_connection(service):
+    request = (
+        b"GET /health HTTP/1.1\r\nContent-Length: 2\r\n\r\nxx"
+        b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n"
+    )
+    response = asyncio.run(exchange(service, request))
+    assert response.count("HTTP/1.1 200 OK") == 2
@@ -0,0 +1,135 @@
+"""Order matching of the paper-trading simulator on hand-built bars with known fills"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from simulator import CANCELLED, FILLED, LIMIT, REJECTED, STOP, Simulator
+
+FLAT = (100.0, 100.0, 100.0, 100.0)
+
+
+class Script:
+    """Strategy placing scripted orders: {bar row: callable(sim) returning an Order}"""
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.orders = {}
+
+    def on_bar(self, sim, k, i):
+        if i in self.actions:
+            self.orders[i] = self.actions[i](sim)
+
+
+def simulate(ohlc, actions, **kwargs):
+    """Run hand-built (open, high, low, close) bars of one ticker through a script"""
+    bars = pd.DataFrame(ohlc, columns=["Open", "High", "Low", "Close"])
+    bars.insert(0, "Date", pd.date_range("2024-01-01", periods=len(bars), freq="D"))
+    sim = Simulator({"SYN": bars}, **kwargs)
+    script = Script(actions)
+    result = sim.run(script)
+    return sim, script.orders, result
+
+
+def fills(result):
+    return list(result["fills"][["Qty", "Price", "Tag"]].itertuples(index=False, name=None))
+
+
+def test_stop_gapping_down_fills_at_the_open():
+    _, _, result = simulate(
+        [FLAT, (100, 101, 99, 100), (90, 92, 88, 91)],
+        {0: lambda s: s.buy(0, 10), 1: lambda s: s.sell(0, 10, STOP, 95)},
+    )
+    assert fills(result) == [(10, 100.0, None), (10, 90.0, None)]
+    assert result["equity"].tolist() == [10_000, 10_000, 9_900]
+
+
+def test_stop_gapping_up_fills_at_the_open():
+    _, _, result = simulate(
+        [FLAT, (110, 112, 108, 111)], {0: lambda s: s.buy(0, 10, STOP, 105)}
+    )
+    assert fills(result) == [(10, 110.0, None)]
+    assert result["equity"].iloc[-1] == 10_010  # Marked to the close
+
+
+@pytest.mark.parametrize(
+    "bar, price",
+    [((95, 97, 94, 96), 95.0), ((100, 101, 97, 99), 98.0)],
+    ids=["better_open", "limit"],
+)
+def test_buy_limit_fills_at_the_limit_or_a_better_open(bar, price):
+    _, _, result = simulate([FLAT, bar], {0: lambda s: s.buy(0, 10, LIMIT, 98)})
+    assert fills(result) == [(10, price, None)]
+
+
+def test_sell_limit_fills_at_a_better_open():
+    _, _, result = simulate(
+        [FLAT, (100, 101, 99, 100), (105, 106, 104, 105)],
+        {0: lambda s: s.buy(0, 10), 1: lambda s: s.sell(0, 10, LIMIT, 102)},
+    )
+    assert fills(result)[-1] == (10, 105.0, None)
+
+
+def test_untouched_limit_stays_open():
+    _, orders, result = simulate(
+        [FLAT, (100, 101, 99, 100)], {0: lambda s: s.buy(0, 10, LIMIT, 98)}
+    )
+    assert fills(result) == []
+    assert orders[0].status == "open"
+
+
+@pytest.mark.parametrize(
+    "bar, order",
+    [((100, 105, 97, 103), ["limit", "stop"]), ((100, 105, 97, 98), ["stop", "limit"])],
+    ids=["up_bar_low_first", "down_bar_high_first"],
+)
+def test_orders_on_one_bar_fill_along_the_bar_path(bar, order):
+    def both(s):
+        s.buy(0, 1, STOP, 104, tag="stop")
+        return s.buy(0, 1, LIMIT, 98, tag="limit")
+
+    _, _, result = simulate([FLAT, bar], {0: both})
+    assert [tag for _, _, tag in fills(result)] == order
+
+
+@pytest.mark.parametrize(
+    "bar, tag, other, price, equity",
+    [
+        ((100, 106, 94, 102), "stop_loss", "take_profit", 95.0, 9_950),
+        ((100, 106, 94, 98), "take_profit", "stop_loss", 105.0, 10_050),
+    ],
+    ids=["up_bar", "down_bar"],
+)
+def test_bracket_legs_on_one_bar_fill_the_first_reached(bar, tag, other, price, equity):
+    # The legs placed by the entry's fill on bar 1 are read back on that bar.
+    actions = {
+        0: lambda s: s.buy(0, 10, stop_loss=0.05, take_profit=0.05),
+        1: lambda s: {o.tag: o for o in s.books[0].orders},
+    }
+    sim, orders, result = simulate([FLAT, FLAT, bar], actions)
+    assert fills(result)[1:] == [(10, price, tag)]
+    assert orders[1][other].status == CANCELLED
+    assert sim.positions[0] == 0 and not sim.books[0]
+    assert result["equity"].iloc[-1] == equity
+
+
+def test_orders_are_cut_to_the_cash_and_shares_or_rejected():
+    sim, orders, result = simulate(
+        [FLAT, FLAT, FLAT, FLAT],
+        {0: lambda s: s.buy(0, 20), 1: lambda s: s.sell(0, 15), 2: lambda s: s.sell(0, 5)},
+        cash=1_000,
+        commission_bps=10,
+    )
+    assert [qty for qty, _, _ in fills(result)] == [9, 9]
+    assert orders[0].status == orders[1].status == FILLED
+    assert orders[2].status == REJECTED
+    assert np.isclose(sim.cash, 1_000 - 2 * 9 * 100 * 0.001)
+
+
+def test_unaffordable_buy_is_rejected_without_a_bracket():
+    sim, orders, _ = simulate(
+        [FLAT, FLAT, (100, 100, 80, 90)],
+        {0: lambda s: s.buy(0, 100, stop_loss=0.1, take_profit=0.1)},
+        cash=50,
+    )
+    assert orders[0].status == REJECTED
+    assert not sim.fills and not sim.books[0]
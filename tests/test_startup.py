@@ -0,0 +1,43 @@
+"""`nocturne list` must start without importing the heavy libraries"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from storage import BACKENDS
+from synthetic import generate_ohlcv
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+HEAVY_MODULES = {"pandas", "numpy", "matplotlib", "yfinance", "questionary", "pyarrow"}
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    store = BACKENDS["csv"](tmp_path / "data-files/raw")
+    for i in range(3):
+        store.write(f"SYN{i}", "1d", generate_ohlcv(20, seed=i))
+    return tmp_path
+
+
+def test_list_does_not_import_heavy_modules(store_dir):
+    env = {**os.environ, "NOCTURNE_STORE": "csv", "PYTHONPATH": str(SRC)}
+    env.pop("NOCTURNE_PROFILE", None)
+    # -X importtime reports every module the command imports on stderr.
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", str(SRC / "nocturne.py"), "list"],
+        cwd=store_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "SYN0" in completed.stdout
+    imported = {
+        line.rsplit("|", 1)[-1].strip().split(".")[0]
+        for line in completed.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    assert "storage" in imported
+    assert not imported & HEAVY_MODULES
@@ -0,0 +1,43 @@
+"""Streaming updates of WeeklyAverageBuyIndicator against `calculate`"""
+
+import numpy as np
+import pytest
+from indicators import WeeklyAverageBuyIndicator
+from synthetic import generate_ohlcv
+
+
+@pytest.fixture(scope="module")
+def bars():
+    bars = generate_ohlcv(600, seed=3)[["Date", "Close"]]
+    # Closes far from 1 with tiny noise expose any difference in rounding.
+    noise = np.random.default_rng(1).normal(size=len(bars)) * 1e-7
+    bars["Close"] = bars["Close"] * 1e3 + noise
+    bars.loc[[5, 17, 400], "Close"] = np.nan
+    return bars
+
+
+@pytest.mark.parametrize("threshold_pct", [None, -1])
+@pytest.mark.parametrize("window", [None, 3])
+@pytest.mark.parametrize("split", [0, 100])
+def test_expanding_update_matches_calculate_exactly(bars, threshold_pct, window, split):
+    params = {"threshold_pct": threshold_pct, "expanding": True, "window": window}
+    expected = WeeklyAverageBuyIndicator(**params).calculate(bars.copy())
+    streaming = WeeklyAverageBuyIndicator(**params).warm_up(bars.iloc[:split])
+    signals, pct_diffs = [], []
+    for bar in bars.iloc[split:].to_dict("records"):
+        known = streaming.expanding_state["averages"]
+        average = np.nan if known is None else known[bar["Date"].dayofweek]
+        pct_diffs.append(100 * (np.float64(bar["Close"]) - average) / average)
+        signals.append(streaming.update(bar))
+    assert signals == expected["Signal"].tolist()[split:]
+    np.testing.assert_array_equal(pct_diffs, expected["PctDiff"].to_numpy()[split:])
+
+
+@pytest.mark.parametrize("threshold_pct", [None, -1])
+def test_full_sample_update_matches_calculate_on_the_bars_so_far(bars, threshold_pct):
+    streaming = WeeklyAverageBuyIndicator(threshold_pct).warm_up(bars.iloc[:50])
+    for i in range(50, 120):
+        expected = WeeklyAverageBuyIndicator(threshold_pct).calculate(
+            bars.iloc[: i + 1].copy()
+        )
+        assert streaming.update(bars.iloc[i].to_dict()) == expected["Signal"].iloc[-1]